@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark and parity check for the native MIDI codec against pretty_midi
+
+Usage: python benchmarks/bench_midi_codec.py [--repeat N]
+"""
+
+import argparse
+import io
+import sys
+import time
+
+import numpy as np
+import mido
+import pretty_midi
+
+from corpus import build_corpus
+from midi_codec import NoteTable, parse_midi, write_midi
+
+
+def pretty_midi_write(table: NoteTable) -> bytes:
+    """Reference serializer: the pretty_midi path the server used to take"""
+    midi_file = pretty_midi.PrettyMIDI()
+    instrument = pretty_midi.Instrument(program=0)
+    for pitch, velocity, start, end in zip(
+        table.pitch.tolist(), table.velocity.tolist(),
+        table.start.tolist(), table.end.tolist()
+    ):
+        instrument.notes.append(pretty_midi.Note(
+            velocity=velocity, pitch=pitch, start=start, end=end
+        ))
+    midi_file.instruments.append(instrument)
+    output = io.BytesIO()
+    midi_file.write(output)
+    return output.getvalue()
+
+
+def pretty_midi_parse(midi_bytes: bytes) -> NoteTable:
+    """Reference parser flattened into a NoteTable"""
+    midi_file = pretty_midi.PrettyMIDI(io.BytesIO(midi_bytes))
+    rows = [
+        (note.pitch, note.velocity, note.start, note.end, inst.program, inst.is_drum, index)
+        for index, inst in enumerate(midi_file.instruments)
+        for note in inst.notes
+    ]
+    columns = list(zip(*rows)) if rows else [()] * 7
+    return NoteTable(*[np.array(column) for column in columns])
+
+
+def multi_track_fixture() -> bytes:
+    """Two tracks, program changes, a drum channel and a tempo change"""
+    midi_file = mido.MidiFile(ticks_per_beat=480)
+    timing = mido.MidiTrack([
+        mido.MetaMessage('set_tempo', tempo=500000, time=0),
+        mido.MetaMessage('set_tempo', tempo=400000, time=1920),
+    ])
+    keys = mido.MidiTrack([mido.Message('program_change', program=33, channel=1, time=0)])
+    drums = mido.MidiTrack()
+    for step in range(64):
+        keys.append(mido.Message('note_on', note=40 + step % 12, velocity=90, channel=1, time=0))
+        keys.append(mido.Message('note_off', note=40 + step % 12, velocity=0, channel=1, time=120))
+        drums.append(mido.Message('note_on', note=36, velocity=100, channel=9, time=0))
+        drums.append(mido.Message('note_on', note=36, velocity=0, channel=9, time=120))
+    midi_file.tracks.extend([timing, keys, drums])
+    output = io.BytesIO()
+    midi_file.save(file=output)
+    return output.getvalue()
+
+
+def tables_equal(a: NoteTable, b: NoteTable) -> bool:
+    return (
+        len(a) == len(b) and
+        np.array_equal(a.pitch, b.pitch) and
+        np.array_equal(a.velocity, b.velocity) and
+        np.array_equal(a.start, b.start) and
+        np.array_equal(a.end, b.end) and
+        np.array_equal(a.program, b.program) and
+        np.array_equal(a.is_drum, b.is_drum)
+    )
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'clip':<22}{'notes':>7}{'write pm':>11}{'write new':>11}"
+          f"{'parse pm':>11}{'parse new':>11}  parity")
+
+    for name, table in build_corpus():
+        reference = pretty_midi_write(table)
+        written = write_midi(table)
+        write_ok = written == reference
+        parse_ok = tables_equal(parse_midi(reference), pretty_midi_parse(reference))
+        failures += (not write_ok) + (not parse_ok)
+
+        timings = [
+            best_of(lambda: pretty_midi_write(table), args.repeat),
+            best_of(lambda: write_midi(table), args.repeat),
+            best_of(lambda: pretty_midi.PrettyMIDI(io.BytesIO(reference)), args.repeat),
+            best_of(lambda: parse_midi(reference), args.repeat)
+        ]
+        print(f"{name:<22}{len(table):>7}" +
+              ''.join(f"{t * 1000:>9.2f}ms" for t in timings) +
+              f"  write={'ok' if write_ok else 'DIFF'} parse={'ok' if parse_ok else 'DIFF'}")
+
+    fixture = multi_track_fixture()
+    parse_ok = tables_equal(parse_midi(fixture), pretty_midi_parse(fixture))
+    failures += not parse_ok
+    print(f"{'multi_track_tempo':<22}{'':>7}{'':>44}  parse={'ok' if parse_ok else 'DIFF'}")
+
+    if failures:
+        print(f"{failures} parity failure(s)")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the Magenta server
+
+Starts the server in a fresh process and measures how long it takes to
+answer /api/status (liveness) and /api/ready (every model loaded), plus
+the per-model load times it reports.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--port PORT] [--ready-timeout SECONDS]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, Optional, Tuple
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server', 'magenta_server.py')
+
+
+def poll(url: str) -> Tuple[Optional[int], Optional[Dict]]:
+    """GET a JSON endpoint; (None, None) while the server is not listening"""
+    try:
+        with urllib.request.urlopen(url, timeout=2) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'{}')
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return None, None
+
+
+def cold_start(port: int, ready_timeout: float, interval: float = 0.05) -> Dict:
+    """One server start: seconds to first status answer and to readiness"""
+    env = dict(os.environ, PORT=str(port), HOST='127.0.0.1')
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, SERVER], env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f'http://127.0.0.1:{port}'
+    result = {'status_seconds': None, 'ready_seconds': None, 'models': {}}
+    try:
+        while time.perf_counter() - started < ready_timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f'Server exited with code {process.returncode}')
+            if result['status_seconds'] is None:
+                code, _ = poll(f'{base}/api/status')
+                if code == 200:
+                    result['status_seconds'] = time.perf_counter() - started
+            else:
+                code, body = poll(f'{base}/api/ready')
+                if body:
+                    result['models'] = body.get('models', {})
+                if code == 200:
+                    result['ready_seconds'] = time.perf_counter() - started
+                    break
+            time.sleep(interval)
+    finally:
+        process.terminate()
+        process.wait(10)
+    return result
+
+
+def seconds(value: Optional[float]) -> str:
+    return '-' if value is None else f'{value:.2f}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--port', type=int, default=5091)
+    parser.add_argument('--ready-timeout', type=float, default=600.0)
+    args = parser.parse_args()
+
+    print(f"{'run':>4} {'status s':>10} {'ready s':>10}  models")
+    for run in range(args.runs):
+        result = cold_start(args.port, args.ready_timeout)
+        models = ', '.join(
+            f"{name}={info['state']}"
+            + (f" {info['load_seconds']:.1f}s" if info.get('load_seconds') else '')
+            for name, info in result['models'].items()
+        )
+        print(
+            f"{run:>4} {seconds(result['status_seconds']):>10} "
+            f"{seconds(result['ready_seconds']):>10}  {models}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Accuracy and speed check of reduced-precision model variants against the full models
+
+Loads each model twice in one in-process server, full precision and as
+served with the exported variant (server/quantize_models.py) and the
+requested compute precision, and runs the synthetic corpus through both
+at a near-greedy temperature and a fixed seed: MusicVAE reconstructs
+each clip's first window, Music Transformer continues each clip.
+Outputs are compared note by note (pitch and 16th-grid onset); the
+script fails when the mean F1 drops below --min-f1. Per-call speedup
+and artifact sizes are reported alongside.
+
+Usage: python benchmarks/check_variants.py [--variant int8|full] [--precision float32|bfloat16]
+                                           [--models NAME,...] [--temperature 0.001]
+                                           [--steps 32] [--seed 0] [--repeat 3] [--min-f1 0.9]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from corpus import build_corpus
+
+from magenta_server import MagentaServer  # noqa: E402
+from midi_codec import NoteTable, merge_context, split_windows  # noqa: E402
+from quantization import VARIANTS, checkpoint_bytes, note_agreement, variant_path  # noqa: E402
+
+
+def variant_catalog(
+    models: List[str], variant: str, precision: str
+) -> Tuple[List[Dict], Dict[str, str], Dict[str, Dict[str, int]]]:
+    """Catalog with every model twice, the variant name of each model and artifact sizes"""
+    model_dir = os.getenv('MODEL_DIR', '')
+    catalog = {spec['name']: spec for spec in MagentaServer.load_model_catalog()}
+    entries, names, sizes = [], {}, {}
+    for name in models:
+        spec = catalog[name]
+        checkpoint = os.path.join(model_dir, spec['checkpoint'])
+        source_bytes = checkpoint_bytes(checkpoint)
+        served_bytes = source_bytes
+        if variant != 'full':
+            exported = variant_path(checkpoint, variant)
+            if not os.path.isfile(exported):
+                sys.exit(f'{exported} not found; run server/quantize_models.py {name} --variant {variant}')
+            served_bytes = os.path.getsize(exported)
+        names[name] = f'{name}@{variant}-{precision}'
+        entries.append({**spec, 'variant': 'full', 'precision': 'float32', 'preload': True})
+        entries.append({
+            **spec, 'name': names[name], 'variant': variant, 'precision': precision, 'preload': True
+        })
+        sizes[name] = {'checkpoint_bytes': source_bytes, 'variant_bytes': served_bytes}
+    return entries, names, sizes
+
+
+def timed_call(fn: Callable[[], NoteTable], repeat: int) -> Tuple[NoteTable, float]:
+    """Result of ``fn`` and its best wall time over ``repeat`` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--variant', choices=VARIANTS + ('full',), default='int8')
+    parser.add_argument('--precision', choices=('float32', 'bfloat16'), default='float32')
+    parser.add_argument('--models', default='cat-mel_2bar_big,transformer_autoencoder')
+    parser.add_argument('--temperature', type=float, default=0.001)
+    parser.add_argument('--steps', type=int, default=32, help='Continuation length in steps')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per clip (best is kept)')
+    parser.add_argument('--min-f1', type=float, default=0.9)
+    args = parser.parse_args()
+    logging.getLogger('magenta_server').setLevel(logging.WARNING)
+
+    entries, names, sizes = variant_catalog(args.models.split(','), args.variant, args.precision)
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as catalog_file:
+        json.dump(entries, catalog_file)
+    os.environ['MODEL_CATALOG'] = catalog_file.name
+    try:
+        server = MagentaServer()
+        server.models.wait()
+    finally:
+        os.unlink(catalog_file.name)
+    failed = {
+        name: info['error'] for name, info in server.models.stats()['models'].items()
+        if info['state'] != 'ready'
+    }
+    if failed:
+        sys.exit(f'Models failed to load: {failed}')
+
+    corpus = build_corpus()
+    report = {}
+    for full, quantized in names.items():
+        kind = server.models.kind_of(full)
+
+        def run(model_name: str, table: NoteTable) -> NoteTable:
+            if kind == 'music_vae':
+                window = split_windows(table, server.vae_window_bars[model_name] * 4 * 60.0 / table.qpm)[0]
+                _, mu, _ = server.variation_engine.encode(window, model_name)
+                return server.variation_engine.decode(mu[None], args.temperature, model_name)[0]
+            primer = merge_context(
+                [table], server.transformer_steps_per_quarter, server.transformer_context_steps
+            )
+            generated = server.continue_sequence(model_name, primer, args.steps, args.temperature, args.seed)
+            return generated.tail(primer.total_time)
+
+        scores, full_time, variant_time = [], 0.0, 0.0
+        for clip_name, table in corpus:
+            reference, seconds = timed_call(lambda: run(full, table), args.repeat)
+            full_time += seconds
+            candidate, seconds = timed_call(lambda: run(quantized, table), args.repeat)
+            variant_time += seconds
+            agreement = note_agreement(reference, candidate)
+            scores.append(agreement['f1'])
+            print(f'{full:28s} {clip_name:20s} f1={agreement["f1"]:.3f} '
+                  f'precision={agreement["precision"]:.3f} recall={agreement["recall"]:.3f}')
+
+        report[full] = {
+            'variant': args.variant,
+            'precision': args.precision,
+            'mean_f1': float(np.mean(scores)),
+            'min_f1': float(np.min(scores)),
+            'speedup': full_time / variant_time if variant_time else 0.0,
+            'checkpoint_mb': sizes[full]['checkpoint_bytes'] / 1e6,
+            'variant_mb': sizes[full]['variant_bytes'] / 1e6
+        }
+
+    print(json.dumps(report, indent=2))
+    below = [name for name, result in report.items() if result['mean_f1'] < args.min_f1]
+    if below:
+        sys.exit(f"Mean note F1 below {args.min_f1} for: {', '.join(below)}")
+
+
+if __name__ == '__main__':
+    main()
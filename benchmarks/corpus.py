@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic MIDI corpus for Ableton2ML benchmarks
+"""
+
+import os
+import sys
+from typing import List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+from midi_codec import NoteTable, write_midi  # noqa: E402
+
+# (name, bars, notes per bar, max polyphony)
+CORPUS_SPEC = [
+    ('sparse_melody_2bar', 2, 4, 1),
+    ('melody_4bar', 4, 8, 1),
+    ('chords_8bar', 8, 12, 4),
+    ('dense_drums_16bar', 16, 32, 4),
+    ('dense_keys_32bar', 32, 48, 6),
+    ('very_dense_64bar', 64, 96, 8)
+]
+
+SECONDS_PER_BAR = 2.0  # 4/4 at 120 bpm
+
+
+def synthetic_clip(seed: int, bars: int, notes_per_bar: int, polyphony: int) -> NoteTable:
+    """Random but reproducible clip on a 16th-note grid"""
+    rng = np.random.default_rng(seed)
+    count = bars * notes_per_bar
+    step = SECONDS_PER_BAR / 16
+    onsets = np.sort(rng.integers(0, bars * 16, size=count)) * step
+    # Stack up to ``polyphony`` notes per onset by reusing onsets
+    if polyphony > 1:
+        stacked = rng.integers(0, polyphony, size=count) > 0
+        onsets[1:][stacked[1:]] = onsets[:-1][stacked[1:]]
+    durations = rng.integers(1, 8, size=count) * step
+    pitch = rng.integers(36, 96, size=count)
+    velocity = rng.integers(30, 127, size=count)
+    return NoteTable(pitch, velocity, onsets, onsets + durations)
+
+
+def build_corpus(seed: int = 1234) -> List[Tuple[str, NoteTable]]:
+    """Named note tables covering sparse to very dense clips"""
+    return [
+        (name, synthetic_clip(seed + index, bars, notes_per_bar, polyphony))
+        for index, (name, bars, notes_per_bar, polyphony) in enumerate(CORPUS_SPEC)
+    ]
+
+
+def build_midi_corpus(seed: int = 1234) -> List[Tuple[str, bytes]]:
+    """Named SMF byte strings for the corpus"""
+    return [(name, write_midi(table)) for name, table in build_corpus(seed)]
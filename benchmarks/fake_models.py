@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Deterministic stand-in model backend for Ableton2ML benchmarks
+
+Mimics the call signatures and timing of MusicVAE's ``TrainedModel`` and
+the Music Transformer wrapper without TensorFlow, checkpoints or a GPU.
+Costs are charged with ``time.sleep`` so, like a TF session call, a
+running "model" releases the GIL and request threads keep working.
+The stand-ins read and return NoteTables (``takes_note_tables``), so
+the harness runs without the magenta/protobuf stack installed.
+"""
+
+import math
+import time
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+from midi_codec import NoteTable, concat_tables
+
+
+def _content_seed(table: NoteTable) -> int:
+    """Stable seed from a clip's notes"""
+    return zlib.crc32(table.pitch.tobytes() + table.start.tobytes())
+
+
+def _melody(rng: np.random.Generator, start_time: float, steps: int, qpm: float,
+            steps_per_quarter: int = 4) -> NoteTable:
+    """Monophonic clip on a 16th grid starting at ``start_time``"""
+    step = 60.0 / qpm / steps_per_quarter
+    onsets = np.arange(0, steps, 2, dtype=np.float64)
+    start = start_time + onsets * step
+    count = len(start)
+    return NoteTable(
+        pitch=rng.integers(48, 84, size=count),
+        velocity=rng.integers(60, 110, size=count),
+        start=start,
+        end=start + 2 * step,
+        tempos=[(0.0, qpm)]
+    )
+
+
+class FakeTrainedModel:
+    """MusicVAE stand-in: ``encode``/``decode``/``sample`` with fixed per-batch cost.
+
+    Like ``TrainedModel``, inputs are processed in chunks of
+    ``batch_size`` and every chunk costs the same whether it is full or
+    padded, so batching behaviour is reflected in the timings.
+    """
+
+    takes_note_tables = True
+
+    def __init__(
+        self,
+        batch_size: int = 4,
+        z_size: int = 512,
+        encode_ms: float = 40.0,
+        decode_ms: float = 120.0,
+        steps: int = 32,
+        seed: int = 0
+    ):
+        self.batch_size = batch_size
+        self.z_size = z_size
+        self.encode_ms = encode_ms
+        self.decode_ms = decode_ms
+        self.steps = steps
+        self.seed = seed
+        self._sess = None
+
+    def _charge(self, rows: int, ms_per_batch: float):
+        time.sleep(math.ceil(rows / self.batch_size) * ms_per_batch / 1000.0)
+
+    def encode(self, tables: List[NoteTable]):
+        self._charge(len(tables), self.encode_ms)
+        mu = np.stack([
+            np.random.default_rng(_content_seed(table) ^ self.seed)
+            .standard_normal(self.z_size).astype(np.float32)
+            for table in tables
+        ])
+        sigma = np.full_like(mu, 0.5)
+        return mu, mu, sigma
+
+    def decode(self, z: np.ndarray, length: Optional[int] = None, temperature: float = 1.0):
+        self._charge(len(z), self.decode_ms)
+        return [
+            _melody(
+                np.random.default_rng(zlib.crc32(np.asarray(row, dtype=np.float32).tobytes())),
+                0.0, length or self.steps, 120.0
+            )
+            for row in z
+        ]
+
+    def sample(self, n: int = 1, length: Optional[int] = None, temperature: float = 1.0):
+        rng = np.random.default_rng(self.seed)
+        return self.decode(
+            rng.standard_normal((n, self.z_size)).astype(np.float32), length, temperature
+        )
+
+
+class FakeMusicTransformer:
+    """Music Transformer stand-in: cost grows linearly with the steps generated"""
+
+    takes_note_tables = True
+
+    def __init__(self, ms_per_step: float = 2.0, steps_per_quarter: int = 4, seed: int = 0):
+        self.ms_per_step = ms_per_step
+        self.steps_per_quarter = steps_per_quarter
+        self.seed = seed
+        self._sess = None
+
+    def generate(self, primer: NoteTable, length: int, temperature: float = 1.0,
+                 seed: Optional[int] = None) -> NoteTable:
+        time.sleep(length * self.ms_per_step / 1000.0)
+        end_time = primer.total_time
+        continuation = _melody(
+            np.random.default_rng(_content_seed(primer) ^ (self.seed if seed is None else seed)),
+            end_time, length, primer.qpm, self.steps_per_quarter
+        )
+        # The primer's own notes come first, as in a real generated sequence
+        return concat_tables([primer, continuation], distinct_tracks=False)
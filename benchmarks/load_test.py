@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Load test for the generation API against a deterministic fake model backend
+
+Runs the real MagentaServer (routing, transport, batching, MIDI codec)
+on a local port with the stand-in models from fake_models.py, drives
+/api/generate/variation, /continuation and /new_track at a fixed
+concurrency with the synthetic corpus, and reports throughput, latency
+percentiles and peak RSS. No GPU, checkpoints or network are needed.
+
+With --real-models the catalog models are loaded from MODEL_DIR instead,
+honouring MODEL_VARIANT and MODEL_PRECISION, so reduced-precision
+serving can be compared against full precision run for run.
+
+Usage: python benchmarks/load_test.py [--requests N] [--concurrency C]
+                                      [--endpoints variation,continuation,new_track]
+                                      [--real-models] [--json results.json]
+"""
+
+import argparse
+import base64
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from corpus import build_midi_corpus
+from fake_models import FakeMusicTransformer, FakeTrainedModel
+
+# The fakes need no warm-up
+os.environ.setdefault('MODEL_WARMUP', '0')
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from magenta_server import MagentaServer  # noqa: E402
+
+ENDPOINTS = ('variation', 'continuation', 'new_track')
+
+
+class FakeBackendServer(MagentaServer):
+    """MagentaServer whose model loaders return the deterministic stand-ins"""
+
+    def __init__(self, vae_decode_ms: float, transformer_ms_per_step: float):
+        self.vae_decode_ms = vae_decode_ms
+        self.transformer_ms_per_step = transformer_ms_per_step
+        super().__init__()
+
+    def _load_music_vae(self, spec, checkpoint, progress):
+        return FakeTrainedModel(batch_size=self.batch_size, decode_ms=self.vae_decode_ms)
+
+    def _load_music_transformer(self, spec, checkpoint, progress):
+        return FakeMusicTransformer(ms_per_step=self.transformer_ms_per_step)
+
+
+class RssSampler:
+    """Track peak resident set size while a scenario runs"""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current() -> int:
+        try:
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError):
+            # Not Linux: fall back to the lifetime peak (KB on Linux, bytes on macOS)
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == 'darwin' else peak * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def build_payloads(endpoint: str, corpus: List[Tuple[str, bytes]]) -> List[Dict]:
+    """Request bodies for one endpoint, cycling through the corpus"""
+    encoded = [base64.b64encode(midi).decode('utf-8') for _, midi in corpus]
+    # Every other request sends its counts as integral floats, as Max for
+    # Live does; the server must treat them exactly like ints
+    def count(value: int, index: int):
+        return float(value) if index % 2 else value
+
+    if endpoint == 'variation':
+        return [
+            {'midi_data': clip, 'num_variations': count(4, index), 'creativity_level': 0.7}
+            for index, clip in enumerate(encoded)
+        ]
+    if endpoint == 'continuation':
+        return [{'midi_data': clip, 'target_length': count(32, index)} for index, clip in enumerate(encoded)]
+    return [
+        {
+            'context_tracks': [{'midi_data': clip} for clip in encoded[index:index + 3]],
+            'track_length': count(32, index)
+        }
+        for index in range(max(1, len(encoded) - 2))
+    ]
+
+
+def post(url: str, body: bytes, client: str) -> Tuple[int, float]:
+    started = time.perf_counter()
+    request = urllib.request.Request(
+        url, data=body, method='POST',
+        headers={'Content-Type': 'application/json', 'X-Client-Id': client}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    return status, time.perf_counter() - started
+
+
+def run_scenario(base_url: str, endpoint: str, payloads: List[Dict],
+                 requests: int, concurrency: int) -> Dict:
+    """Send ``requests`` POSTs with ``concurrency`` in flight"""
+    url = f'{base_url}/api/generate/{endpoint}'
+    bodies = [json.dumps(payload).encode('utf-8') for payload in payloads]
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(
+                # One simulated client per connection, so per-client caps
+                # behave as they would for separate Ableton sets
+                lambda index: post(url, bodies[index % len(bodies)], f'bench-{index % concurrency}'),
+                range(requests)
+            ))
+        elapsed = time.perf_counter() - started
+
+    latencies = np.array([latency for status, latency in results if status == 200])
+    errors = sum(1 for status, _ in results if status != 200)
+    percentiles = (
+        np.percentile(latencies, [50, 95, 99]) * 1000 if len(latencies) else [float('nan')] * 3
+    )
+    return {
+        'endpoint': endpoint,
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'seconds': elapsed,
+        'throughput_rps': (requests - errors) / elapsed if elapsed else 0.0,
+        'p50_ms': float(percentiles[0]),
+        'p95_ms': float(percentiles[1]),
+        'p99_ms': float(percentiles[2]),
+        'peak_rss_mb': rss.peak / (1024 * 1024)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    parser.add_argument('--vae-decode-ms', type=float, default=120.0)
+    parser.add_argument('--transformer-ms-per-step', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--real-models', action='store_true',
+                        help='Serve the catalog models from MODEL_DIR instead of the stand-ins')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    if args.real_models:
+        server = MagentaServer()
+        loaded = server.models.wait()
+    else:
+        server = FakeBackendServer(args.vae_decode_ms, args.transformer_ms_per_step)
+        loaded = server.models.wait(timeout=60)
+    if not loaded:
+        sys.exit('Models failed to load')
+
+    http = make_server('127.0.0.1', 0, server.app, threaded=True)
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{http.server_port}'
+
+    corpus = build_midi_corpus(args.seed)
+    results = []
+    print(f"{'endpoint':<14}{'reqs':>6}{'conc':>6}{'errors':>8}{'req/s':>9}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak RSS':>11}")
+    try:
+        for endpoint in args.endpoints.split(','):
+            if endpoint not in ENDPOINTS:
+                sys.exit(f'Unknown endpoint: {endpoint}')
+            result = run_scenario(
+                base_url, endpoint, build_payloads(endpoint, corpus),
+                args.requests, args.concurrency
+            )
+            results.append(result)
+            print(f"{endpoint:<14}{result['requests']:>6}{result['concurrency']:>6}"
+                  f"{result['errors']:>8}{result['throughput_rps']:>9.1f}"
+                  f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                  f"{result['peak_rss_mb']:>9.0f}MB")
+    finally:
+        http.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump({'args': vars(args), 'results': results}, output, indent=2)
+
+    if any(result['errors'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
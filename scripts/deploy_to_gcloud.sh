@@ -103,7 +103,7 @@ Type=simple
 User=root
 WorkingDirectory=/opt/ableton2ml
 Environment=PATH=/opt/ableton2ml/venv/bin
-ExecStart=/opt/ableton2ml/venv/bin/python server/magenta_server.py
+ExecStart=/opt/ableton2ml/venv/bin/gunicorn -c server/gunicorn.conf.py wsgi:app
 Restart=always
 RestartSec=10
 
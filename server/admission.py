@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Admission control for Ableton2ML generation requests
+Bounded per-model queues, priority classes, deadlines and per-client caps
+"""
+
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lower value is served first
+INTERACTIVE = 0
+STANDARD = 1
+BULK = 2
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', STANDARD: 'standard', BULK: 'bulk'}
+
+
+class AdmissionRejected(RuntimeError):
+    """A request was turned away before (or instead of) reaching a model"""
+
+    def __init__(self, message: str, status_code: int, retry_after: int, reason: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class Ticket:
+    """One request's place in a model's admission queue"""
+
+    __slots__ = ('model', 'client', 'priority', 'deadline', 'sequence', 'admitted_at')
+
+    def __init__(self, model: str, client: Optional[str], priority: int, deadline: Optional[float], sequence: int):
+        self.model = model
+        # None for unbounded tickets, which do not count against a client
+        self.client = client
+        self.priority = priority
+        self.deadline = deadline
+        self.sequence = sequence
+        self.admitted_at: Optional[float] = None
+
+    @property
+    def order(self):
+        return (self.priority, self.sequence)
+
+
+class ModelLane:
+    """Running slots, waiting tickets and service-time estimate for one model"""
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.running = 0
+        self.waiting: List[Ticket] = []
+        self.avg_service = 0.0
+        self.completed = 0
+
+
+class AdmissionController:
+    """Gate generation work per model before it reaches the batchers.
+
+    Each model runs at most ``slots`` requests at once; up to
+    ``queue_size`` more wait, and a freed slot always goes to the
+    waiting request with the best (priority, arrival) order. A request
+    whose estimated finish time (queue ahead of it plus the model's
+    running average service time) is past its deadline is rejected with
+    503 up front, and a request still waiting at its deadline gives up.
+    A client may have at most ``max_per_client`` requests admitted or
+    waiting; beyond that it gets 429.
+    """
+
+    def __init__(
+        self,
+        slots: int = 8,
+        queue_size: int = 32,
+        max_per_client: int = 4,
+        default_timeout: float = 60.0,
+        retry_after: int = 5
+    ):
+        self.default_slots = max(1, int(slots))
+        self.queue_size = max(0, int(queue_size))
+        self.max_per_client = max(1, int(max_per_client))
+        self.default_timeout = default_timeout
+        self.retry_after = retry_after
+        self._lanes: Dict[str, ModelLane] = {}
+        self._clients: Dict[str, int] = {}
+        self._cond = threading.Condition()
+        self._sequence = itertools.count()
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {}
+
+    def _lane(self, model: str) -> ModelLane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            lane = self._lanes[model] = ModelLane(self.default_slots)
+        return lane
+
+    def _reject(self, message: str, status_code: int, reason: str, retry_after: Optional[int] = None):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        raise AdmissionRejected(
+            message, status_code, retry_after if retry_after is not None else self.retry_after, reason
+        )
+
+    def _estimate(self, lane: ModelLane, ticket: Ticket) -> float:
+        """Seconds until ``ticket`` would finish, from the lane's service average"""
+        ahead = sum(1 for waiting in lane.waiting if waiting.order < ticket.order)
+        if lane.running < lane.slots and not ahead:
+            return lane.avg_service
+        return lane.avg_service * (1 + (ahead + 1) / lane.slots)
+
+    def acquire(
+        self,
+        model: str,
+        client: str,
+        priority: int = STANDARD,
+        timeout: Optional[float] = None,
+        bounded: bool = True
+    ) -> Ticket:
+        """Wait for a slot on ``model`` or raise ``AdmissionRejected``.
+
+        ``timeout`` is the client's remaining patience in seconds
+        (``default_timeout`` when None, no deadline when 0). Unbounded
+        acquires (background jobs) skip the queue limit and client cap.
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        now = time.monotonic()
+        with self._cond:
+            ticket = Ticket(
+                model, client if bounded else None, priority,
+                now + timeout if timeout else None, next(self._sequence)
+            )
+            lane = self._lane(model)
+
+            if bounded:
+                if self._clients.get(client, 0) >= self.max_per_client:
+                    self._reject(
+                        f"Client '{client}' already has {self.max_per_client} requests in flight",
+                        429, 'client_limit'
+                    )
+                if lane.running >= lane.slots and len(lane.waiting) >= self.queue_size:
+                    self._reject(f"Queue for model '{model}' is full", 503, 'queue_full')
+                if ticket.deadline is not None:
+                    estimate = self._estimate(lane, ticket)
+                    if estimate > timeout:
+                        self._reject(
+                            f"Estimated {estimate:.2f}s exceeds the {timeout:.2f}s deadline",
+                            503, 'deadline', max(1, int(estimate - timeout) + 1)
+                        )
+
+                self._clients[client] = self._clients.get(client, 0) + 1
+            lane.waiting.append(ticket)
+            try:
+                while True:
+                    first = min(lane.waiting, key=lambda waiting: waiting.order)
+                    if lane.running < lane.slots and first is ticket:
+                        break
+                    remaining = None
+                    if ticket.deadline is not None:
+                        remaining = ticket.deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject(
+                                f"Deadline passed while queued for model '{model}'",
+                                503, 'deadline'
+                            )
+                    self._cond.wait(remaining)
+            except AdmissionRejected:
+                lane.waiting.remove(ticket)
+                self._release_client(ticket.client)
+                self._cond.notify_all()
+                raise
+
+            lane.waiting.remove(ticket)
+            lane.running += 1
+            ticket.admitted_at = time.monotonic()
+            self.admitted += 1
+            return ticket
+
+    def release(self, ticket: Ticket):
+        """Free the ticket's slot and fold its service time into the estimate"""
+        with self._cond:
+            lane = self._lanes[ticket.model]
+            lane.running -= 1
+            service = time.monotonic() - ticket.admitted_at
+            lane.avg_service = (
+                service if not lane.completed else 0.8 * lane.avg_service + 0.2 * service
+            )
+            lane.completed += 1
+            self._release_client(ticket.client)
+            self._cond.notify_all()
+
+    def _release_client(self, client: Optional[str]):
+        if client is None:
+            return
+        count = self._clients.get(client, 0) - 1
+        if count > 0:
+            self._clients[client] = count
+        else:
+            self._clients.pop(client, None)
+
+    @contextmanager
+    def admit(self, model: str, client: str, priority: int = STANDARD,
+              timeout: Optional[float] = None, bounded: bool = True):
+        """``acquire``/``release`` around a block of generation work"""
+        ticket = self.acquire(model, client, priority, timeout, bounded)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                'slots_per_model': self.default_slots,
+                'queue_size': self.queue_size,
+                'max_per_client': self.max_per_client,
+                'default_timeout': self.default_timeout,
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected),
+                'active_clients': len(self._clients),
+                'models': {
+                    model: {
+                        'running': lane.running,
+                        'waiting': len(lane.waiting),
+                        'waiting_by_priority': {
+                            name: sum(1 for ticket in lane.waiting if ticket.priority == priority)
+                            for priority, name in PRIORITY_NAMES.items()
+                        },
+                        'avg_service_ms': lane.avg_service * 1000,
+                        'completed': lane.completed
+                    }
+                    for model, lane in self._lanes.items()
+                }
+            }
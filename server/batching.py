@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Dynamic micro-batching for Ableton2ML model inference
+Coalesces concurrent generation requests into full model batches
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchJob:
+    """Rows submitted by a single caller, resolved as one future"""
+
+    def __init__(self, key: Hashable, rows: List[Any]):
+        self.key = key
+        self.rows = rows
+        self.results: List[Any] = [None] * len(rows)
+        self.cursor = 0
+        self.completed = 0
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+    @property
+    def pending_rows(self) -> int:
+        return len(self.rows) - self.cursor
+
+
+class MicroBatcher:
+    """Queue jobs for one model and run them in packed batches.
+
+    ``batch_fn(key, rows)`` must return one result per row. Rows from
+    jobs that share a key are packed together up to ``batch_size``; a
+    partially filled batch is flushed once its oldest row has waited
+    ``max_wait_ms``. A job larger than one batch is spread over several
+    consecutive batches and resolved when its last row completes.
+    With ``concurrency`` > 1 that many scheduler threads take batches,
+    so several run at once (one per out-of-process model replica).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[Hashable, List[Any]], List[Any]],
+        batch_size: int = 4,
+        max_wait_ms: float = 10.0,
+        concurrency: int = 1
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.concurrency = max(1, int(concurrency))
+
+        self._queues: Dict[Hashable, deque] = {}
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+
+        # Metrics
+        self._queued_rows = 0
+        self._batches = 0
+        self._rows = 0
+        self._jobs = 0
+        self._started_jobs = 0
+        self._errors = 0
+        self._fill_histogram = [0] * (self.batch_size + 1)
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self._max_queue_depth = 0
+
+    def start(self):
+        """Start the scheduler threads"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._threads = [
+            threading.Thread(
+                target=self._loop,
+                name=f"batcher-{self.name}" + (f"-{index}" if self.concurrency > 1 else ''),
+                daemon=True
+            )
+            for index in range(self.concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(
+            f"Batcher '{self.name}' started "
+            f"(batch_size={self.batch_size}, max_wait_ms={self.max_wait * 1000:.1f}, "
+            f"concurrency={self.concurrency})"
+        )
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the scheduler threads and fail any queued jobs"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        with self._cond:
+            for queue in self._queues.values():
+                for job in queue:
+                    if not job.future.done():
+                        job.future.set_exception(
+                            RuntimeError(f"Batcher '{self.name}' stopped")
+                        )
+            self._queues.clear()
+            self._queued_rows = 0
+
+    def reset_after_fork(self):
+        """Restart the scheduler in a forked child.
+
+        Threads do not survive ``fork()``, and the parent's condition
+        variable may have been held at fork time, so the child gets a
+        fresh lock, empty queues and new scheduler threads.
+        """
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._queued_rows = 0
+        self._threads = []
+        self._running = False
+        self.start()
+
+    def submit_async(self, key: Hashable, rows: List[Any]) -> Future:
+        """Queue rows under a batch key and return a future for their results"""
+        job = BatchJob(key, list(rows))
+        if not job.rows:
+            job.future.set_result([])
+            return job.future
+
+        with self._cond:
+            if not self._running:
+                raise RuntimeError(f"Batcher '{self.name}' is not running")
+            self._queues.setdefault(key, deque()).append(job)
+            self._queued_rows += len(job.rows)
+            self._jobs += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queued_rows)
+            self._cond.notify_all()
+        return job.future
+
+    def submit(self, key: Hashable, rows: List[Any], timeout: Optional[float] = None) -> List[Any]:
+        """Queue rows and block until their results are available"""
+        return self.submit_async(key, rows).result(timeout=timeout)
+
+    def _oldest_key(self) -> Optional[Hashable]:
+        oldest_key = None
+        oldest_time = None
+        for key, queue in self._queues.items():
+            if queue and (oldest_time is None or queue[0].enqueued_at < oldest_time):
+                oldest_key = key
+                oldest_time = queue[0].enqueued_at
+        return oldest_key
+
+    def _pending_for(self, key: Hashable) -> int:
+        return sum(job.pending_rows for job in self._queues.get(key, ()))
+
+    def _take_batch(self):
+        """Wait for a batch to fill (or time out) and pop its rows"""
+        with self._cond:
+            while self._running and self._queued_rows == 0:
+                self._cond.wait()
+            if not self._running:
+                return None
+
+            key = self._oldest_key()
+            deadline = self._queues[key][0].enqueued_at + self.max_wait
+            while self._running and self._pending_for(key) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            if not self._running:
+                return None
+
+            queue = self._queues.get(key)
+            if queue is None:
+                # Another scheduler thread took these rows while we waited
+                return key, []
+            slots = []
+            now = time.monotonic()
+            while queue and len(slots) < self.batch_size:
+                job = queue[0]
+                if job.future.done():
+                    # An earlier batch already failed this job
+                    self._queued_rows -= job.pending_rows
+                    queue.popleft()
+                    continue
+                take = min(job.pending_rows, self.batch_size - len(slots))
+                for index in range(job.cursor, job.cursor + take):
+                    slots.append((job, index))
+                if job.cursor == 0:
+                    self._started_jobs += 1
+                    self._wait_total += now - job.enqueued_at
+                job.cursor += take
+                if job.pending_rows == 0:
+                    queue.popleft()
+            if not queue:
+                del self._queues[key]
+            self._queued_rows -= len(slots)
+            return key, slots
+
+    def _loop(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            key, slots = batch
+            if not slots:
+                continue
+
+            started = time.monotonic()
+            try:
+                results = self.batch_fn(key, [job.rows[index] for job, index in slots])
+                if len(results) != len(slots):
+                    raise RuntimeError(
+                        f"Batch function returned {len(results)} results for {len(slots)} rows"
+                    )
+            except Exception as e:
+                logger.error(f"Error in batcher '{self.name}': {e}")
+                with self._cond:
+                    self._errors += 1
+                for job, _ in slots:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                continue
+            finally:
+                elapsed = time.monotonic() - started
+                with self._cond:
+                    self._batches += 1
+                    self._rows += len(slots)
+                    self._fill_histogram[len(slots)] += 1
+                    self._run_total += elapsed
+
+            for (job, index), result in zip(slots, results):
+                job.results[index] = result
+                job.completed += 1
+                if job.completed == len(job.rows) and not job.future.done():
+                    job.future.set_result(job.results)
+
+    def stats(self) -> Dict:
+        """Queue depth and batch-fill metrics"""
+        with self._cond:
+            batches = self._batches
+            return {
+                'batch_size': self.batch_size,
+                'concurrency': self.concurrency,
+                'max_wait_ms': self.max_wait * 1000,
+                'queue_depth': self._queued_rows,
+                'max_queue_depth': self._max_queue_depth,
+                'jobs': self._jobs,
+                'batches': batches,
+                'rows': self._rows,
+                'errors': self._errors,
+                'avg_batch_fill': (
+                    self._rows / (batches * self.batch_size) if batches else 0.0
+                ),
+                'batch_size_histogram': {
+                    str(size): count
+                    for size, count in enumerate(self._fill_histogram) if size and count
+                },
+                'avg_queue_wait_ms': (
+                    self._wait_total / self._started_jobs * 1000
+                    if self._started_jobs else 0.0
+                ),
+                'avg_batch_run_ms': (
+                    self._run_total / batches * 1000 if batches else 0.0
+                )
+            }
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Bulk generation for Ableton2ML
+Runs a clip library through a parameter grid into a resumable tar archive
+"""
+
+import io
+import itertools
+import json
+import logging
+import os
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+from jobs import payload_key
+
+logger = logging.getLogger(__name__)
+
+MIDI_EXTENSIONS = ('.mid', '.midi')
+MANIFEST_NAME = 'manifest.json'
+
+# Grid axes per bulk kind: request field -> grid key holding its values
+GRID_AXES = {
+    'variation': {'creativity_level': 'creativity_levels', 'num_variations': 'num_variations'},
+    'continuation': {'target_length': 'target_lengths'}
+}
+
+DEFAULT_GRID = {
+    'creativity_levels': [0.8],
+    'num_variations': [3],
+    'target_lengths': [16]
+}
+
+
+class BulkTask:
+    """One input clip under one point of the parameter grid"""
+
+    __slots__ = ('key', 'name', 'params', 'midi_bytes')
+
+    def __init__(self, kind: str, name: str, params: Dict, midi_bytes: bytes):
+        self.name = name
+        self.params = params
+        self.midi_bytes = midi_bytes
+        # Stable across runs, so a resumed run recognises finished work
+        self.key = payload_key(kind, {**params, 'input': name}, midi_bytes)
+
+    @property
+    def label(self) -> str:
+        return '-'.join(f'{field}_{value}' for field, value in sorted(self.params.items()))
+
+
+def expand_grid(kind: str, grid: Optional[Dict] = None) -> List[Dict]:
+    """Every combination of the grid axes used by ``kind``"""
+    if kind not in GRID_AXES:
+        raise ValueError(f'Unknown bulk kind: {kind}')
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    fields = sorted(GRID_AXES[kind])
+    axes = []
+    for field in fields:
+        values = grid[GRID_AXES[kind][field]]
+        values = values if isinstance(values, (list, tuple)) else [values]
+        if not values:
+            raise ValueError(f"Grid axis '{GRID_AXES[kind][field]}' is empty")
+        axes.append(values)
+    return [dict(zip(fields, combination)) for combination in itertools.product(*axes)]
+
+
+def _is_midi(name: str) -> bool:
+    return name.lower().endswith(MIDI_EXTENSIONS) and not os.path.basename(name).startswith('.')
+
+
+def read_archive(data: bytes) -> List[Tuple[str, bytes]]:
+    """MIDI members of a zip or tar (optionally compressed) archive, by name"""
+    buffer = io.BytesIO(data)
+    if zipfile.is_zipfile(buffer):
+        with zipfile.ZipFile(buffer) as archive:
+            return sorted(
+                (info.filename, archive.read(info))
+                for info in archive.infolist() if not info.is_dir() and _is_midi(info.filename)
+            )
+    buffer.seek(0)
+    try:
+        with tarfile.open(fileobj=buffer, mode='r:*') as archive:
+            return sorted(
+                (member.name, archive.extractfile(member).read())
+                for member in archive.getmembers() if member.isfile() and _is_midi(member.name)
+            )
+    except tarfile.TarError as e:
+        raise ValueError(f'Input is neither a zip nor a tar archive: {e}')
+
+
+def read_inputs(path: str) -> List[Tuple[str, bytes]]:
+    """MIDI files under a directory (recursively) or inside an archive"""
+    if os.path.isdir(path):
+        inputs = []
+        for root, _, files in os.walk(path):
+            for filename in files:
+                if _is_midi(filename):
+                    full_path = os.path.join(root, filename)
+                    with open(full_path, 'rb') as midi_file:
+                        inputs.append((os.path.relpath(full_path, path), midi_file.read()))
+        return sorted(inputs)
+    with open(path, 'rb') as archive_file:
+        return read_archive(archive_file.read())
+
+
+def safe_name(name: str) -> str:
+    """Input name as a relative archive path; names that climb out of it are rejected.
+
+    Output members are laid out under the input's name, so separators are
+    normalized and a leading ``/`` (or drive) is dropped, while ``..``
+    components raise instead of being silently merged into another path.
+    """
+    parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.')]
+    if parts and parts[0].endswith(':'):
+        parts = parts[1:]
+    if not parts or '..' in parts:
+        raise ValueError(f'Invalid input name: {name!r}')
+    return '/'.join(parts)
+
+
+def build_tasks(kind: str, inputs: List[Tuple[str, bytes]], grid: Optional[Dict] = None) -> List[BulkTask]:
+    """Input-major task list, so a clip's grid points run together and share its encoding"""
+    points = expand_grid(kind, grid)
+    return [
+        BulkTask(kind, safe_name(name), params, midi_bytes)
+        for name, midi_bytes in inputs for params in points
+    ]
+
+
+def response_clips(kind: str, body: Dict) -> List[bytes]:
+    """Generated MIDI clips from a variation or continuation response body"""
+    if kind == 'variation':
+        return [variation['midi_data'] for variation in body['variations']]
+    return [body['continuation']['midi_data']]
+
+
+def read_checkpoint(path: str) -> Tuple[Dict[str, Dict], int, bool]:
+    """(entries by task key, archive offset, complete) from a checkpoint log.
+
+    A line torn by an interrupted write is ignored, together with
+    anything after it; the archive is cut back to the last recorded
+    offset so it never holds output the checkpoint does not know about.
+    """
+    entries: Dict[str, Dict] = {}
+    offset = 0
+    complete = False
+    if not os.path.exists(path):
+        return entries, offset, complete
+    with open(path, 'r', encoding='utf-8') as checkpoint:
+        for line in checkpoint:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if record.get('complete'):
+                complete = True
+                continue
+            entries[record['entry']['task']] = record['entry']
+            offset = record['offset']
+    return entries, offset, complete
+
+
+class BulkRun:
+    """Stream generated clips for a task list into a tar archive with a manifest.
+
+    Up to ``workers`` tasks are in flight at once, enough to keep the
+    model micro-batches full; a single writer appends each finished
+    task's clips to ``output_path`` and then records the task and the
+    archive offset in ``output_path + '.checkpoint'``. Running again over
+    the same output resumes after the last checkpointed task, retrying
+    failed ones (a finished run with no failures is left as it is);
+    members the checkpoint already records are never written twice.
+    ``manifest.json`` is written as the last member once every task has
+    been attempted.
+    """
+
+    def __init__(self, kind: str, output_path: str, tasks: List[BulkTask], workers: int = 8,
+                 params: Optional[Dict] = None):
+        self.kind = kind
+        self.output_path = output_path
+        self.checkpoint_path = output_path + '.checkpoint'
+        self.tasks = tasks
+        self.workers = max(1, int(workers))
+        self.params = params or {}
+        self.entries, self.offset, self.complete = read_checkpoint(self.checkpoint_path)
+        if self.offset and (
+            not os.path.exists(output_path) or os.path.getsize(output_path) < self.offset
+        ):
+            logger.warning(f"{output_path} does not match its checkpoint; starting over")
+            self.entries, self.offset, self.complete = {}, 0, False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._written = set()
+        self._lock = threading.Lock()
+
+    def pending(self) -> List[BulkTask]:
+        """Tasks still to generate, once per task key"""
+        pending, seen = [], set()
+        for task in self.tasks:
+            if task.key in seen or self.entries.get(task.key, {}).get('status') == 'succeeded':
+                continue
+            seen.add(task.key)
+            pending.append(task)
+        return pending
+
+    def stats(self) -> Dict:
+        with self._lock:
+            statuses = [entry['status'] for entry in self.entries.values()]
+        return {
+            'kind': self.kind,
+            'total': len(self.tasks),
+            'succeeded': statuses.count('succeeded'),
+            'failed': statuses.count('failed'),
+            'complete': self.complete,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+    def run(self, generate: Callable[[BulkTask], Dict],
+            progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Generate every pending task; ``generate`` returns the endpoint's response body"""
+        self.started_at = time.time()
+        pending = self.pending()
+        if self.complete and not pending:
+            return self.stats()
+        self.complete = False
+
+        logger.info(
+            f"Bulk {self.kind}: {len(self.tasks) - len(pending)} of {len(self.tasks)} "
+            f"tasks already done, writing to {self.output_path}"
+        )
+        self._rewrite_checkpoint()
+        # Members already in the archive, including those of a task that
+        # failed part way through writing its clips
+        self._written = {name for entry in self.entries.values() for name in entry.get('files', ())}
+        mode = 'r+b' if self.offset else 'wb'
+        with open(self.output_path, mode) as output, \
+                open(self.checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+            # Drop anything past the last checkpointed member, including
+            # the end-of-archive blocks of an earlier close
+            output.truncate(self.offset)
+            output.seek(self.offset)
+            archive = tarfile.open(fileobj=output, mode='w', format=tarfile.PAX_FORMAT)
+            self._generate_all(archive, output, checkpoint, pending, generate, progress)
+            self._add_member(archive, MANIFEST_NAME, json.dumps(self.manifest(), indent=2).encode('utf-8'))
+            archive.close()
+            self.complete = True
+            checkpoint.write(json.dumps({'complete': True}) + '\n')
+
+        self.finished_at = time.time()
+        return self.stats()
+
+    def _rewrite_checkpoint(self):
+        """Compact the log so appends never follow a torn line"""
+        temporary = self.checkpoint_path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as checkpoint:
+            for entry in self.entries.values():
+                checkpoint.write(json.dumps({'entry': entry, 'offset': self.offset}) + '\n')
+        os.replace(temporary, self.checkpoint_path)
+
+    def _generate_all(self, archive, output, checkpoint, pending, generate, progress):
+        tasks = iter(pending)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bulk') as pool:
+            running = {}
+            while True:
+                while len(running) < self.workers * 2:
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    running[pool.submit(generate, task)] = task
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    entry = {'task': task.key, 'input': task.name, 'params': task.params}
+                    try:
+                        entry.update(self._write_clips(archive, task, future.result()))
+                    except Exception as e:
+                        logger.error(f"Bulk task {task.name} {task.params} failed: {e}")
+                        entry.update({'status': 'failed', 'error': str(e)})
+                    output.flush()
+                    with self._lock:
+                        self.entries[task.key] = entry
+                    checkpoint.write(json.dumps({'entry': entry, 'offset': output.tell()}) + '\n')
+                    checkpoint.flush()
+                    if progress:
+                        progress(entry)
+
+    def _write_clips(self, archive, task: BulkTask, body: Dict) -> Dict:
+        stem = os.path.splitext(task.name)[0]
+        files = []
+        try:
+            for index, clip in enumerate(response_clips(self.kind, body), start=1):
+                member = f'{stem}/{task.label}/{self.kind}_{index}.mid'
+                if member not in self._written:
+                    self._add_member(archive, member, clip)
+                    self._written.add(member)
+                files.append(member)
+        except Exception as e:
+            # Keep the members that made it in, so a retry skips them
+            logger.error(f"Bulk task {task.name} {task.params} failed writing clips: {e}")
+            return {'status': 'failed', 'error': str(e), 'files': files}
+        return {'status': 'succeeded', 'files': files}
+
+    @staticmethod
+    def _add_member(archive, name: str, data: bytes):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        archive.addfile(info, io.BytesIO(data))
+
+    def manifest(self) -> Dict:
+        with self._lock:
+            entries = sorted(self.entries.values(), key=lambda entry: (entry['input'], entry['task']))
+        return {
+            'kind': self.kind,
+            'params': self.params,
+            'tasks': len(self.tasks),
+            'succeeded': sum(1 for entry in entries if entry['status'] == 'succeeded'),
+            'failed': sum(1 for entry in entries if entry['status'] == 'failed'),
+            'entries': entries
+        }
+
+
+
+def checkpoint_stats(output_path: str) -> Optional[Dict]:
+    """Progress of a run that is not active in this process, from its checkpoint"""
+    checkpoint_path = output_path + '.checkpoint'
+    if not os.path.exists(checkpoint_path):
+        return None
+    entries, _, complete = read_checkpoint(checkpoint_path)
+    statuses = [entry['status'] for entry in entries.values()]
+    return {
+        'succeeded': statuses.count('succeeded'),
+        'failed': statuses.count('failed'),
+        'complete': complete
+    }
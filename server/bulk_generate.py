@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Offline bulk generation for Ableton2ML
+Renders a clip library over a parameter grid in-process, without HTTP
+
+Usage: python server/bulk_generate.py LIBRARY OUTPUT.tar [--kind variation]
+                                      [--creativity 0.3,0.6,0.9] [--variations 2,4]
+                                      [--lengths 16,32] [--model NAME] [--workers N]
+
+LIBRARY is a directory of .mid files or a zip/tar archive of them.
+Re-running the same command after an interruption resumes from the
+checkpoint next to OUTPUT.tar.
+"""
+
+import logging
+import sys
+import time
+from typing import List
+
+import click
+
+from bulk import GRID_AXES, BulkRun, build_tasks, read_inputs
+from magenta_server import MagentaServer
+
+
+def _values(cast):
+    def parse(ctx, param, value) -> List:
+        if value is None:
+            return None
+        try:
+            return [cast(item) for item in value.split(',') if item.strip()]
+        except ValueError:
+            raise click.BadParameter(f'expected a comma-separated list, got {value!r}')
+    return parse
+
+
+@click.command(help=__doc__.strip().splitlines()[0])
+@click.argument('library', type=click.Path(exists=True))
+@click.argument('output', type=click.Path(dir_okay=False, writable=True))
+@click.option('--kind', type=click.Choice(sorted(GRID_AXES)), default='variation', show_default=True)
+@click.option('--creativity', callback=_values(float), help='Creativity levels, e.g. 0.3,0.6,0.9')
+@click.option('--variations', callback=_values(int), help='Variation counts, e.g. 2,4')
+@click.option('--lengths', callback=_values(int), help='Continuation lengths in steps, e.g. 16,32')
+@click.option('--model', help='Model from the registry (defaults to the server default)')
+@click.option('--workers', type=int, help='Tasks in flight (default: BULK_WORKERS)')
+def main(library, output, kind, creativity, variations, lengths, model, workers):
+    logging.getLogger('magenta_server').setLevel(logging.WARNING)
+    grid = {
+        key: value
+        for key, value in (
+            ('creativity_levels', creativity), ('num_variations', variations), ('target_lengths', lengths)
+        )
+        if value
+    }
+    inputs = read_inputs(library)
+    if not inputs:
+        sys.exit(f'No MIDI files found in {library}')
+    tasks = build_tasks(kind, inputs, grid)
+
+    server = MagentaServer()
+    model_kind = 'music_vae' if kind == 'variation' else 'music_transformer'
+    model_name = server.model_name(model_kind, {'model': model} if model else None)
+    if model_name not in server.models.names(model_kind):
+        sys.exit(f'Unknown {model_kind} model: {model_name}')
+    click.echo(f'Loading {model_name}...')
+    server.models.wait()
+    while not server.models.ensure(model_name):
+        time.sleep(1)
+        info = server.models.stats()['models'][model_name]
+        if info['state'] == 'failed' and info['next_retry_at'] is None:
+            sys.exit(f"Model {model_name} failed to load: {info['error']}")
+
+    run = BulkRun(
+        kind, output, tasks, workers or server.bulk_workers,
+        params={'model': model_name, 'grid': grid}
+    )
+    build = server.variation_response if kind == 'variation' else server.continuation_response
+
+    def generate(task):
+        return build({**task.params, 'model': model_name}, task.midi_bytes)
+
+    pending = len(run.pending())
+    click.echo(f'{len(inputs)} clips x {len(tasks) // len(inputs)} grid points: '
+               f'{len(tasks) - pending} done, {pending} to go')
+    with click.progressbar(length=pending, label=kind) as bar:
+        stats = run.run(generate, progress=lambda entry: bar.update(1))
+
+    click.echo(f"{stats['succeeded']} succeeded, {stats['failed']} failed -> {output}")
+    if stats['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Gunicorn configuration for Ableton2ML production serving
+
+Models are loaded once in the master (preload_app) and shared with the
+forked workers; each worker serves requests on a thread pool that feeds
+the per-model micro-batchers.
+
+Environment:
+    HOST, PORT            bind address (default 0.0.0.0:5001)
+    WEB_WORKERS           worker processes (default 1); jobs are per worker
+    WEB_THREADS           request threads per worker (default 16)
+    WEB_TIMEOUT           worker timeout in seconds (default 300)
+    PRELOAD_MODELS        load models in the master before forking (default 1)
+    INFERENCE_PROCESSES   model processes per worker; disables preload (default 0)
+"""
+
+import os
+
+# Server modules are imported top-level; the working directory stays
+# where the service runs so relative MODEL_DIR/checkpoint paths resolve there
+pythonpath = os.path.dirname(os.path.abspath(__file__))
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv('WEB_WORKERS', '1'))
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', '16'))
+timeout = int(os.getenv('WEB_TIMEOUT', '300'))
+graceful_timeout = 30
+keepalive = 5
+# Inference processes belong to the worker that forked them, so with
+# INFERENCE_PROCESSES every worker builds its own server and pool
+preload_app = (
+    os.getenv('PRELOAD_MODELS', '1') == '1' and int(os.getenv('INFERENCE_PROCESSES', '0')) == 0
+)
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """Warn that job and bulk state is per worker process"""
+    if workers > 1:
+        server.log.warning(
+            'WEB_WORKERS=%d: jobs (/api/jobs, /api/bulk) live in the worker that '
+            'accepted them, so a poll routed to another worker gets 404; run the '
+            'job API with WEB_WORKERS=1 or route clients to a single worker', workers
+        )
+
+
+def post_fork(server, worker):
+    """Restart the batcher and decode threads that did not survive fork()"""
+    if preload_app:
+        import wsgi
+        wsgi.server.after_fork()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+CPU inference helpers for Ableton2ML
+Length buckets, warm-up passes and per-model TensorFlow thread pools
+"""
+
+import inspect
+import logging
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from midi_codec import NoteTable, note_table_to_sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LENGTH_BUCKETS = (16, 32, 64, 128, 256)
+
+
+def parse_buckets(value: Optional[str], default: Sequence[int] = DEFAULT_LENGTH_BUCKETS) -> List[int]:
+    """Parse a comma-separated bucket list such as ``"16,32,64"``"""
+    if not value:
+        return sorted(default)
+    return sorted({int(item) for item in value.split(',') if item.strip()})
+
+
+def bucket_for(length: int, buckets: Sequence[int]) -> int:
+    """Smallest bucket that holds ``length``; longer requests keep their own length"""
+    for bucket in buckets:
+        if length <= bucket:
+            return bucket
+    return length
+
+
+def supports_seed(generate) -> bool:
+    """True when a model's ``generate`` takes a per-call ``seed`` argument"""
+    try:
+        return 'seed' in inspect.signature(generate).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def takes_note_tables(model) -> bool:
+    """True for backends that read and return NoteTables instead of NoteSequence protos"""
+    return getattr(model, 'takes_note_tables', False)
+
+
+def model_inputs(model, tables: List[NoteTable]) -> List:
+    """Note tables in the form ``model`` reads: as-is, or as NoteSequence protos"""
+    if takes_note_tables(model):
+        return list(tables)
+    return [note_table_to_sequence(table) for table in tables]
+
+
+def warmup_table(bars: int = 2, qpm: float = 120.0) -> NoteTable:
+    """A plain C-major eighth-note melody that every melody model can encode"""
+    step = 30.0 / qpm
+    count = bars * 8
+    scale = np.array([60, 62, 64, 65, 67, 69, 71, 72], dtype=np.int16)
+    start = np.arange(count, dtype=np.float64) * step
+    return NoteTable(
+        pitch=scale[np.arange(count) % len(scale)],
+        velocity=np.full(count, 80, dtype=np.int16),
+        start=start,
+        end=start + step,
+        tempos=[(0.0, qpm)]
+    )
+
+
+def enable_bfloat16_rewrite(config):
+    """Turn on the oneDNN bfloat16 auto-mixed-precision pass of a ``ConfigProto``.
+
+    Grappler rewrites eligible float32 ops (matmuls, convolutions) to run
+    in bfloat16 with float32 accumulation; it pays off on CPUs with
+    AVX512-BF16 or AMX and is a no-op elsewhere.
+    """
+    rewrite = config.graph_options.rewrite_options
+    # Renamed in TF 2.9; older releases only know the MKL name
+    for field in ('auto_mixed_precision_onednn_bfloat16', 'auto_mixed_precision_mkl'):
+        if field in rewrite.DESCRIPTOR.fields_by_name:
+            setattr(rewrite, field, type(rewrite).ON)
+            return
+    raise RuntimeError('This TensorFlow build has no bfloat16 mixed precision rewrite')
+
+
+def apply_session_config(
+    model,
+    intra_op_threads: int = 0,
+    inter_op_threads: int = 0,
+    bfloat16: bool = False
+) -> bool:
+    """Move a graph-mode model onto a session with its own thread pools and precision.
+
+    Magenta's wrappers build their ``tf.Session`` with the default
+    config, so per-model pools and the bfloat16 rewrite are applied by
+    opening a second session on the same graph with the requested
+    ``ConfigProto`` and copying the restored variable values across.
+    Returns False when the model has no session to swap or nothing was
+    requested.
+    """
+    session = getattr(model, '_sess', None)
+    if session is None or not (intra_op_threads or inter_op_threads or bfloat16):
+        return False
+
+    import tensorflow.compat.v1 as tf
+
+    config = tf.ConfigProto(
+        intra_op_parallelism_threads=intra_op_threads,
+        inter_op_parallelism_threads=inter_op_threads,
+        use_per_session_threads=bool(intra_op_threads or inter_op_threads)
+    )
+    if bfloat16:
+        enable_bfloat16_rewrite(config)
+    with session.graph.as_default():
+        variables = tf.global_variables()
+        values = session.run(variables)
+        threaded_session = tf.Session(graph=session.graph, config=config)
+        for variable, value in zip(variables, values):
+            variable.load(value, threaded_session)
+    session.close()
+    model._sess = threaded_session
+    return True
+
+
+def warm_up_music_vae(model, batch_size: int, temperature: float = 0.5):
+    """Run one full-batch encode and decode so graph setup happens before serving"""
+    try:
+        z, _, _ = model.encode(model_inputs(model, [warmup_table()]))
+        model.decode(np.repeat(z, batch_size, axis=0), temperature=temperature)
+    except Exception as e:
+        # Drum and multi-track configs cannot encode a plain melody;
+        # sampling still exercises the whole decoder
+        logger.info(f"Encode warm-up skipped ({e}); sampling instead")
+        model.sample(n=batch_size, temperature=temperature)
+
+
+def warm_up_music_transformer(model, lengths: Sequence[int], temperature: float = 0.8):
+    """Generate once per length bucket so each decode length is set up before serving"""
+    primer = model_inputs(model, [warmup_table()])[0]
+    for length in lengths:
+        model.generate(primer, length, temperature=temperature)
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Out-of-process inference for Ableton2ML
+Model processes pinned to CPU cores, fed note arrays through shared memory
+"""
+
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from queue import Queue
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from inference_backend import model_inputs, supports_seed
+from midi_codec import NoteTable, as_note_table
+
+logger = logging.getLogger(__name__)
+
+TABLE_COLUMNS = NoteTable.COLUMNS
+
+Layout = List[Tuple[str, str, Tuple[int, ...], int]]
+
+
+def parse_core_sets(value: Optional[str], processes: int) -> List[List[int]]:
+    """Core set per process from ``"0-3;4-7"``, else an even split of the usable cores"""
+    if value:
+        sets = []
+        for group in value.split(';'):
+            cores = []
+            for item in group.split(','):
+                item = item.strip()
+                if '-' in item:
+                    first, last = item.split('-')
+                    cores.extend(range(int(first), int(last) + 1))
+                elif item:
+                    cores.append(int(item))
+            sets.append(cores)
+        return [sets[index % len(sets)] for index in range(processes)]
+
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+    if not available:
+        return [[] for _ in range(processes)]
+    return [
+        [int(core) for core in chunk] for chunk in np.array_split(available, processes) if len(chunk)
+    ] or [available]
+
+
+def pack_tables(tables: List[NoteTable]) -> Tuple[Dict[str, np.ndarray], List]:
+    """Concatenate note tables into flat columns plus per-table lengths and timing"""
+    arrays = {
+        column: np.concatenate([getattr(table, column) for table in tables])
+        if tables else np.zeros(0)
+        for column in TABLE_COLUMNS
+    }
+    arrays['lengths'] = np.array([len(table) for table in tables], dtype=np.int64)
+    meta = [(table.ticks_per_quarter, table.tempos, table.duration) for table in tables]
+    return arrays, meta
+
+
+def unpack_tables(arrays: Dict[str, np.ndarray], meta: List, copy: bool = False) -> List[NoteTable]:
+    """Split flat columns back into note tables (views unless ``copy``)"""
+    bounds = np.concatenate([[0], np.cumsum(arrays['lengths'])])
+    tables = []
+    for index, (ticks_per_quarter, tempos, duration) in enumerate(meta):
+        rows = slice(bounds[index], bounds[index + 1])
+        columns = {
+            column: np.array(arrays[column][rows]) if copy else arrays[column][rows]
+            for column in TABLE_COLUMNS
+        }
+        tables.append(NoteTable(
+            **columns, ticks_per_quarter=ticks_per_quarter, tempos=tempos, duration=duration
+        ))
+    return tables
+
+
+class SharedRing:
+    """Fixed-size slots in one shared-memory block.
+
+    Arrays are copied into a slot once and read on the other side as
+    ``np.ndarray`` views of the same pages, so batches cross the process
+    boundary without pickling. Payloads too large for a slot are sent
+    inline through the pipe instead.
+    """
+
+    def __init__(self, slots: int, slot_bytes: int):
+        self.slots = max(1, int(slots))
+        self.slot_bytes = int(slot_bytes)
+        self.memory = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_bytes)
+        self.free: Queue = Queue()
+        for slot in range(self.slots):
+            self.free.put(slot)
+
+    def write(self, slot: int, arrays: Dict[str, np.ndarray]) -> Optional[Layout]:
+        """Copy arrays into ``slot``; None when they do not fit"""
+        layout: Layout = []
+        offset = 0
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            # Keep every array 8-byte aligned for the views on the other side
+            offset = -(-offset // 8) * 8
+            layout.append((name, array.dtype.str, array.shape, offset))
+            offset += array.nbytes
+        if offset > self.slot_bytes:
+            return None
+        base = slot * self.slot_bytes
+        for (name, _, _, array_offset), array in zip(layout, arrays.values()):
+            array = np.ascontiguousarray(array)
+            view = np.ndarray(array.shape, array.dtype, self.memory.buf, base + array_offset)
+            view[...] = array
+        return layout
+
+    def read(self, slot: int, layout: Layout) -> Dict[str, np.ndarray]:
+        """Views of the arrays stored in ``slot``"""
+        base = slot * self.slot_bytes
+        return {
+            name: np.ndarray(shape, np.dtype(dtype), self.memory.buf, base + offset)
+            for name, dtype, shape, offset in layout
+        }
+
+    def close(self, unlink: bool = False):
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+def _send_arrays(ring: SharedRing, slot: int, arrays: Dict[str, np.ndarray]):
+    layout = ring.write(slot, arrays)
+    return (layout, None) if layout is not None else (None, arrays)
+
+
+def _receive_arrays(ring: SharedRing, slot: int, layout: Optional[Layout], inline) -> Dict[str, np.ndarray]:
+    return ring.read(slot, layout) if layout is not None else inline
+
+
+def _worker_main(index: int, conn, ring: SharedRing, cores: List[int], loader: Callable[[str], Any]):
+    """Inference process: load models on request and run batches from the ring"""
+    if cores and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    models: Dict[str, Any] = {}
+    logger.info(f"Inference process {index} (pid {os.getpid()}) on cores {cores or 'all'}")
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        request_id, op, model_name, params, slot, layout, inline, meta = message
+        try:
+            if op == 'stop':
+                conn.send((request_id, 'ok', None, None, None))
+                return
+            if op == 'load':
+                if model_name not in models:
+                    models[model_name] = loader(model_name)
+                conn.send((request_id, 'ok', None, None, None))
+                continue
+            if op == 'unload':
+                models.pop(model_name, None)
+                conn.send((request_id, 'ok', None, None, None))
+                continue
+
+            model = models.get(model_name)
+            if model is None:
+                raise RuntimeError(f"Model '{model_name}' is not loaded in inference process {index}")
+            arrays = _receive_arrays(ring, slot, layout, inline)
+            result_meta = None
+            if op == 'encode':
+                z, mu, sigma = model.encode(model_inputs(model, unpack_tables(arrays, meta)))
+                result = {'z': z, 'mu': mu, 'sigma': sigma}
+            elif op == 'decode':
+                sequences = model.decode(np.array(arrays['z']), temperature=params['temperature'])
+                result, result_meta = pack_tables([as_note_table(seq) for seq in sequences])
+            elif op == 'generate':
+                seed = params.get('seed')
+                kwargs = {'seed': seed} if seed is not None and supports_seed(model.generate) else {}
+                sequences = [
+                    model.generate(primer, params['length'], temperature=params['temperature'], **kwargs)
+                    for primer in model_inputs(model, unpack_tables(arrays, meta))
+                ]
+                result, result_meta = pack_tables([as_note_table(seq) for seq in sequences])
+            else:
+                raise ValueError(f'Unknown inference op: {op}')
+            result_layout, result_inline = _send_arrays(ring, slot, result)
+            conn.send((request_id, 'ok', result_layout, result_inline, result_meta))
+        except Exception as e:
+            logger.error(f"Inference process {index} failed on {op} for '{model_name}': {e}")
+            conn.send((request_id, 'error', str(e), None, None))
+
+
+class InferenceProcess:
+    """Parent-side handle: ring slots, request pipe and a reply reader thread"""
+
+    def __init__(self, index: int, cores: List[int], loader: Callable[[str], Any],
+                 slots: int, slot_bytes: int, context):
+        self.index = index
+        self.cores = cores
+        self.ring = SharedRing(slots, slot_bytes)
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(index, child_conn, self.ring, cores, loader),
+            name=f'inference-{index}', daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self._ids = itertools.count()
+        self._pending: Dict[int, Tuple[Future, Optional[int]]] = {}
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.inline = 0
+        self._stopping = False
+        self._reader = threading.Thread(target=self._read, name=f'inference-{index}-reader', daemon=True)
+        self._reader.start()
+
+    @property
+    def outstanding(self) -> int:
+        return len(self._pending)
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def submit(self, op: str, model_name: str, params: Optional[Dict] = None,
+               arrays: Optional[Dict[str, np.ndarray]] = None, meta: Optional[List] = None) -> Future:
+        """Queue one request; blocks while every ring slot is in use"""
+        future: Future = Future()
+        slot = layout = inline = None
+        if arrays is not None:
+            slot = self.ring.free.get()
+            layout, inline = _send_arrays(self.ring, slot, arrays)
+        request_id = next(self._ids)
+        with self._lock:
+            self._pending[request_id] = (future, slot)
+            self.requests += 1
+            self.inline += inline is not None
+        try:
+            with self._send_lock:
+                self.conn.send((request_id, op, model_name, params or {}, slot, layout, inline, meta))
+        except Exception as e:
+            self._finish(request_id)
+            future.set_exception(e)
+        return future
+
+    def _finish(self, request_id: int) -> Tuple[Optional[Future], Optional[int]]:
+        with self._lock:
+            future, slot = self._pending.pop(request_id, (None, None))
+        return future, slot
+
+    def _read(self):
+        while True:
+            try:
+                request_id, status, layout, inline, meta = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                future, slot = self._pending.get(request_id, (None, None))
+            try:
+                if status == 'error':
+                    raise RuntimeError(layout)
+                result = None
+                if layout is not None or inline is not None:
+                    # Copy out before the slot is handed to the next request
+                    arrays = _receive_arrays(self.ring, slot, layout, inline)
+                    result = (
+                        unpack_tables(arrays, meta, copy=True) if meta is not None
+                        else {name: np.array(array) for name, array in arrays.items()}
+                    )
+                    with self._lock:
+                        self.inline += inline is not None
+            except Exception as e:
+                result = e
+            self._finish(request_id)
+            if slot is not None:
+                self.ring.free.put(slot)
+            if future is not None:
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+        # The process is gone: nothing pending will ever be answered
+        if not self._stopping:
+            logger.error(f"Inference process {self.index} exited")
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future, _ in pending.values():
+            future.set_exception(RuntimeError(f'Inference process {self.index} exited'))
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping = True
+        if self.alive:
+            try:
+                self.submit('stop', '').result(timeout)
+            except Exception:
+                self.process.terminate()
+        self.process.join(timeout)
+        self.conn.close()
+        self.ring.close(unlink=True)
+
+
+class InferencePool:
+    """Dedicated model processes behind the micro-batchers.
+
+    The serving process keeps HTTP, base64, MIDI parsing and response
+    encoding; every model batch is shipped as note/latent arrays through
+    a per-process shared-memory ring to one of ``processes`` inference
+    processes, each pinned to its own core set, so model compute no
+    longer competes with request handling for one interpreter's GIL.
+    Every process loads its own copy of each model.
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        loader: Callable[[str], Any],
+        core_sets: Optional[Sequence[List[int]]] = None,
+        ring_slots: int = 4,
+        slot_bytes: int = 8 * 1024 * 1024
+    ):
+        self.processes = max(1, int(processes))
+        self.loader = loader
+        self.core_sets = list(core_sets or parse_core_sets(None, self.processes))
+        self.ring_slots = ring_slots
+        self.slot_bytes = slot_bytes
+        self.owner_pid: Optional[int] = None
+        self._workers: List[InferenceProcess] = []
+        self._next = itertools.count()
+
+    def start(self):
+        """Fork the inference processes (before the server starts its own threads)"""
+        context = multiprocessing.get_context('fork')
+        self.owner_pid = os.getpid()
+        self._workers = [
+            InferenceProcess(
+                index, self.core_sets[index % len(self.core_sets)], self.loader,
+                self.ring_slots, self.slot_bytes, context
+            )
+            for index in range(self.processes)
+        ]
+        logger.info(f"Started {self.processes} inference processes")
+
+    def _check_owner(self):
+        if os.getpid() != self.owner_pid:
+            raise RuntimeError('Inference pool belongs to another process')
+
+    def _pick(self) -> InferenceProcess:
+        alive = [worker for worker in self._workers if worker.alive]
+        if not alive:
+            raise RuntimeError('No inference process is running')
+        # Least outstanding work, rotating between ties
+        offset = next(self._next)
+        return min(
+            (alive[(offset + i) % len(alive)] for i in range(len(alive))),
+            key=lambda worker: worker.outstanding
+        )
+
+    def load(self, model_name: str):
+        """Load a model in every process and wait for all of them"""
+        self._check_owner()
+        for future in [worker.submit('load', model_name) for worker in self._workers]:
+            future.result()
+
+    def unload(self, model_name: str):
+        """Drop a model from every process without waiting"""
+        for worker in self._workers:
+            if worker.alive:
+                worker.submit('unload', model_name)
+
+    def encode(self, model_name: str, tables: List[NoteTable]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        self._check_owner()
+        arrays, meta = pack_tables(tables)
+        result = self._pick().submit('encode', model_name, None, arrays, meta).result()
+        return result['z'], result['mu'], result['sigma']
+
+    def decode(self, model_name: str, z: np.ndarray, temperature: float) -> List[NoteTable]:
+        self._check_owner()
+        arrays = {'z': np.asarray(z, dtype=np.float32)}
+        return self._pick().submit('decode', model_name, {'temperature': temperature}, arrays).result()
+
+    def generate(self, model_name: str, primers: List[NoteTable], length: int,
+                 temperature: float, seed: Optional[int] = None) -> List[NoteTable]:
+        self._check_owner()
+        arrays, meta = pack_tables(primers)
+        params = {'length': length, 'temperature': temperature, 'seed': seed}
+        return self._pick().submit('generate', model_name, params, arrays, meta).result()
+
+    def stats(self) -> Dict:
+        return {
+            'processes': self.processes,
+            'ring_slots': self.ring_slots,
+            'slot_mb': self.slot_bytes / (1024 * 1024),
+            'workers': [
+                {
+                    'pid': worker.process.pid,
+                    'alive': worker.alive,
+                    'cores': worker.cores,
+                    'outstanding': worker.outstanding,
+                    'requests': worker.requests,
+                    'inline_payloads': worker.inline
+                }
+                for worker in self._workers
+            ]
+        }
+
+    def shutdown(self):
+        if os.getpid() != self.owner_pid:
+            return
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+
+
+class PooledModel:
+    """Stand-in for a loaded model whose weights live in the inference processes.
+
+    Mirrors the ``encode``/``decode``/``generate`` calls the batch
+    functions make on a real model. Encode rows and primers may be note
+    tables (shipped as-is) or NoteSequences; decode and generate return
+    note tables.
+    """
+
+    takes_note_tables = True
+
+    def __init__(self, pool: InferencePool, name: str):
+        self.pool = pool
+        self.name = name
+
+    def encode(self, rows: List) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.pool.encode(self.name, [as_note_table(row) for row in rows])
+
+    def decode(self, z: np.ndarray, length: Optional[int] = None, temperature: float = 1.0) -> List[NoteTable]:
+        return self.pool.decode(self.name, z, temperature)
+
+    def generate(self, primer, length: int, temperature: float = 1.0, seed: Optional[int] = None) -> NoteTable:
+        return self.pool.generate(self.name, [as_note_table(primer)], length, temperature, seed)[0]
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Asynchronous generation jobs for Ableton2ML
+Long generations run in the background; clients poll for the result
+"""
+
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from transport import params_json
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobStoreFull(RuntimeError):
+    """No room for another job until running ones finish or results expire"""
+
+
+def payload_key(kind: str, data: Dict, midi_bytes: Optional[bytes] = None) -> str:
+    """Stable hash of a job payload, used to deduplicate identical submissions"""
+    digest = hashlib.sha256(kind.encode('utf-8'))
+    params = {key: value for key, value in data.items() if key != 'midi_data'}
+    digest.update(params_json(params))
+    if midi_bytes:
+        digest.update(b'\0')
+        digest.update(midi_bytes)
+    return digest.hexdigest()
+
+
+class Job:
+    """One background generation and its outcome"""
+
+    def __init__(self, kind: str, key: str):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submissions = 1
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future = None
+        self.done = threading.Event()
+
+    def info(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'status': self.status,
+            'submissions': self.submissions,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'error': self.error
+        }
+
+
+class JobStore:
+    """Bounded job registry with TTL result storage and payload deduplication.
+
+    Submitting a payload whose key matches a queued or running job
+    returns that job instead of starting a new one; a still-stored
+    successful job is only reused when the caller says its result is
+    reproducible (a seeded payload). Finished jobs are kept for ``result_ttl`` seconds; at most
+    ``max_jobs`` are held at once, evicting the oldest finished first.
+    Kinds listed in ``kind_workers`` run on their own pool of that size,
+    so long jobs of one kind never hold the workers of the others.
+    """
+
+    def __init__(self, max_workers: int = 2, max_jobs: int = 1024, result_ttl: float = 600.0,
+                 kind_workers: Optional[Dict[str, int]] = None):
+        self.max_jobs = max_jobs
+        self.result_ttl = result_ttl
+        self._workers = {None: max_workers, **(kind_workers or {})}
+        self._executors = self._make_executors()
+        self._jobs: OrderedDict = OrderedDict()
+        self._by_key: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.expired = 0
+
+    def submit(self, kind: str, key: str, fn: Callable[[], Any], reuse_result: bool = False) -> Job:
+        """Start ``fn`` as a job, or join an identical in-flight (or, with ``reuse_result``, stored) job"""
+        joinable = (QUEUED, RUNNING, SUCCEEDED) if reuse_result else (QUEUED, RUNNING)
+        with self._lock:
+            self._expire()
+            existing_id = self._by_key.get(key)
+            existing = self._jobs.get(existing_id) if existing_id else None
+            if existing is not None and existing.status in joinable:
+                existing.submissions += 1
+                self.deduplicated += 1
+                return existing
+
+            if len(self._jobs) >= self.max_jobs and not self._evict_finished():
+                raise JobStoreFull('Too many jobs in flight')
+
+            job = Job(kind, key)
+            self._jobs[job.job_id] = job
+            self._by_key[key] = job.job_id
+            self.submitted += 1
+            executor = self._executors.get(kind, self._executors[None])
+            job.future = executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: Job, fn: Callable[[], Any]):
+        with self._lock:
+            if job.status != QUEUED:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+        try:
+            result = fn()
+            with self._lock:
+                job.result = result
+                job.status = SUCCEEDED
+        except Exception as e:
+            logger.error(f"Job {job.job_id} ({job.kind}) failed: {e}")
+            with self._lock:
+                job.error = str(e)
+                job.status = FAILED
+                # A failed payload may be retried as a fresh job
+                if self._by_key.get(job.key) == job.job_id:
+                    del self._by_key[job.key]
+        finally:
+            job.finished_at = time.time()
+            job.done.set()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """Block up to ``timeout`` seconds for a job to finish"""
+        job = self.get(job_id)
+        if job is not None and timeout > 0:
+            job.done.wait(timeout)
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued job; running jobs are left to finish"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return job
+            if job.future is not None:
+                job.future.cancel()
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            if self._by_key.get(job.key) == job.job_id:
+                del self._by_key[job.key]
+        job.done.set()
+        return job
+
+    def _remove(self, job_id: str):
+        job = self._jobs.pop(job_id)
+        if self._by_key.get(job.key) == job_id:
+            del self._by_key[job.key]
+
+    def _expire(self):
+        cutoff = time.time() - self.result_ttl
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job.status in FINISHED_STATES and job.finished_at and job.finished_at < cutoff
+        ]:
+            self._remove(job_id)
+            self.expired += 1
+
+    def _evict_finished(self) -> bool:
+        for job_id, job in self._jobs.items():
+            if job.status in FINISHED_STATES:
+                self._remove(job_id)
+                self.expired += 1
+                return True
+        return False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._expire()
+            counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0, CANCELLED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return {
+                'jobs': len(self._jobs),
+                'max_jobs': self.max_jobs,
+                'result_ttl': self.result_ttl,
+                'submitted': self.submitted,
+                'deduplicated': self.deduplicated,
+                'expired': self.expired,
+                'by_status': counts
+            }
+
+    def _make_executors(self) -> Dict[Optional[str], ThreadPoolExecutor]:
+        return {
+            kind: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'job-{kind}' if kind else 'job')
+            for kind, workers in self._workers.items()
+        }
+
+    def reset_after_fork(self):
+        """Give a forked child its own executors and an empty registry"""
+        self._executors = self._make_executors()
+        self._jobs = OrderedDict()
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=False)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Content-addressed MusicVAE latent cache for Ableton2ML
+Stores encoder outputs (z, mu, sigma) keyed by MIDI content hash
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (z, mu, sigma), optionally followed by a JSON-able dict describing
+# how the rows map onto the clip (e.g. its window layout)
+Encoding = Tuple
+
+
+class LatentCache:
+    """Memory-bounded LRU cache of encodings with an optional disk tier.
+
+    The memory tier is bounded by the total ``nbytes`` of the cached
+    arrays. When ``disk_dir`` is set, every encoding is also written
+    there as ``.npz`` and memory misses fall back to disk, so the cache
+    survives restarts; the disk tier is pruned oldest-first once it
+    exceeds ``disk_max_bytes``.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 1024 * 1024 * 1024
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._disk_entries: OrderedDict = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    @staticmethod
+    def make_key(midi_bytes: bytes, model_name: str) -> str:
+        """Hash decoded MIDI bytes together with the model config name"""
+        digest = hashlib.sha256(model_name.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(midi_bytes)
+        return digest.hexdigest()
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[Encoding]:
+        """Return a cached encoding, promoting disk entries into memory.
+
+        ``count_miss`` False is for a first probe that is followed by
+        another lookup, so one request counts at most one miss.
+        """
+        with self._lock:
+            encoding = self._entries.get(key)
+            if encoding is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return encoding
+
+        encoding = self._load_disk(key)
+        with self._lock:
+            if encoding is None:
+                self.misses += count_miss
+                return None
+            self.disk_hits += 1
+            self._insert(key, encoding)
+        return encoding
+
+    def put(self, key: str, encoding: Encoding):
+        """Cache an encoding in memory and, if enabled, on disk"""
+        encoding = tuple(np.asarray(array, dtype=np.float32) for array in encoding[:3]) + tuple(encoding[3:])
+        with self._lock:
+            self._insert(key, encoding)
+        if self.disk_dir:
+            self._store_disk(key, encoding)
+
+    @staticmethod
+    def _nbytes(encoding: Encoding) -> int:
+        return sum(array.nbytes for array in encoding[:3])
+
+    def _insert(self, key: str, encoding: Encoding):
+        size = self._nbytes(encoding)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._nbytes(self._entries.pop(key))
+        self._entries[key] = encoding
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= self._nbytes(evicted)
+            self.evictions += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.npz")
+
+    def _scan_disk(self):
+        """Index existing disk entries, oldest first"""
+        found = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith('.npz'):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    found.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self._disk_entries[key] = size
+            self._disk_bytes += size
+        logger.info(f"Latent cache disk tier: {len(found)} entries in {self.disk_dir}")
+
+    def _load_disk(self, key: str) -> Optional[Encoding]:
+        if not self.disk_dir:
+            return None
+        with self._lock:
+            if key not in self._disk_entries:
+                return None
+        try:
+            with np.load(self._disk_path(key)) as data:
+                encoding = (data['z'], data['mu'], data['sigma'])
+                if 'layout' in data.files:
+                    encoding += (json.loads(data['layout'].tobytes().decode('utf-8')),)
+                return encoding
+        except Exception as e:
+            logger.warning(f"Error reading latent cache entry {key}: {e}")
+            return None
+
+    def _store_disk(self, key: str, encoding: Encoding):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                arrays = {'z': encoding[0], 'mu': encoding[1], 'sigma': encoding[2]}
+                if len(encoding) > 3:
+                    arrays['layout'] = np.frombuffer(json.dumps(encoding[3]).encode('utf-8'), dtype=np.uint8)
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except Exception as e:
+            logger.warning(f"Error writing latent cache entry {key}: {e}")
+            return
+
+        with self._lock:
+            self._disk_bytes += size - self._disk_entries.pop(key, 0)
+            self._disk_entries[key] = size
+            stale = []
+            while self._disk_bytes > self.disk_max_bytes and len(self._disk_entries) > 1:
+                old_key, old_size = self._disk_entries.popitem(last=False)
+                self._disk_bytes -= old_size
+                stale.append(old_key)
+        for old_key in stale:
+            try:
+                os.remove(self._disk_path(old_key))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'disk_entries': len(self._disk_entries),
+                'disk_bytes': self._disk_bytes
+            }
@@ -5,10 +5,18 @@ Provides REST API for MIDI generation using MusicVAE and Music Transformer
 """
 
 import os
+import re
+import math
+import atexit
 import json
 import base64
 import logging
-from typing import Dict, List, Optional, Tuple
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -16,19 +24,37 @@ from dotenv import load_dotenv
 load_dotenv(os.path.expanduser('~/.env'))
 
 import numpy as np
-import tensorflow as tf
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
-import pretty_midi
-import mido
 
-# Magenta imports
-from magenta.models.music_vae import configs
-from magenta.models.music_vae.trained_model import TrainedModel
-from magenta.models.music_transformer import music_transformer
-from magenta.models.music_transformer import melody_transformer
-from magenta.models.shared import sequence_generator_bundle
-from magenta.protobuf import music_pb2
+# TensorFlow and Magenta are imported by the model loaders in the
+# background so the server can start answering before they finish.
+# Requests carry notes as midi_codec.NoteTable columns; NoteSequence
+# protos are only built around the model calls in the batch functions.
+
+from admission import BULK, INTERACTIVE, STANDARD, AdmissionController, AdmissionRejected
+from batching import MicroBatcher
+from bulk import GRID_AXES, BulkRun, build_tasks, checkpoint_stats, read_archive
+from inference_pool import InferencePool, PooledModel, parse_core_sets
+from inference_backend import (
+    apply_session_config, bucket_for, model_inputs, parse_buckets, supports_seed,
+    takes_note_tables, warm_up_music_transformer, warm_up_music_vae
+)
+from jobs import Job, JobStore, JobStoreFull, SUCCEEDED, payload_key
+from latent_cache import LatentCache
+from metrics import METRICS, PROMETHEUS_MIMETYPE, timed
+from model_registry import ModelNotReady, ModelRegistry, UnknownModel
+from quantization import VARIANTS, checkpoint_bytes, expand_bundle, expand_variant, read_variant_meta, variant_path
+from response_cache import ResponseCache
+from midi_codec import (
+    NoteTable, concat_tables, merge_context, parse_midi,
+    sequence_to_note_table, split_windows, stitch_windows, write_midi
+)
+from sessions import SessionStore
+from streaming import SSE_HEADERS, SSE_MIMETYPE, iter_sse, wants_stream
+from transport import TransportError, decode_midi_field, make_response
+from validation import ENDPOINTS, RequestLimits
+from variation_engine import VariationEngine
 
 # Configure logging
 logging.basicConfig(
@@ -37,6 +63,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Models the server can serve; only the preloaded ones are loaded at
+# startup, the rest on first use. MODEL_CATALOG may point to a JSON
+# list with the same fields to replace this table.
+DEFAULT_MODEL_CATALOG = [
+    {'name': 'cat-mel_2bar_big', 'kind': 'music_vae', 'config': 'cat-mel_2bar_big',
+     'checkpoint': 'cat-mel_2bar_big.ckpt', 'bars': 2, 'preload': True},
+    {'name': 'cat-drums_2bar_small', 'kind': 'music_vae', 'config': 'cat-drums_2bar_small',
+     'checkpoint': 'cat-drums_2bar_small.hikl.ckpt', 'bars': 2},
+    {'name': 'hierdec-mel_16bar', 'kind': 'music_vae', 'config': 'hierdec-mel_16bar',
+     'checkpoint': 'hierdec-mel_16bar.ckpt', 'bars': 16},
+    {'name': 'hierdec-trio_16bar', 'kind': 'music_vae', 'config': 'hierdec-trio_16bar',
+     'checkpoint': 'hierdec-trio_16bar.ckpt', 'bars': 16},
+    {'name': 'transformer_autoencoder', 'kind': 'music_transformer',
+     'checkpoint': 'transformer_autoencoder.mag', 'preload': True}
+]
+
 class MagentaServer:
     """Main server class for Google Magenta integration"""
     
@@ -51,70 +93,495 @@ class MagentaServer:
         else:
             logger.info("HF_TOKEN loaded successfully")
         
+        # Batching configuration
+        self.batch_size = int(os.getenv('MODEL_BATCH_SIZE', '4'))
+        self.batch_max_wait_ms = float(os.getenv('BATCH_MAX_WAIT_MS', '10'))
+        
+        # Transformer context window (16 bars at 4 steps per quarter)
+        self.transformer_context_steps = int(os.getenv('TRANSFORMER_CONTEXT_STEPS', '256'))
+        
+        # Clips longer than a MusicVAE's bar window are split into windows
+        # whose latent noise is correlated across boundaries
+        self.vae_window_correlation = float(os.getenv('VAE_WINDOW_CORRELATION', '0.8'))
+        self.vae_window_bars: Dict[str, int] = {}
+        
+        # Pre-flight limits per endpoint (sizes, clip contents and every
+        # numeric generation parameter). Each endpoint's body cap is
+        # enforced while reading, chunked uploads included; the largest
+        # one also caps what Flask will read for any other route
+        self.limits = {endpoint: RequestLimits.from_env(endpoint) for endpoint in ENDPOINTS}
+        self.app.config['MAX_CONTENT_LENGTH'] = max(
+            limits.request_bytes for limits in self.limits.values()
+        )
+        
+        # Thread pool for decoding multi-track context in parallel
+        self.decode_pool = ThreadPoolExecutor(
+            max_workers=int(os.getenv('DECODE_WORKERS', str(min(8, os.cpu_count() or 1)))),
+            thread_name_prefix='midi-decode'
+        )
+        
+        # Streaming continuation chunk size (one 4/4 bar at 4 steps per quarter)
+        self.stream_chunk_steps = int(os.getenv('STREAM_CHUNK_STEPS', '16'))
+        
+        # Latent cache for repeated MusicVAE encodes of the same clip
+        self.latent_cache = LatentCache(
+            max_bytes=int(float(os.getenv('LATENT_CACHE_MAX_MB', '64')) * 1024 * 1024),
+            disk_dir=os.getenv('LATENT_CACHE_DIR') or None,
+            disk_max_bytes=int(float(os.getenv('LATENT_CACHE_DISK_MAX_MB', '1024')) * 1024 * 1024)
+        )
+        
+        # Memoized responses for seeded requests
+        self.response_cache = ResponseCache(
+            max_bytes=int(float(os.getenv('RESPONSE_CACHE_MAX_MB', '32')) * 1024 * 1024),
+            ttl=float(os.getenv('RESPONSE_CACHE_TTL', '600'))
+        )
+        
+        # Admission control in front of the models: bounded per-model
+        # queues, priority classes, deadlines and per-client caps
+        self.admission = AdmissionController(
+            slots=int(os.getenv('ADMISSION_SLOTS', str(self.batch_size * 2))),
+            queue_size=int(os.getenv('ADMISSION_QUEUE_SIZE', '32')),
+            max_per_client=int(os.getenv('ADMISSION_MAX_PER_CLIENT', '4')),
+            default_timeout=float(os.getenv('ADMISSION_DEFAULT_TIMEOUT', '60'))
+        )
+        
+        # Background jobs for long generations; bulk runs hold a worker
+        # for their whole run, so they get their own pool and queue
+        # beyond BULK_MAX_RUNS instead of blocking /api/jobs
+        self.jobs = JobStore(
+            max_workers=int(os.getenv('JOB_WORKERS', '2')),
+            max_jobs=int(os.getenv('JOB_MAX_COUNT', '1024')),
+            result_ttl=float(os.getenv('JOB_RESULT_TTL', '600')),
+            kind_workers={'bulk': int(os.getenv('BULK_MAX_RUNS', '1'))}
+        )
+        
+        # Longest a single poll may block on ?wait=
+        self.job_max_wait = float(os.getenv('JOB_MAX_WAIT', '30'))
+        
+        # Bulk runs over clip libraries: archives and checkpoints live in
+        # BULK_DIR so a resubmitted run picks up where it stopped
+        self.bulk_dir = os.getenv('BULK_DIR') or os.path.join(tempfile.gettempdir(), 'ableton2ml-bulk')
+        self.bulk_workers = int(os.getenv('BULK_WORKERS', str(self.batch_size * 2)))
+        # Run id -> (run, job); a run is active until its job is done
+        self.bulk_runs: Dict[str, Tuple[BulkRun, Job]] = {}
+        self.bulk_lock = threading.Lock()
+        
+        # Live-jamming continuation sessions
+        self.sessions = SessionStore(
+            idle_timeout=float(os.getenv('SESSION_IDLE_TIMEOUT', '600')),
+            max_sessions=int(os.getenv('SESSION_MAX_COUNT', '256')),
+            max_session_bytes=int(float(os.getenv('SESSION_MAX_KB', '1024')) * 1024)
+        )
+        
         # Initialize models
-        self.music_vae_model = None
-        self.music_transformer_model = None
-        self.models_loaded = False
+        self.transformer_steps_per_quarter = 4
+        self.gpu_devices: Optional[List[str]] = None
+        self._import_lock = threading.Lock()
+        self.model_dir = os.getenv('MODEL_DIR', '')
+        self.default_models = {
+            'music_vae': os.getenv('DEFAULT_MUSIC_VAE', 'cat-mel_2bar_big'),
+            'music_transformer': os.getenv('DEFAULT_MUSIC_TRANSFORMER', 'transformer_autoencoder')
+        }
+        
+        # Steady-state CPU serving: decode lengths are padded to a fixed
+        # set of buckets, every bucket is warmed up before a model is
+        # marked ready, and each model may get its own TF thread pools
+        self.transformer_length_buckets = parse_buckets(os.getenv('TRANSFORMER_LENGTH_BUCKETS'))
+        self.model_warmup = os.getenv('MODEL_WARMUP', '1') == '1'
+        self.intra_op_threads = int(os.getenv('MODEL_INTRA_OP_THREADS', '0'))
+        self.inter_op_threads = int(os.getenv('MODEL_INTER_OP_THREADS', '0'))
         
-        # Load models
+        # Opt-in reduced precision: serve exported float16/int8 weights
+        # (quantize_models.py) and/or run matmuls in bfloat16 on CPUs with
+        # AVX512-BF16/AMX. A catalog entry's ``variant``/``precision``
+        # overrides these per model
+        self.model_variant_default = os.getenv('MODEL_VARIANT', 'full')
+        self.model_precision_default = os.getenv('MODEL_PRECISION', 'float32')
+        
+        # Optional out-of-process inference: models run in dedicated
+        # processes pinned to core sets and fed through shared memory.
+        # They are forked here, before the registry and batchers start
+        # their threads.
+        self.catalog = self.load_model_catalog()
+        self.inference_pool: Optional[InferencePool] = None
+        inference_processes = int(os.getenv('INFERENCE_PROCESSES', '0'))
+        if inference_processes > 0:
+            self.inference_pool = InferencePool(
+                inference_processes,
+                self._load_in_worker,
+                core_sets=parse_core_sets(os.getenv('INFERENCE_CPU_SETS'), inference_processes),
+                ring_slots=int(os.getenv('INFERENCE_RING_SLOTS', '4')),
+                slot_bytes=int(float(os.getenv('INFERENCE_SLOT_MB', '8')) * 1024 * 1024)
+            )
+            self.inference_pool.start()
+            atexit.register(self.inference_pool.shutdown)
+        
+        # Load models in the background; routes answer 503 until ready
+        self.models = ModelRegistry(
+            max_workers=int(os.getenv('MODEL_LOAD_WORKERS', '2')),
+            retries=int(os.getenv('MODEL_LOAD_RETRIES', '3')),
+            retry_backoff=float(os.getenv('MODEL_LOAD_RETRY_BACKOFF', '5')),
+            retry_after=int(os.getenv('MODEL_RETRY_AFTER', '10')),
+            memory_budget=int(float(os.getenv('MODEL_MEMORY_BUDGET_MB', '0')) * 1024 * 1024)
+        )
+        self.register_models(self.catalog)
         self.load_models()
         
+        # Request-coalescing schedulers in front of each model; with an
+        # inference pool every process can run a batch at the same time
+        concurrency = self.inference_pool.processes if self.inference_pool else 1
+        self.vae_batcher = MicroBatcher(
+            'music_vae', self._run_vae_batch,
+            batch_size=self.batch_size, max_wait_ms=self.batch_max_wait_ms,
+            concurrency=concurrency
+        )
+        self.transformer_batcher = MicroBatcher(
+            'music_transformer', self._run_transformer_batch,
+            batch_size=self.batch_size, max_wait_ms=self.batch_max_wait_ms,
+            concurrency=concurrency
+        )
+        self.vae_batcher.start()
+        self.transformer_batcher.start()
+        self.variation_engine = VariationEngine(self.vae_batcher)
+        
         # Setup routes
+        METRICS.register_collector(self.collect_metrics)
         self.setup_routes()
     
-    def load_models(self):
-        """Load Google Magenta models"""
-        try:
-            logger.info("Loading Google Magenta models...")
-            
-            # Load MusicVAE model for variations
-            self.music_vae_model = TrainedModel(
-                configs.CONFIG_MAP['cat-mel_2bar_big'],
-                batch_size=4,
-                checkpoint_dir_or_path='cat-mel_2bar_big.ckpt'
-            )
-            
-            # Load Music Transformer model for continuation
-            bundle = sequence_generator_bundle.read_bundle_file(
-                'transformer_autoencoder.mag'
+    def collect_metrics(self):
+        """Queue, cache, job and model gauges sampled at scrape time"""
+        batchers = {
+            'music_vae': self.vae_batcher.stats(),
+            'music_transformer': self.transformer_batcher.stats()
+        }
+        yield 'batch_queue_depth', 'gauge', 'Rows waiting for a model batch', [
+            ({'batcher': name}, stats['queue_depth']) for name, stats in batchers.items()
+        ]
+        yield 'batches_total', 'counter', 'Model batches run', [
+            ({'batcher': name}, stats['batches']) for name, stats in batchers.items()
+        ]
+        yield 'batch_fill_ratio', 'gauge', 'Average fraction of batch slots used', [
+            ({'batcher': name}, stats['avg_batch_fill']) for name, stats in batchers.items()
+        ]
+        
+        cache = self.latent_cache.stats()
+        yield 'latent_cache_lookups_total', 'counter', 'Latent cache lookups by result', [
+            ({'result': 'hit'}, cache['hits']),
+            ({'result': 'disk_hit'}, cache['disk_hits']),
+            ({'result': 'miss'}, cache['misses'])
+        ]
+        yield 'latent_cache_bytes', 'gauge', 'Bytes held by the in-memory latent cache', [
+            ({}, cache['bytes'])
+        ]
+        
+        responses = self.response_cache.stats()
+        yield 'response_cache_lookups_total', 'counter', 'Seeded response cache lookups by result', [
+            ({'result': 'hit'}, responses['hits']),
+            ({'result': 'miss'}, responses['misses'])
+        ]
+        yield 'response_cache_bytes', 'gauge', 'Bytes held by the response cache', [
+            ({}, responses['bytes'])
+        ]
+        
+        jobs = self.jobs.stats()
+        yield 'jobs', 'gauge', 'Stored jobs by status', [
+            ({'status': status}, count) for status, count in jobs['by_status'].items()
+        ]
+        yield 'sessions', 'gauge', 'Open continuation sessions', [
+            ({}, self.sessions.stats()['active'])
+        ]
+        
+        admission = self.admission.stats()
+        yield 'admission_running', 'gauge', 'Admitted requests running per model', [
+            ({'model': name}, lane['running']) for name, lane in admission['models'].items()
+        ]
+        yield 'admission_waiting', 'gauge', 'Requests waiting for a model slot', [
+            ({'model': name, 'priority': priority}, count)
+            for name, lane in admission['models'].items()
+            for priority, count in lane['waiting_by_priority'].items()
+        ]
+        yield 'admission_rejected_total', 'counter', 'Requests rejected by admission control', [
+            ({'reason': reason}, count) for reason, count in admission['rejected'].items()
+        ]
+        
+        models = self.models.stats()['models']
+        yield 'model_ready', 'gauge', '1 when the model is resident and ready', [
+            ({'model': name}, int(info['state'] == 'ready')) for name, info in models.items()
+        ]
+        yield 'model_footprint_bytes', 'gauge', 'Estimated resident size of each loaded model', [
+            ({'model': name}, int(info['footprint_mb'] * 1024 * 1024))
+            for name, info in models.items() if info['resident']
+        ]
+    
+    @staticmethod
+    def load_model_catalog() -> List[Dict]:
+        """Model specs from MODEL_CATALOG (a JSON file) or the built-in table"""
+        catalog_path = os.getenv('MODEL_CATALOG')
+        if not catalog_path:
+            return DEFAULT_MODEL_CATALOG
+        with open(catalog_path) as catalog_file:
+            return json.load(catalog_file)
+    
+    def register_models(self, catalog: List[Dict]):
+        """Register every catalog entry with the model registry"""
+        loaders = {
+            'music_vae': self._load_music_vae,
+            'music_transformer': self._load_music_transformer
+        }
+        for spec in catalog:
+            if spec['kind'] not in loaders:
+                raise ValueError(f"Unknown model kind '{spec['kind']}' for {spec['name']}")
+            checkpoint = os.path.join(self.model_dir, spec['checkpoint'])
+            memory_mb = spec.get('memory_mb')
+            if spec['kind'] == 'music_vae':
+                self.vae_window_bars[spec['name']] = int(spec.get('bars', 2))
+            variant = self.model_variant(spec)
+            precision = self.model_precision(spec)
+            load_fn = partial(loaders[spec['kind']], spec, checkpoint)
+            unload_fn = None
+            # Every inference process holds its own copy of the weights
+            copies = 1
+            if self.inference_pool:
+                load_fn = partial(self._load_pooled, spec['name'])
+                unload_fn = lambda model: self.inference_pool.unload(model.name)
+                copies = self.inference_pool.processes
+            self.models.register(
+                spec['name'],
+                spec['kind'],
+                load_fn,
+                preload=spec.get('preload', False) or spec['name'] in self.default_models.values(),
+                footprint_fn=(
+                    None if memory_mb else
+                    lambda model, checkpoint=checkpoint, variant=variant, copies=copies:
+                        self.weights_bytes(checkpoint, variant) * copies
+                ),
+                estimated_bytes=int(memory_mb * copies * 1024 * 1024) if memory_mb else 0,
+                details={
+                    'checkpoint': spec['checkpoint'],
+                    'config': spec.get('config'),
+                    'bars': spec.get('bars'),
+                    'variant': variant or 'full',
+                    'precision': precision
+                },
+                unload_fn=unload_fn
             )
-            self.music_transformer_model = music_transformer.MusicTransformer(
-                model=bundle,
-                details=bundle.generator_details,
-                steps_per_quarter=4
+    
+    def model_variant(self, spec: Dict) -> Optional[str]:
+        """Exported weights to serve for a catalog entry, None for the full checkpoint"""
+        variant = spec.get('variant', self.model_variant_default) or 'full'
+        if variant == 'full':
+            return None
+        if variant not in VARIANTS:
+            raise ValueError(f"Unknown model variant '{variant}' for {spec['name']}")
+        return variant
+    
+    def model_precision(self, spec: Dict) -> str:
+        """Compute precision for a catalog entry: float32 or bfloat16"""
+        precision = spec.get('precision', self.model_precision_default) or 'float32'
+        if precision not in ('float32', 'bfloat16'):
+            raise ValueError(f"Unknown model precision '{precision}' for {spec['name']}")
+        return precision
+    
+    @staticmethod
+    def weights_bytes(checkpoint: str, variant: Optional[str]) -> int:
+        """Resident weight footprint; variant weights are held as float32 once loaded"""
+        if variant:
+            return read_variant_meta(variant_path(checkpoint, variant))['float32_bytes']
+        return checkpoint_bytes(checkpoint)
+    
+    def load_models(self):
+        """Start loading Google Magenta models in parallel background threads"""
+        logger.info("Loading Google Magenta models in the background...")
+        self.models.start()
+    
+    @property
+    def models_loaded(self) -> bool:
+        return self.models.all_ready()
+    
+    def _detect_gpus(self):
+        """Record GPU devices once TensorFlow has been imported"""
+        import tensorflow as tf
+        if self.gpu_devices is None:
+            self.gpu_devices = [
+                device.name for device in tf.config.list_physical_devices('GPU')
+            ]
+    
+    def _load_music_vae(self, spec: Dict, checkpoint: str, progress):
+        """Load a MusicVAE model for variations"""
+        progress('importing magenta', 0.1)
+        # Module imports are serialized; checkpoint restores run in parallel
+        with self._import_lock:
+            from magenta.models.music_vae import configs
+            from magenta.models.music_vae.trained_model import TrainedModel
+            self._detect_gpus()
+        
+        progress('restoring checkpoint', 0.4)
+        variant = self.model_variant(spec)
+        with tempfile.TemporaryDirectory() as directory:
+            if variant:
+                # The variant's weights are cast back to a float32 checkpoint
+                checkpoint = expand_variant(
+                    variant_path(checkpoint, variant), os.path.join(directory, 'model.ckpt')
+                )
+            model = TrainedModel(
+                configs.CONFIG_MAP[spec['config']],
+                batch_size=self.batch_size,
+                checkpoint_dir_or_path=checkpoint
             )
-            
-            self.models_loaded = True
-            logger.info("Models loaded successfully")
-            
-        except Exception as e:
-            logger.error(f"Error loading models: {e}")
-            self.models_loaded = False
+        
+        self._prepare_model(spec, model, progress)
+        if self.model_warmup:
+            progress('warming up', 0.8)
+            warm_up_music_vae(model, self.batch_size)
+        return model
+    
+    def _load_music_transformer(self, spec: Dict, checkpoint: str, progress):
+        """Load a Music Transformer model for continuation"""
+        progress('importing magenta', 0.1)
+        with self._import_lock:
+            from magenta.models.music_transformer import music_transformer
+            from magenta.models.shared import sequence_generator_bundle
+            self._detect_gpus()
+        
+        progress('reading bundle', 0.4)
+        variant = self.model_variant(spec)
+        bundle = (
+            expand_bundle(variant_path(checkpoint, variant)) if variant
+            else sequence_generator_bundle.read_bundle_file(checkpoint)
+        )
+        
+        progress('building model', 0.6)
+        model = music_transformer.MusicTransformer(
+            model=bundle,
+            details=bundle.generator_details,
+            steps_per_quarter=self.transformer_steps_per_quarter
+        )
+        
+        self._prepare_model(spec, model, progress)
+        if self.model_warmup:
+            progress('warming up', 0.8)
+            warm_up_music_transformer(model, self.transformer_length_buckets)
+        return model
+    
+    def _load_pooled(self, name: str, progress) -> PooledModel:
+        """Load a model in every inference process"""
+        progress('loading in inference processes', 0.1)
+        self.inference_pool.load(name)
+        return PooledModel(self.inference_pool, name)
+    
+    def _load_in_worker(self, name: str):
+        """Load a catalog model inside an inference process"""
+        spec = next(spec for spec in self.catalog if spec['name'] == name)
+        if not self.intra_op_threads and hasattr(os, 'sched_getaffinity'):
+            # One TF intra-op thread per core the process is pinned to
+            spec = {'intra_op_threads': len(os.sched_getaffinity(0)), **spec}
+        loader = self._load_music_vae if spec['kind'] == 'music_vae' else self._load_music_transformer
+        return loader(spec, os.path.join(self.model_dir, spec['checkpoint']), lambda stage, fraction: None)
+    
+    def _prepare_model(self, spec: Dict, model, progress):
+        """Give a model its own intra/inter-op thread pools and precision when configured"""
+        intra = int(spec.get('intra_op_threads', self.intra_op_threads))
+        inter = int(spec.get('inter_op_threads', self.inter_op_threads))
+        bfloat16 = self.model_precision(spec) == 'bfloat16'
+        if intra or inter or bfloat16:
+            progress('configuring session', 0.7)
+            if not apply_session_config(model, intra, inter, bfloat16):
+                logger.warning(f"Model '{spec['name']}' has no session; thread and precision settings ignored")
+    
+    def model_name(self, kind: str, data: Optional[Dict] = None) -> str:
+        """Model requested through the ``model`` parameter, or the default for ``kind``"""
+        return (data or {}).get('model') or self.default_models[kind]
+    
+    def model_unavailable(self, kind: str, data: Optional[Dict] = None):
+        """Error response when the requested model is unknown or not loaded yet, else None"""
+        name = self.model_name(kind, data)
+        try:
+            if self.models.kind_of(name) != kind:
+                raise UnknownModel(name)
+            self.models.require(name)
+        except UnknownModel:
+            return jsonify({
+                'error': f"Unknown {kind} model: {name}",
+                'available': self.models.names(kind)
+            }), 400
+        except ModelNotReady as e:
+            return self.not_ready_response(e)
+        return None
     
     def setup_routes(self):
         """Setup Flask routes"""
         
+        @self.app.before_request
+        def start_timer():
+            g.request_started = time.perf_counter()
+        
+        @self.app.after_request
+        def record_request(response):
+            started = g.get('request_started')
+            if started is not None:
+                # Route templates keep job and session ids out of the labels
+                endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+                METRICS.observe_request(
+                    endpoint, request.method, response.status_code,
+                    time.perf_counter() - started
+                )
+            return response
+        
+        @self.app.route('/metrics', methods=['GET'])
+        def get_metrics():
+            """Prometheus metrics"""
+            return Response(METRICS.render(), content_type=PROMETHEUS_MIMETYPE)
+        
         @self.app.route('/api/status', methods=['GET'])
         def get_status():
             """Get server status"""
             return jsonify({
                 'status': 'running',
                 'models_loaded': self.models_loaded,
+                'model_loading': self.models.stats(),
                 'timestamp': datetime.now().isoformat(),
-                'gpu_available': tf.config.list_physical_devices('GPU'),
-                'hf_token_loaded': bool(self.hf_token)
+                'gpu_available': self.gpu_devices,
+                'hf_token_loaded': bool(self.hf_token),
+                'latent_cache': self.latent_cache.stats(),
+                'response_cache': self.response_cache.stats(),
+                'sessions': self.sessions.stats(),
+                'jobs': self.jobs.stats(),
+                'admission': self.admission.stats(),
+                'inference_pool': self.inference_pool.stats() if self.inference_pool else None,
+                'bulk_runs': {run_id: run.stats() for run_id, run in self.active_bulk_runs().items()},
+                'stages': METRICS.stage_summary(),
+                'limits': {endpoint: limits.info() for endpoint, limits in self.limits.items()},
+                'batching': {
+                    'music_vae': self.vae_batcher.stats(),
+                    'music_transformer': self.transformer_batcher.stats()
+                }
             })
         
+        @self.app.route('/api/ready', methods=['GET'])
+        def get_ready():
+            """Readiness probe: 200 once every model is loaded"""
+            stats = self.models.stats()
+            if stats['ready']:
+                return jsonify({'status': 'ready', **stats})
+            return jsonify({'status': 'loading', **stats}), 503, {
+                'Retry-After': str(self.models.retry_after_default)
+            }
+        
         @self.app.route('/api/models', methods=['GET'])
         def get_models():
             """Get available models"""
+            registry = self.models.stats()
             return jsonify({
-                'models': {
-                    'music_vae': 'cat-mel_2bar_big',
-                    'music_transformer': 'transformer_autoencoder'
+                'models': self.default_models,
+                'registry': registry['models'],
+                'memory': {
+                    'budget_mb': registry['memory_budget_mb'],
+                    'resident_mb': registry['resident_mb'],
+                    'evictions': registry['evictions']
                 },
                 'capabilities': {
                     'variation': 'Generate variations of MIDI sequences',
+                    'interpolation': 'Morph between MIDI sequences in latent space',
                     'continuation': 'Continue MIDI sequences',
                     'new_track': 'Generate new tracks based on context'
                 }
@@ -124,68 +591,111 @@ class MagentaServer:
         def generate_variation():
             """Generate variations of MIDI sequence"""
             try:
-                data = request.get_json()
-                midi_data = data.get('midi_data')
-                num_variations = data.get('num_variations', 3)
-                creativity_level = data.get('creativity_level', 0.8)
-                style_preset = data.get('style_preset', 'electronic')
+                data, midi_bytes = self.limits['variation'].read(request)
                 
-                if not midi_data:
+                if not midi_bytes:
                     return jsonify({'error': 'No MIDI data provided'}), 400
                 
-                # Decode MIDI data
-                midi_bytes = base64.b64decode(midi_data)
-                
-                # Generate variations
-                variations = self.generate_music_vae_variations(
-                    midi_bytes, num_variations, creativity_level
-                )
+                unavailable = self.model_unavailable('music_vae', data)
+                if unavailable:
+                    return unavailable
                 
-                return jsonify({
-                    'status': 'success',
-                    'variations': variations,
-                    'generation_params': {
-                        'num_variations': num_variations,
-                        'creativity_level': creativity_level,
-                        'style_preset': style_preset
-                    }
-                })
+                body = self.memoized('variation', data, midi_bytes, lambda: self.run_admitted(
+                    self.model_name('music_vae', data), STANDARD, data,
+                    lambda: self.variation_response(data, midi_bytes)
+                ))
+                return make_response(request, body)
                 
+            except TransportError as e:
+                return jsonify({'error': str(e)}), e.status_code
+            except AdmissionRejected as e:
+                return self.rejection_response(e)
+            except ModelNotReady as e:
+                return self.not_ready_response(e)
             except Exception as e:
                 logger.error(f"Error generating variation: {e}")
                 return jsonify({'error': str(e)}), 500
         
+        @self.app.route('/api/generate/interpolation', methods=['POST'])
+        def generate_interpolation():
+            """Morph between two or more clips in MusicVAE latent space"""
+            try:
+                data, _ = self.limits['interpolation'].read(request)
+                
+                clips = data.get('clips') or []
+                if len(clips) < 2:
+                    return jsonify({'error': 'At least two clips are required'}), 400
+                method = data.get('method', 'slerp')
+                if method not in ('linear', 'slerp'):
+                    return jsonify({'error': f'Unknown interpolation method: {method}'}), 400
+                
+                unavailable = self.model_unavailable('music_vae', data)
+                if unavailable:
+                    return unavailable
+                
+                body = self.memoized('interpolation', data, None, lambda: self.run_admitted(
+                    self.model_name('music_vae', data), STANDARD, data,
+                    lambda: self.interpolation_response(data)
+                ))
+                return make_response(request, body)
+                
+            except TransportError as e:
+                return jsonify({'error': str(e)}), e.status_code
+            except AdmissionRejected as e:
+                return self.rejection_response(e)
+            except ModelNotReady as e:
+                return self.not_ready_response(e)
+            except Exception as e:
+                logger.error(f"Error generating interpolation: {e}")
+                return jsonify({'error': str(e)}), 500
+        
         @self.app.route('/api/generate/continuation', methods=['POST'])
         def generate_continuation():
             """Continue MIDI sequence"""
             try:
-                data = request.get_json()
-                midi_data = data.get('midi_data')
-                target_length = data.get('target_length', 16)
-                target_instrument = data.get('target_instrument', 'piano')
-                style_preset = data.get('style_preset', 'jazz')
+                data, midi_bytes = self.limits['continuation'].read(request)
                 
-                if not midi_data:
+                if not midi_bytes:
                     return jsonify({'error': 'No MIDI data provided'}), 400
                 
-                # Decode MIDI data
-                midi_bytes = base64.b64decode(midi_data)
+                unavailable = self.model_unavailable('music_transformer', data)
+                if unavailable:
+                    return unavailable
                 
-                # Generate continuation
-                continuation = self.generate_music_transformer_continuation(
-                    midi_bytes, target_length, target_instrument
-                )
+                model_name = self.model_name('music_transformer', data)
                 
-                return jsonify({
-                    'status': 'success',
-                    'continuation': continuation,
-                    'generation_params': {
-                        'target_length': target_length,
-                        'target_instrument': target_instrument,
-                        'style_preset': style_preset
-                    }
-                })
+                # Stream bar-sized fragments as they are decoded
+                if wants_stream(data, request.headers.get('Accept')):
+                    target_length = data.get('target_length', 16)
+                    target_instrument = data.get('target_instrument', 'piano')
+                    chunk_length = int(data.get('stream_chunk_steps', self.stream_chunk_steps))
+                    ticket = self.admission.acquire(
+                        model_name, self.request_client(), INTERACTIVE, self.request_timeout(data)
+                    )
+                    fragments = self.stream_music_transformer_continuation(
+                        midi_bytes, target_length, target_instrument, chunk_length, model_name
+                    )
+                    response = Response(
+                        stream_with_context(iter_sse(fragments)),
+                        mimetype=SSE_MIMETYPE,
+                        headers=SSE_HEADERS
+                    )
+                    # The slot is held until the stream is finished or dropped
+                    response.call_on_close(lambda: self.admission.release(ticket))
+                    return response
+                
+                body = self.memoized('continuation', data, midi_bytes, lambda: self.run_admitted(
+                    model_name, INTERACTIVE, data,
+                    lambda: self.continuation_response(data, midi_bytes)
+                ))
+                return make_response(request, body)
                 
+            except TransportError as e:
+                return jsonify({'error': str(e)}), e.status_code
+            except AdmissionRejected as e:
+                return self.rejection_response(e)
+            except ModelNotReady as e:
+                return self.not_ready_response(e)
             except Exception as e:
                 logger.error(f"Error generating continuation: {e}")
                 return jsonify({'error': str(e)}), 500
@@ -194,34 +704,294 @@ class MagentaServer:
         def generate_new_track():
             """Generate new track based on context"""
             try:
-                data = request.get_json()
-                context_tracks = data.get('context_tracks', [])
-                target_instrument = data.get('target_instrument', 'lead_synth')
-                style_preset = data.get('style_preset', 'pop')
-                track_length = data.get('track_length', 32)
+                data, _ = self.limits['new_track'].read(request)
                 
-                if not context_tracks:
+                if not data.get('context_tracks'):
                     return jsonify({'error': 'No context tracks provided'}), 400
                 
-                # Generate new track
-                new_track = self.generate_new_track_from_context(
-                    context_tracks, target_instrument, track_length
+                unavailable = self.model_unavailable('music_transformer', data)
+                if unavailable:
+                    return unavailable
+                
+                body = self.memoized('new_track', data, None, lambda: self.run_admitted(
+                    self.model_name('music_transformer', data), BULK, data,
+                    lambda: self.new_track_response(data)
+                ))
+                return make_response(request, body)
+                
+            except TransportError as e:
+                return jsonify({'error': str(e)}), e.status_code
+            except AdmissionRejected as e:
+                return self.rejection_response(e)
+            except ModelNotReady as e:
+                return self.not_ready_response(e)
+            except Exception as e:
+                logger.error(f"Error generating new track: {e}")
+                return jsonify({'error': str(e)}), 500
+        
+        @self.app.route('/api/jobs/<kind>', methods=['POST'])
+        def submit_job(kind):
+            """Submit a generation as a background job"""
+            try:
+                if kind not in ('variation', 'continuation', 'new_track'):
+                    return jsonify({'error': f'Unknown job kind: {kind}'}), 404
+                
+                data, midi_bytes = self.limits[kind].read(request)
+                model_kind = 'music_vae' if kind == 'variation' else 'music_transformer'
+                unavailable = self.model_unavailable(model_kind, data)
+                if unavailable:
+                    return unavailable
+                
+                if kind == 'new_track':
+                    if not data.get('context_tracks'):
+                        return jsonify({'error': 'No context tracks provided'}), 400
+                    build = lambda: self.new_track_response(data)
+                elif not midi_bytes:
+                    return jsonify({'error': 'No MIDI data provided'}), 400
+                elif kind == 'variation':
+                    build = lambda: self.variation_response(data, midi_bytes)
+                else:
+                    build = lambda: self.continuation_response(data, midi_bytes)
+                
+                # Jobs are already bounded by the job workers; they queue
+                # behind interactive work without a deadline
+                model_name = self.model_name(model_kind, data)
+                client = self.request_client()
+                run = lambda: self.memoized(kind, data, midi_bytes, lambda: self.run_admitted(
+                    model_name, BULK, data, build, client=client, bounded=False
+                ))
+                
+                # Unseeded payloads ask for fresh material, so only an
+                # in-flight twin is joined, never a stored result
+                job = self.jobs.submit(
+                    kind, payload_key(kind, data, midi_bytes), run,
+                    reuse_result=self.request_seed(data) is not None
                 )
                 
+                return jsonify({
+                    'status': 'accepted',
+                    'job': job.info(),
+                    'status_url': f'/api/jobs/{job.job_id}'
+                }), 202
+                
+            except TransportError as e:
+                return jsonify({'error': str(e)}), e.status_code
+            except JobStoreFull as e:
+                return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+            except Exception as e:
+                logger.error(f"Error submitting job: {e}")
+                return jsonify({'error': str(e)}), 500
+        
+        @self.app.route('/api/jobs/<job_id>', methods=['GET'])
+        def get_job(job_id):
+            """Poll a job, optionally waiting up to ?wait=seconds for it to finish"""
+            wait = request.args.get('wait', '0')
+            try:
+                wait = float(wait)
+            except ValueError:
+                wait = math.nan
+            if math.isnan(wait):
+                return jsonify({'error': f"wait must be a number of seconds, got {request.args['wait']!r}"}), 400
+            wait = min(wait, self.job_max_wait) if wait > 0 else 0.0
+            job = self.jobs.wait(job_id, wait)
+            if job is None:
+                return jsonify({'error': 'Job not found'}), 404
+            
+            if job.status == SUCCEEDED:
+                return make_response(request, {**job.result, 'job': job.info()})
+            return jsonify({'status': job.status, 'job': job.info()})
+        
+        @self.app.route('/api/jobs/<job_id>', methods=['DELETE'])
+        def cancel_job(job_id):
+            """Cancel a queued job"""
+            job = self.jobs.cancel(job_id)
+            if job is None:
+                return jsonify({'error': 'Job not found'}), 404
+            return jsonify({'status': job.status, 'job': job.info()})
+        
+        @self.app.route('/api/bulk/<kind>', methods=['POST'])
+        def submit_bulk(kind):
+            """Start or resume a bulk run of a clip library over a parameter grid"""
+            try:
+                if kind not in GRID_AXES:
+                    return jsonify({'error': f'Unknown bulk kind: {kind}'}), 404
+                
+                limits = self.limits['bulk']
+                data, _ = limits.read(request)
+                model_kind = 'music_vae' if kind == 'variation' else 'music_transformer'
+                unavailable = self.model_unavailable(model_kind, data)
+                if unavailable:
+                    return unavailable
+                
+                if data.get('archive_data'):
+                    inputs = read_archive(decode_midi_field(data['archive_data']))
+                    limits.check_count('bulk_inputs', len(inputs), 'MIDI files')
+                    for _, midi_bytes in inputs:
+                        limits.check_midi(midi_bytes)
+                else:
+                    files = data.get('midi_files', [])
+                    limits.check_count('bulk_inputs', len(files), 'MIDI files')
+                    inputs = [(item['name'], limits.decode_midi(item['midi_data'])) for item in files]
+                if not inputs:
+                    return jsonify({'error': 'No MIDI files provided'}), 400
+                
+                # Checked values replace the grid's, so 2.0 variations run as 2
+                grid = dict(data.get('grid') or {})
+                for field, axis in GRID_AXES[kind].items():
+                    if axis in grid:
+                        values = grid[axis] if isinstance(grid[axis], (list, tuple)) else [grid[axis]]
+                        grid[axis] = [limits.check_number(field, value) for value in values]
+                tasks = build_tasks(kind, inputs, grid)
+                model_name = self.model_name(model_kind, data)
+                run_id = payload_key(
+                    f'bulk_{kind}', {'model': model_name, 'tasks': [task.key for task in tasks]}
+                )
+                
+                client = self.request_client()
+                with self.bulk_lock:
+                    run = self.active_bulk_runs_locked().get(run_id)
+                    if run is None:
+                        run = BulkRun(
+                            kind, os.path.join(self.bulk_dir, f'{run_id}.tar'), tasks,
+                            self.bulk_workers, params={'model': model_name, 'grid': grid}
+                        )
+                    # A finished run is its archive, so resubmitting it is a
+                    # no-op, unless its checkpoint records failed tasks to retry
+                    job = self.jobs.submit(
+                        'bulk', run_id, partial(self.run_bulk, run_id, run, model_name, client),
+                        reuse_result=not run.stats()['failed']
+                    )
+                    self.bulk_runs[run_id] = (run, job)
+                
+                return jsonify({
+                    'status': 'accepted',
+                    'run_id': run_id,
+                    'tasks': len(tasks),
+                    'job': job.info(),
+                    'status_url': f'/api/bulk/{run_id}',
+                    'archive_url': f'/api/bulk/{run_id}/archive'
+                }), 202
+                
+            except (TransportError, ValueError) as e:
+                return jsonify({'error': str(e)}), getattr(e, 'status_code', 400)
+            except JobStoreFull as e:
+                return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+            except Exception as e:
+                logger.error(f"Error submitting bulk run: {e}")
+                return jsonify({'error': str(e)}), 500
+        
+        @self.app.route('/api/bulk/<run_id>', methods=['GET'])
+        def get_bulk(run_id):
+            """Progress of a bulk run"""
+            run = self.active_bulk_runs().get(run_id)
+            if run is not None:
+                return jsonify({'run_id': run_id, **run.stats()})
+            path = self.bulk_path(run_id)
+            stats = checkpoint_stats(path) if path else None
+            if stats is None:
+                return jsonify({'error': 'Bulk run not found'}), 404
+            return jsonify({'run_id': run_id, **stats})
+        
+        @self.app.route('/api/bulk/<run_id>/archive', methods=['GET'])
+        def get_bulk_archive(run_id):
+            """Download a finished bulk run's archive"""
+            path = self.bulk_path(run_id)
+            stats = checkpoint_stats(path) if path else None
+            if stats is None:
+                return jsonify({'error': 'Bulk run not found'}), 404
+            if not stats['complete'] or run_id in self.active_bulk_runs():
+                return jsonify({'error': 'Bulk run has not finished', **stats}), 409
+            return send_file(
+                path, mimetype='application/x-tar', as_attachment=True, download_name=f'{run_id}.tar'
+            )
+        
+        @self.app.route('/api/sessions', methods=['POST'])
+        def create_session():
+            """Open a continuation session on a primer clip"""
+            try:
+                data, midi_bytes = self.limits['session'].read(request)
+                target_instrument = data.get('target_instrument', 'piano')
+                
+                if not midi_bytes:
+                    return jsonify({'error': 'No MIDI data provided'}), 400
+                
+                # The model may still be loading; it only has to exist
+                model_name = self.model_name('music_transformer', data)
+                if model_name not in self.models.names('music_transformer'):
+                    return jsonify({
+                        'error': f"Unknown music_transformer model: {model_name}",
+                        'available': self.models.names('music_transformer')
+                    }), 400
+                
+                session = self.sessions.create(self.parse_midi(midi_bytes), target_instrument, model_name)
+                
                 return jsonify({
                     'status': 'success',
-                    'new_track': new_track,
-                    'generation_params': {
-                        'target_instrument': target_instrument,
-                        'style_preset': style_preset,
-                        'track_length': track_length
-                    }
+                    'session': session.info()
+                }), 201
+                
+            except TransportError as e:
+                return jsonify({'error': str(e)}), e.status_code
+            except Exception as e:
+                logger.error(f"Error creating session: {e}")
+                return jsonify({'error': str(e)}), 500
+        
+        @self.app.route('/api/sessions/<session_id>', methods=['GET'])
+        def get_session(session_id):
+            """Get continuation session state"""
+            session = self.sessions.get(session_id)
+            if session is None:
+                return jsonify({'error': 'Session not found'}), 404
+            return jsonify({'status': 'success', 'session': session.info()})
+        
+        @self.app.route('/api/sessions/<session_id>/extend', methods=['POST'])
+        def extend_session(session_id):
+            """Append new events to a session and continue it"""
+            try:
+                session = self.sessions.get(session_id)
+                if session is None:
+                    return jsonify({'error': 'Session not found'}), 404
+                
+                unavailable = self.model_unavailable('music_transformer', {'model': session.model_name})
+                if unavailable:
+                    return unavailable
+                
+                # Only the newly appended events are sent and decoded
+                data, midi_bytes = self.limits['session'].read(request)
+                target_length = data.get('target_length', 16)
+                offset = data.get('offset')
+                keep_generated = bool(data.get('keep_generated', False))
+                
+                continuation = self.run_admitted(
+                    session.model_name, INTERACTIVE, data,
+                    lambda: self.extend_continuation_session(
+                        session, midi_bytes, target_length, offset, keep_generated
+                    )
+                )
+                
+                return make_response(request, {
+                    'status': 'success',
+                    'continuation': continuation,
+                    'session': session.info()
                 })
                 
+            except TransportError as e:
+                return jsonify({'error': str(e)}), e.status_code
+            except AdmissionRejected as e:
+                return self.rejection_response(e)
+            except ModelNotReady as e:
+                return self.not_ready_response(e)
             except Exception as e:
-                logger.error(f"Error generating new track: {e}")
+                logger.error(f"Error extending session: {e}")
                 return jsonify({'error': str(e)}), 500
         
+        @self.app.route('/api/sessions/<session_id>', methods=['DELETE'])
+        def close_session(session_id):
+            """Close a continuation session"""
+            if not self.sessions.close(session_id):
+                return jsonify({'error': 'Session not found'}), 404
+            return jsonify({'status': 'success', 'session_id': session_id})
+        
         @self.app.route('/api/hf/status', methods=['GET'])
         def get_hf_status():
             """Get Hugging Face token status and test connection"""
@@ -262,37 +1032,266 @@ class MagentaServer:
                     'message': f'Error checking HF status: {str(e)}'
                 }), 500
     
+    def request_client(self) -> str:
+        """Client identity for per-client caps: X-Client-Id, else the peer address"""
+        return request.headers.get('X-Client-Id') or request.remote_addr or 'anonymous'
+    
+    def request_timeout(self, data: Dict) -> Optional[float]:
+        """Client's timeout in seconds from X-Request-Timeout or ``timeout_seconds``"""
+        value = request.headers.get('X-Request-Timeout') or data.get('timeout_seconds')
+        return float(value) if value is not None else None
+    
+    def run_admitted(
+        self,
+        model_name: str,
+        priority: int,
+        data: Dict,
+        build,
+        client: Optional[str] = None,
+        bounded: bool = True
+    ):
+        """Run ``build()`` once the admission controller grants a slot on the model"""
+        timeout = self.request_timeout(data) if bounded else 0
+        with self.admission.admit(
+            model_name, client or self.request_client(), priority, timeout, bounded
+        ):
+            return build()
+    
+    @staticmethod
+    def request_seed(data: Dict) -> Optional[int]:
+        """Optional integer ``seed`` making a request's sampling reproducible"""
+        seed = data.get('seed')
+        if seed is None:
+            return None
+        try:
+            return int(seed)
+        except (TypeError, ValueError):
+            raise TransportError(f'seed must be an integer, got {seed!r}')
+    
+    def memoized(self, kind: str, data: Dict, midi_bytes: Optional[bytes], build) -> Dict:
+        """Serve a seeded request from the response cache, else ``build()`` and cache it"""
+        if self.request_seed(data) is None:
+            return build()
+        model_kind = 'music_transformer' if kind in ('continuation', 'new_track') else 'music_vae'
+        key = self.response_cache.make_key(kind, self.model_name(model_kind, data), data, midi_bytes)
+        body = self.response_cache.get(key)
+        if body is None:
+            body = build()
+            self.response_cache.put(key, body)
+        return body
+    
+    @staticmethod
+    def rejection_response(error: AdmissionRejected):
+        """429/503 for a request turned away by admission control"""
+        return (
+            jsonify({'error': str(error), 'reason': error.reason}),
+            error.status_code,
+            {'Retry-After': str(error.retry_after)}
+        )
+    
+    @staticmethod
+    def not_ready_response(error: ModelNotReady):
+        """503 for a model that is not loaded, including one evicted after admission"""
+        return (
+            jsonify({'error': str(error), 'model': error.name, 'state': error.state}),
+            503,
+            {'Retry-After': str(error.retry_after)}
+        )
+    
+    def bulk_path(self, run_id: str) -> Optional[str]:
+        """Archive path for a run id, or None when the id is not one we issue"""
+        if not re.fullmatch(r'[0-9a-f]{64}', run_id):
+            return None
+        return os.path.join(self.bulk_dir, f'{run_id}.tar')
+    
+    def run_bulk(self, run_id: str, run: BulkRun, model_name: str, client: str) -> Dict:
+        """Body of a bulk job: every task queues behind interactive work like other jobs"""
+        build = self.variation_response if run.kind == 'variation' else self.continuation_response
+        
+        def generate(task):
+            data = {**task.params, 'model': model_name}
+            return self.run_admitted(
+                model_name, BULK, data, lambda: build(data, task.midi_bytes),
+                client=client, bounded=False
+            )
+        
+        os.makedirs(self.bulk_dir, exist_ok=True)
+        return {'status': 'success', 'run_id': run_id, **run.run(generate)}
+    
+    def active_bulk_runs_locked(self) -> Dict[str, BulkRun]:
+        """Bulk runs whose job has not finished, dropping the rest; needs ``bulk_lock``"""
+        for run_id in [run_id for run_id, (_, job) in self.bulk_runs.items() if job.done.is_set()]:
+            del self.bulk_runs[run_id]
+        return {run_id: run for run_id, (run, _) in self.bulk_runs.items()}
+    
+    def active_bulk_runs(self) -> Dict[str, BulkRun]:
+        """Bulk runs whose job has not finished"""
+        with self.bulk_lock:
+            return self.active_bulk_runs_locked()
+    
+    def variation_response(self, data: Dict, midi_bytes: bytes) -> Dict:
+        """Run a variation request and build its response body"""
+        num_variations = data.get('num_variations', 3)
+        creativity_level = data.get('creativity_level', 0.8)
+        style_preset = data.get('style_preset', 'electronic')
+        model_name = self.model_name('music_vae', data)
+        seed = self.request_seed(data)
+        
+        # Generate variations
+        variations = self.generate_music_vae_variations(
+            midi_bytes, num_variations, creativity_level, model_name, seed
+        )
+        
+        return {
+            'status': 'success',
+            'variations': variations,
+            'generation_params': {
+                'num_variations': num_variations,
+                'creativity_level': creativity_level,
+                'style_preset': style_preset,
+                'model': model_name,
+                'seed': seed
+            }
+        }
+    
+    def interpolation_response(self, data: Dict) -> Dict:
+        """Run an interpolation request and build its response body"""
+        clips = data.get('clips', [])
+        num_steps = int(data.get('num_steps', 5))
+        method = data.get('method', 'slerp')
+        creativity_level = data.get('creativity_level', 0.0)
+        model_name = self.model_name('music_vae', data)
+        
+        # Generate interpolation
+        steps = self.generate_music_vae_interpolation(
+            [decode_midi_field(clip['midi_data']) for clip in clips],
+            num_steps, method, creativity_level, model_name
+        )
+        
+        return {
+            'status': 'success',
+            'interpolation': steps,
+            'generation_params': {
+                'clips': len(clips),
+                'num_steps': num_steps,
+                'method': method,
+                'creativity_level': creativity_level,
+                'model': model_name,
+                'seed': self.request_seed(data)
+            }
+        }
+    
+    def continuation_response(self, data: Dict, midi_bytes: bytes) -> Dict:
+        """Run a continuation request and build its response body"""
+        target_length = data.get('target_length', 16)
+        target_instrument = data.get('target_instrument', 'piano')
+        style_preset = data.get('style_preset', 'jazz')
+        model_name = self.model_name('music_transformer', data)
+        seed = self.request_seed(data)
+        
+        # Generate continuation
+        continuation = self.generate_music_transformer_continuation(
+            midi_bytes, target_length, target_instrument, model_name, seed
+        )
+        
+        return {
+            'status': 'success',
+            'continuation': continuation,
+            'generation_params': {
+                'target_length': target_length,
+                'target_instrument': target_instrument,
+                'style_preset': style_preset,
+                'model': model_name,
+                'seed': seed
+            }
+        }
+    
+    def new_track_response(self, data: Dict) -> Dict:
+        """Run a new-track request and build its response body"""
+        context_tracks = data.get('context_tracks', [])
+        target_instrument = data.get('target_instrument', 'lead_synth')
+        style_preset = data.get('style_preset', 'pop')
+        track_length = data.get('track_length', 32)
+        model_name = self.model_name('music_transformer', data)
+        seed = self.request_seed(data)
+        
+        # Generate new track
+        new_track = self.generate_new_track_from_context(
+            context_tracks, target_instrument, track_length, model_name, seed
+        )
+        
+        return {
+            'status': 'success',
+            'new_track': new_track,
+            'generation_params': {
+                'target_instrument': target_instrument,
+                'style_preset': style_preset,
+                'track_length': track_length,
+                'model': model_name,
+                'seed': seed
+            }
+        }
+    
     def generate_music_vae_variations(
         self, 
         midi_bytes: bytes, 
         num_variations: int, 
-        creativity_level: float
+        creativity_level: float,
+        model_name: Optional[str] = None,
+        seed: Optional[int] = None
     ) -> List[Dict]:
         """Generate variations using MusicVAE"""
         try:
-            # Convert MIDI to NoteSequence
-            midi_file = pretty_midi.PrettyMIDI(midi_bytes)
-            note_sequence = midi_file.to_sequence()
+            model_name = model_name or self.default_models['music_vae']
+            rng = np.random.default_rng(seed) if seed is not None else None
+            
+            # Look up cached latents by the raw bytes first, so a hit
+            # skips MIDI parsing as well as encoding; a clip within the
+            # model's window is cached under the same key interpolation uses
+            cache_key = self.latent_cache.make_key(midi_bytes, model_name)
+            encoding = self.latent_cache.get(cache_key, count_miss=False)
+            if encoding is None:
+                windowed_key = self.latent_cache.make_key(
+                    midi_bytes, f'{model_name}/{self.vae_window_bars.get(model_name, 2)}bar'
+                )
+                encoding = self.latent_cache.get(windowed_key)
+            if encoding is None:
+                # Split clips longer than the model's window into bar windows
+                table = self.parse_midi(midi_bytes)
+                window_seconds = self.vae_window_bars.get(model_name, 2) * 4 * 60.0 / table.qpm
+                windows = split_windows(table, window_seconds)
+                if len(windows) > 1:
+                    filled = [index for index, window in enumerate(windows) if len(window)]
+                    if not filled:
+                        raise ValueError('MIDI clip has no notes to vary')
+                    layout = {
+                        'windows': len(windows),
+                        'filled': filled,
+                        'window_seconds': window_seconds,
+                        'tempos': [list(tempo) for tempo in table.tempos]
+                    }
+                    encoding = self.variation_engine.encode_batch(
+                        [windows[index] for index in filled], model_name
+                    ) + (layout,)
+                    self.latent_cache.put(windowed_key, encoding)
+                else:
+                    encoding = self.variation_engine.encode(table, model_name)
+                    self.latent_cache.put(cache_key, encoding)
+            if len(encoding) > 3:
+                return self.generate_windowed_variations(
+                    encoding[:3], encoding[3], num_variations, creativity_level, model_name, rng
+                )
+            
+            # Sample all latents as one batch, decode in batched passes
+            generated_tables, temperature = self.variation_engine.generate_from_encoding(
+                encoding, num_variations, creativity_level, model_name, rng
+            )
             
-            # Generate variations
             variations = []
-            for i in range(num_variations):
-                # Set temperature based on creativity level
-                temperature = 0.5 + (creativity_level * 0.5)
-                
-                # Generate variation
-                generated_sequence = self.music_vae_model.interpolate(
-                    [note_sequence], 
-                    length=num_variations,
-                    temperature=temperature
-                )[i]
-                
+            for i, generated_table in enumerate(generated_tables):
                 # Convert back to MIDI
-                midi_data = self.sequence_to_midi(generated_sequence)
-                midi_base64 = base64.b64encode(midi_data).decode('utf-8')
-                
                 variations.append({
-                    'midi_data': midi_base64,
+                    'midi_data': self.note_table_to_midi(generated_table),
                     'variation_id': i + 1,
                     'temperature': temperature
                 })
@@ -303,31 +1302,135 @@ class MagentaServer:
             logger.error(f"Error in MusicVAE generation: {e}")
             raise
     
+    def generate_windowed_variations(
+        self,
+        encoding: Tuple[np.ndarray, np.ndarray, np.ndarray],
+        layout: Dict,
+        num_variations: int,
+        creativity_level: float,
+        model_name: str,
+        rng: Optional[np.random.Generator] = None
+    ) -> List[Dict]:
+        """Variations of a clip longer than the model's window, one window at a time.
+
+        Windows with notes are encoded as one batch and every variation's
+        windows are decoded as one batch; silent windows stay silent.
+        The decoded windows are stitched back at the clip's tempo.
+        ``encoding`` holds one row per filled window and ``layout`` records
+        where those windows sit in the clip, so no re-parse is needed.
+        """
+        filled = layout['filled']
+        tempos = [tuple(tempo) for tempo in layout['tempos']]
+        
+        generated, temperature = self.variation_engine.generate_windows(
+            encoding, num_variations, creativity_level, model_name,
+            self.vae_window_correlation, rng
+        )
+        
+        variations = []
+        for i, decoded_windows in enumerate(generated):
+            parts = [NoteTable.empty()] * layout['windows']
+            for index, decoded in zip(filled, decoded_windows):
+                parts[index] = decoded
+            with timed('midi_serialize'):
+                stitched = stitch_windows(parts, layout['window_seconds'], tempos)
+                midi_data = write_midi(stitched)
+            variations.append({
+                'midi_data': midi_data,
+                'variation_id': i + 1,
+                'temperature': temperature,
+                'windows': layout['windows']
+            })
+        
+        return variations
+    
+    def generate_music_vae_interpolation(
+        self,
+        clips: List[bytes],
+        num_steps: int,
+        method: str,
+        creativity_level: float,
+        model_name: Optional[str] = None
+    ) -> List[Dict]:
+        """Interpolate between clips using MusicVAE.
+
+        Anchor clips are encoded together (cached encodings are reused)
+        and the whole path is decoded as one latent batch. Clips longer
+        than the model's window contribute their first window.
+        """
+        try:
+            model_name = model_name or self.default_models['music_vae']
+            
+            tables = list(self.decode_pool.map(self.parse_midi, clips))
+            keys, heads = [], []
+            for midi_bytes, table in zip(clips, tables):
+                window_seconds = self.vae_window_bars.get(model_name, 2) * 4 * 60.0 / table.qpm
+                windows = split_windows(table, window_seconds)
+                if not len(windows[0]):
+                    raise ValueError('Every clip needs notes in its first window')
+                heads.append(windows[0])
+                keys.append(self.latent_cache.make_key(
+                    midi_bytes, model_name if len(windows) == 1 else f'{model_name}/head'
+                ))
+            
+            # Encode the clips missing from the latent cache in one batch
+            anchors: List[Optional[np.ndarray]] = [None] * len(clips)
+            missing = []
+            for index, key in enumerate(keys):
+                encoding = self.latent_cache.get(key)
+                if encoding is None:
+                    missing.append(index)
+                else:
+                    anchors[index] = encoding[1]
+            if missing:
+                z, mu, sigma = self.variation_engine.encode_batch(
+                    [heads[index] for index in missing], model_name
+                )
+                for row, index in enumerate(missing):
+                    self.latent_cache.put(keys[index], (z[row], mu[row], sigma[row]))
+                    anchors[index] = mu[row]
+            
+            # The whole path is one latent array decoded in batched passes
+            with timed('model_sample'):
+                latents = self.variation_engine.interpolate_latents(np.stack(anchors), num_steps, method)
+            temperature = self.variation_engine.temperature_for(creativity_level)
+            generated_tables = self.variation_engine.decode(latents, temperature, model_name)
+            
+            segment_steps = num_steps - 1
+            return [
+                {
+                    'midi_data': self.note_table_to_midi(generated_table),
+                    'step': i,
+                    'position': i / segment_steps,
+                    'temperature': temperature
+                }
+                for i, generated_table in enumerate(generated_tables)
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error in MusicVAE interpolation: {e}")
+            raise
+    
     def generate_music_transformer_continuation(
         self, 
         midi_bytes: bytes, 
         target_length: int, 
-        target_instrument: str
+        target_instrument: str,
+        model_name: Optional[str] = None,
+        seed: Optional[int] = None
     ) -> Dict:
         """Generate continuation using Music Transformer"""
         try:
-            # Convert MIDI to NoteSequence
-            midi_file = pretty_midi.PrettyMIDI(midi_bytes)
-            note_sequence = midi_file.to_sequence()
+            model_name = model_name or self.default_models['music_transformer']
+            
+            primer = self.parse_midi(midi_bytes)
             
             # Generate continuation
-            generated_sequence = self.music_transformer_model.generate(
-                note_sequence,
-                target_length,
-                temperature=0.8
-            )
+            generated = self.continue_sequence(model_name, primer, target_length, 0.8, seed)
             
             # Convert back to MIDI
-            midi_data = self.sequence_to_midi(generated_sequence)
-            midi_base64 = base64.b64encode(midi_data).decode('utf-8')
-            
             return {
-                'midi_data': midi_base64,
+                'midi_data': self.note_table_to_midi(generated),
                 'target_length': target_length,
                 'target_instrument': target_instrument
             }
@@ -336,39 +1439,140 @@ class MagentaServer:
             logger.error(f"Error in Music Transformer generation: {e}")
             raise
     
+    def extend_continuation_session(
+        self,
+        session,
+        midi_bytes: Optional[bytes],
+        target_length: int,
+        offset: Optional[float] = None,
+        keep_generated: bool = False
+    ) -> Dict:
+        """Append new events to a session primer and continue it with Music Transformer"""
+        try:
+            with session.lock:
+                if midi_bytes:
+                    session.append(self.parse_midi(midi_bytes), offset)
+                
+                primer_end = session.end_time()
+                generated = self.continue_sequence(
+                    session.model_name, session.primer, target_length, 0.8
+                )
+                
+                # Only the notes past the primer are new material
+                continuation = generated.tail(primer_end)
+                
+                if keep_generated:
+                    session.append(continuation, primer_end)
+                session.extensions += 1
+            
+            # Convert back to MIDI
+            return {
+                'midi_data': self.note_table_to_midi(continuation),
+                'start_time': primer_end,
+                'target_length': target_length,
+                'target_instrument': session.target_instrument
+            }
+            
+        except Exception as e:
+            logger.error(f"Error in session continuation: {e}")
+            raise
+    
+    def stream_music_transformer_continuation(
+        self,
+        midi_bytes: bytes,
+        target_length: int,
+        target_instrument: str,
+        chunk_length: int,
+        model_name: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """Generate a continuation chunk by chunk, yielding each MIDI fragment as soon as it is decoded"""
+        try:
+            model_name = model_name or self.default_models['music_transformer']
+            
+            primer = self.parse_midi(midi_bytes)
+            
+            qpm = primer.qpm
+            step_seconds = 60.0 / qpm / self.transformer_steps_per_quarter
+            stream_start = primer.total_time
+            chunk_length = max(1, chunk_length)
+            
+            generated_steps = 0
+            chunk_index = 0
+            while generated_steps < target_length:
+                steps = min(chunk_length, target_length - generated_steps)
+                chunk_start = stream_start + generated_steps * step_seconds
+                chunk_end = chunk_start + steps * step_seconds
+                
+                generated = self.continue_sequence(model_name, primer, steps, 0.8)
+                
+                # Keep only the new notes: extend the primer for the next
+                # chunk and re-base the fragment on the chunk start
+                new_notes = generated[generated.start >= chunk_start]
+                primer = concat_tables([primer, new_notes], distinct_tracks=False).replace(
+                    tempos=primer.tempos, duration=max(primer.total_time, chunk_end)
+                )
+                fragment = new_notes.shift(-chunk_start).replace(
+                    tempos=[(0.0, qpm)], duration=chunk_end - chunk_start
+                )
+                
+                midi_data = self.note_table_to_midi(fragment)
+                yield {
+                    'event': 'fragment',
+                    'chunk_index': chunk_index,
+                    'start_time': chunk_start - stream_start,
+                    'duration': chunk_end - chunk_start,
+                    'steps': steps,
+                    'num_notes': len(fragment),
+                    'midi_data': base64.b64encode(midi_data).decode('utf-8')
+                }
+                
+                generated_steps += steps
+                chunk_index += 1
+            
+            yield {
+                'event': 'done',
+                'chunks': chunk_index,
+                'target_length': target_length,
+                'target_instrument': target_instrument
+            }
+            
+        except Exception as e:
+            logger.error(f"Error in streaming Music Transformer generation: {e}")
+            raise
+    
     def generate_new_track_from_context(
         self, 
         context_tracks: List[Dict], 
         target_instrument: str, 
-        track_length: int
+        track_length: int,
+        model_name: Optional[str] = None,
+        seed: Optional[int] = None
     ) -> Dict:
         """Generate new track based on context tracks"""
         try:
-            # Combine context tracks
-            combined_sequence = music_pb2.NoteSequence()
+            model_name = model_name or self.default_models['music_transformer']
+            
+            # Decode context tracks in parallel into note tables
+            tables = list(self.decode_pool.map(
+                lambda track: self.parse_midi(decode_midi_field(track['midi_data'])),
+                context_tracks
+            ))
             
-            for track in context_tracks:
-                midi_bytes = base64.b64decode(track['midi_data'])
-                midi_file = pretty_midi.PrettyMIDI(midi_bytes)
-                track_sequence = midi_file.to_sequence()
-                
-                # Merge tracks
-                for note in track_sequence.notes:
-                    combined_sequence.notes.add().CopyFrom(note)
+            # Merge with one sorted concatenation, quantized and clipped
+            # to the transformer's context window
+            with timed('context_merge'):
+                merged = merge_context(
+                    tables,
+                    steps_per_quarter=self.transformer_steps_per_quarter,
+                    max_steps=self.transformer_context_steps
+                )
             
             # Generate new track using Music Transformer
-            generated_sequence = self.music_transformer_model.generate(
-                combined_sequence,
-                track_length,
-                temperature=0.7
-            )
+            generated = self.continue_sequence(model_name, merged, track_length, 0.7, seed)
             
             # Convert back to MIDI
-            midi_data = self.sequence_to_midi(generated_sequence)
-            midi_base64 = base64.b64encode(midi_data).decode('utf-8')
-            
             return {
-                'midi_data': midi_base64,
+                'midi_data': self.note_table_to_midi(generated),
                 'target_instrument': target_instrument,
                 'track_length': track_length
             }
@@ -377,34 +1581,117 @@ class MagentaServer:
             logger.error(f"Error generating new track: {e}")
             raise
     
-    def sequence_to_midi(self, sequence: music_pb2.NoteSequence) -> bytes:
-        """Convert NoteSequence to MIDI bytes"""
+    def continue_sequence(
+        self,
+        model_name: str,
+        primer: NoteTable,
+        steps: int,
+        temperature: float,
+        seed: Optional[int] = None
+    ) -> NoteTable:
+        """Continue a primer by ``steps`` through the transformer batcher.
+
+        The request is padded up to the nearest warmed-up length bucket,
+        so it runs at a pre-built decode length and shares batches with
+        other requests in the same bucket; the surplus is trimmed off.
+        A ``seed`` is part of the batch key, so seeded rows only share a
+        batch with rows asking for the same seed.
+        """
+        bucket = bucket_for(steps, self.transformer_length_buckets)
+        generated = self.transformer_batcher.submit(
+            (model_name, bucket, temperature, seed), [primer]
+        )[0]
+        if bucket == steps:
+            return generated
+        
+        step_seconds = 60.0 / primer.qpm / self.transformer_steps_per_quarter
+        return generated.trim(primer.total_time + steps * step_seconds)
+    
+    def _run_vae_batch(self, key: Tuple, rows: List) -> List:
+        """Run one packed MusicVAE batch (encode or decode)"""
+        model = self.models.require(key[1])
+        if key[0] == 'encode':
+            # Encode rows are note tables; pooled models ship them to the
+            # inference process as arrays and build the protos there
+            if not takes_note_tables(model):
+                with timed('note_sequence_build'):
+                    rows = model_inputs(model, rows)
+            with timed('model_encode', model=key[1]):
+                z, mu, sigma = model.encode(rows)
+            return [(z[i], mu[i], sigma[i]) for i in range(len(rows))]
+        
+        _, _, temperature = key
+        with timed('model_decode', model=key[1]):
+            decoded = model.decode(np.stack(rows), temperature=temperature)
+        if takes_note_tables(model):
+            return decoded
+        with timed('note_table_build'):
+            return [sequence_to_note_table(sequence) for sequence in decoded]
+    
+    def _run_transformer_batch(self, key: Tuple, rows: List) -> List:
+        """Run one packed Music Transformer batch"""
+        # The transformer wrapper generates one primer per call, so the
+        # batch is executed back to back on the scheduler thread
+        model_name, target_length, temperature, seed = key
+        model = self.models.require(model_name)
+        # Wrappers without a seed argument sample unseeded; seeded
+        # responses are still replayed from the response cache
+        kwargs = {'seed': seed} if seed is not None and supports_seed(model.generate) else {}
+        # Primers are note tables; protos exist only around the model
+        # call (pooled models build them in the inference process)
+        native = takes_note_tables(model)
+        if not native:
+            with timed('note_sequence_build'):
+                rows = model_inputs(model, rows)
+        with timed('model_generate', model=model_name):
+            generated = [
+                model.generate(
+                    sequence, target_length, temperature=temperature, **kwargs
+                )
+                for sequence in rows
+            ]
+        if native:
+            return generated
+        with timed('note_table_build'):
+            return [sequence_to_note_table(sequence) for sequence in generated]
+    
+    def parse_midi(self, midi_bytes: bytes):
+        """Parse MIDI bytes into a note table"""
+        with timed('midi_parse'):
+            return parse_midi(midi_bytes)
+    
+    def note_table_to_midi(self, table: NoteTable) -> bytes:
+        """Convert a note table to MIDI bytes"""
         try:
-            # Convert to PrettyMIDI
-            midi_file = pretty_midi.PrettyMIDI()
-            
-            # Add notes
-            for note in sequence.notes:
-                midi_file.notes.append(pretty_midi.Note(
-                    velocity=note.velocity,
-                    pitch=note.pitch,
-                    start=note.start_time,
-                    end=note.end_time
-                ))
-            
-            # Convert to bytes
-            midi_bytes = midi_file.write()
-            return midi_bytes
+            with timed('midi_serialize'):
+                return write_midi(table)
             
         except Exception as e:
             logger.error(f"Error converting sequence to MIDI: {e}")
             raise
     
+    def after_fork(self):
+        """Re-create per-process threads in a worker forked from a preloaded master"""
+        self.vae_batcher.reset_after_fork()
+        self.transformer_batcher.reset_after_fork()
+        self.jobs.reset_after_fork()
+        self.models.reset_after_fork()
+        self.decode_pool = ThreadPoolExecutor(
+            max_workers=self.decode_pool._max_workers,
+            thread_name_prefix='midi-decode'
+        )
+        logger.info(f"Worker {os.getpid()} started (models shared from master)")
+    
     def run(self, host='0.0.0.0', port=5001, debug=False):
-        """Run the Flask server"""
+        """Run the Flask development server"""
         logger.info(f"Starting Magenta server on {host}:{port}")
-        self.app.run(host=host, port=port, debug=debug)
+        # The reloader would load every model a second time
+        self.app.run(host=host, port=port, debug=debug, use_reloader=False, threaded=True)
 
 if __name__ == '__main__':
     server = MagentaServer()
-    server.run(debug=True)
+    server.run(
+        host=os.getenv('HOST', '0.0.0.0'),
+        port=int(os.getenv('PORT', '5001')),
+        debug=os.getenv('FLASK_DEBUG', '0') == '1'
+    )
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Hot-path metrics for Ableton2ML
+Per-stage latency histograms and counters in Prometheus text format
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans sub-millisecond MIDI work up to full model decodes
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[Dict[str, str], float]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        key + '="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def summary(self) -> Dict[Labels, Dict]:
+        with self._lock:
+            return {
+                key: {'count': count, 'sum': total}
+                for key, (_, total, count) in self._series.items()
+            }
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in series]
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = _format_value(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(key, [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {total!r}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {count}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._series: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.append(f'{self.name}{_format_labels(key)} {_format_value(value)}')
+        return lines
+
+
+class Metrics:
+    """Registry of stage timings, request timings and collected gauges"""
+
+    def __init__(self, namespace: str = 'ableton2ml'):
+        self.namespace = namespace
+        self.stage_duration = Histogram(
+            f'{namespace}_stage_duration_seconds',
+            'Time spent in one hot-path stage (decode, parse, model, serialize, encode)'
+        )
+        self.stage_errors = Counter(
+            f'{namespace}_stage_errors_total', 'Stages that raised an exception'
+        )
+        self.request_duration = Histogram(
+            f'{namespace}_http_request_duration_seconds',
+            'Time from request start until the response is handed to the server'
+        )
+        self.requests = Counter(
+            f'{namespace}_http_requests_total', 'HTTP requests by endpoint and status'
+        )
+        self.rejected_requests = Counter(
+            f'{namespace}_rejected_requests_total', 'Requests turned away by pre-flight validation'
+        )
+        self._collectors: List[Callable[[], Iterator[Tuple[str, str, str, List[Sample]]]]] = []
+
+    @contextmanager
+    def timed(self, stage: str, **labels):
+        """Time the enclosed block as ``stage``; exceptions are counted and re-raised"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.stage_errors.inc(stage=stage, **labels)
+            raise
+        finally:
+            self.stage_duration.observe(time.perf_counter() - started, stage=stage, **labels)
+
+    def observe_request(self, endpoint: str, method: str, status: int, seconds: float):
+        self.request_duration.observe(seconds, endpoint=endpoint, method=method)
+        self.requests.inc(endpoint=endpoint, method=method, status=status)
+
+    def register_collector(self, collector: Callable[[], Iterator[Tuple[str, str, str, List[Sample]]]]):
+        """Add a callback yielding ``(name, type, help, [(labels, value)])`` at scrape time"""
+        self._collectors.append(collector)
+
+    def stage_summary(self) -> Dict[str, Dict]:
+        """Count and mean milliseconds per stage, for /api/status"""
+        summary = {}
+        for key, values in self.stage_duration.summary().items():
+            labels = dict(key)
+            name = labels.pop('stage', '')
+            if labels:
+                name += '{' + ','.join(f'{k}={v}' for k, v in sorted(labels.items())) + '}'
+            summary[name] = {
+                'count': values['count'],
+                'avg_ms': values['sum'] / values['count'] * 1000 if values['count'] else 0.0
+            }
+        return summary
+
+    def render(self) -> str:
+        lines = []
+        for metric in (
+            self.stage_duration, self.stage_errors, self.request_duration, self.requests,
+            self.rejected_requests
+        ):
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                name = f'{self.namespace}_{name}'
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(_labels(labels))} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry shared by the server and its helper modules
+METRICS = Metrics()
+timed = METRICS.timed
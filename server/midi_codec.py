@@ -0,0 +1,632 @@
+#!/usr/bin/env python3
+"""
+Native Standard MIDI File codec for Ableton2ML
+Parses SMF bytes into array-backed note tables and writes them back
+without building intermediate pretty_midi/mido objects
+"""
+
+import struct
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Same sanity limit pretty_midi applies before allocating its tick map
+MAX_TICK = 10000000
+
+# Defaults of an empty pretty_midi.PrettyMIDI(), which the writer mirrors
+DEFAULT_RESOLUTION = 220
+DEFAULT_QPM = 120.0
+
+DRUM_CHANNEL = 9
+
+
+class NoteTable:
+    """Structure-of-arrays view of the notes in a clip.
+
+    This is how notes travel inside the server; NoteSequence protos are
+    only built at the model boundary. Operations return new tables that
+    share every column they do not change, and slicing returns views.
+    ``instrument`` is the track index. ``duration`` keeps trailing
+    silence that the notes alone would not account for.
+    """
+
+    __slots__ = (
+        'pitch', 'velocity', 'start', 'end',
+        'program', 'is_drum', 'instrument',
+        'ticks_per_quarter', 'tempos', 'duration'
+    )
+
+    COLUMNS = ('pitch', 'velocity', 'start', 'end', 'program', 'is_drum', 'instrument')
+
+    def __init__(
+        self,
+        pitch: np.ndarray,
+        velocity: np.ndarray,
+        start: np.ndarray,
+        end: np.ndarray,
+        program: Optional[np.ndarray] = None,
+        is_drum: Optional[np.ndarray] = None,
+        instrument: Optional[np.ndarray] = None,
+        ticks_per_quarter: int = DEFAULT_RESOLUTION,
+        tempos: Optional[List[Tuple[float, float]]] = None,
+        duration: float = 0.0
+    ):
+        count = len(pitch)
+        self.pitch = np.asarray(pitch, dtype=np.int16)
+        self.velocity = np.asarray(velocity, dtype=np.int16)
+        self.start = np.asarray(start, dtype=np.float64)
+        self.end = np.asarray(end, dtype=np.float64)
+        self.program = (
+            np.zeros(count, dtype=np.int16) if program is None
+            else np.asarray(program, dtype=np.int16)
+        )
+        self.is_drum = (
+            np.zeros(count, dtype=bool) if is_drum is None
+            else np.asarray(is_drum, dtype=bool)
+        )
+        self.instrument = (
+            np.zeros(count, dtype=np.int32) if instrument is None
+            else np.asarray(instrument, dtype=np.int32)
+        )
+        self.ticks_per_quarter = ticks_per_quarter
+        self.tempos = tempos if tempos is not None else [(0.0, DEFAULT_QPM)]
+        self.duration = float(duration)
+
+    def __len__(self) -> int:
+        return len(self.pitch)
+
+    def __getitem__(self, index) -> 'NoteTable':
+        """Rows by slice (views of the columns), index array or boolean mask"""
+        return self.replace(**{column: getattr(self, column)[index] for column in self.COLUMNS})
+
+    @property
+    def total_time(self) -> float:
+        notes_end = float(self.end.max()) if len(self.end) else 0.0
+        return max(notes_end, self.duration)
+
+    @property
+    def qpm(self) -> float:
+        return self.tempos[0][1] if self.tempos else DEFAULT_QPM
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, column).nbytes for column in self.COLUMNS)
+
+    @property
+    def start_ticks(self) -> np.ndarray:
+        return self.seconds_to_ticks(self.start)
+
+    @property
+    def end_ticks(self) -> np.ndarray:
+        return self.seconds_to_ticks(self.end)
+
+    @classmethod
+    def empty(cls, **kwargs) -> 'NoteTable':
+        return cls(np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0), **kwargs)
+
+    def replace(self, **changes) -> 'NoteTable':
+        """A table with some columns or fields replaced, sharing the rest"""
+        table = NoteTable.__new__(NoteTable)
+        for name in self.__slots__:
+            setattr(table, name, getattr(self, name))
+        for name, value in changes.items():
+            setattr(table, name, value)
+        return table
+
+    def take(self, index) -> 'NoteTable':
+        """Rows selected by an index array or boolean mask"""
+        return self[index]
+
+    def seconds_to_ticks(self, times: np.ndarray) -> np.ndarray:
+        """Ticks at ``ticks_per_quarter`` for times in seconds, following the tempo map"""
+        tempo_times = np.array([time for time, _ in self.tempos] or [0.0], dtype=np.float64)
+        ticks_per_second = np.array(
+            [qpm for _, qpm in self.tempos] or [DEFAULT_QPM], dtype=np.float64
+        ) * self.ticks_per_quarter / 60.0
+        tempo_ticks = np.concatenate([[0.0], np.cumsum(np.diff(tempo_times) * ticks_per_second[:-1])])
+        segment = np.maximum(np.searchsorted(tempo_times, times, side='right') - 1, 0)
+        ticks = tempo_ticks[segment] + (times - tempo_times[segment]) * ticks_per_second[segment]
+        return np.rint(ticks).astype(np.int64)
+
+    def shift(self, offset: float) -> 'NoteTable':
+        """Move every note by ``offset`` seconds"""
+        return self.replace(
+            start=self.start + offset, end=self.end + offset,
+            duration=max(0.0, self.duration + offset) if self.duration else 0.0
+        )
+
+    def transpose(self, semitones: int) -> 'NoteTable':
+        """Shift pitched notes by ``semitones`` (clamped to MIDI range); drums keep their keys"""
+        pitch = np.where(self.is_drum, self.pitch, np.clip(self.pitch + semitones, 0, 127))
+        return self.replace(pitch=pitch.astype(np.int16))
+
+    def grid_steps(self, steps_per_quarter: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Onset and release steps on a ``steps_per_quarter`` grid, at least one step long"""
+        steps_per_second = steps_per_quarter * self.qpm / 60.0
+        start_steps = np.rint(self.start * steps_per_second).astype(np.int64)
+        end_steps = np.maximum(np.rint(self.end * steps_per_second).astype(np.int64), start_steps + 1)
+        return start_steps, end_steps
+
+    def quantize(self, steps_per_quarter: int) -> 'NoteTable':
+        """Snap notes to a ``steps_per_quarter`` grid at the clip's first tempo"""
+        steps_per_second = steps_per_quarter * self.qpm / 60.0
+        start_steps, end_steps = self.grid_steps(steps_per_quarter)
+        return self.replace(start=start_steps / steps_per_second, end=end_steps / steps_per_second)
+
+    def trim(self, end_time: float) -> 'NoteTable':
+        """Drop notes starting at or after ``end_time`` and clip the rest to it"""
+        table = self[self.start < end_time] if len(self) and self.start.max() >= end_time else self
+        if len(table) and table.end.max() > end_time:
+            table = table.replace(end=np.minimum(table.end, end_time))
+        return table.replace(duration=min(table.duration, end_time))
+
+    def tail(self, start_time: float) -> 'NoteTable':
+        """Notes starting at or after ``start_time``, re-based to start at zero"""
+        return self[self.start >= start_time].shift(-start_time).replace(duration=0.0)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7f)
+        if byte < 0x80:
+            return value, pos
+
+
+def _channel_data_length(status: int) -> int:
+    kind = status & 0xf0
+    return 1 if kind in (0xc0, 0xd0) else 2
+
+
+def _system_data_length(status: int) -> int:
+    if status in (0xf1, 0xf3):
+        return 1
+    if status == 0xf2:
+        return 2
+    return 0
+
+
+def parse_midi(midi_bytes: bytes) -> NoteTable:
+    """Parse Standard MIDI File bytes into a NoteTable.
+
+    Note pairing, tempo handling and instrument grouping follow
+    pretty_midi: tempo changes are read from track 0, a note-off closes
+    every open note of its channel/pitch started on an earlier tick, and
+    instruments are keyed by (program, channel, track) in order of their
+    first completed note.
+    """
+    data = bytes(midi_bytes)
+    if len(data) < 14 or data[:4] != b'MThd':
+        raise ValueError('Not a Standard MIDI File (missing MThd header)')
+    header_length = struct.unpack('>I', data[4:8])[0]
+    if header_length < 6:
+        raise ValueError('Invalid MThd header length')
+    _, num_tracks, division = struct.unpack('>HHH', data[8:14])
+    if division & 0x8000:
+        raise ValueError('SMPTE time division is not supported')
+    resolution = division
+
+    pos = 8 + header_length
+    track_chunks = []
+    while pos + 8 <= len(data) and len(track_chunks) < num_tracks:
+        chunk_type = data[pos:pos + 4]
+        chunk_length = struct.unpack('>I', data[pos + 4:pos + 8])[0]
+        chunk_start = pos + 8
+        pos = chunk_start + chunk_length
+        if pos > len(data):
+            raise ValueError('Truncated MIDI track chunk')
+        if chunk_type == b'MTrk':
+            track_chunks.append((chunk_start, pos))
+
+    tempo_events: List[Tuple[int, int]] = []
+    start_ticks: List[int] = []
+    end_ticks: List[int] = []
+    pitches: List[int] = []
+    velocities: List[int] = []
+    instrument_keys: List[Tuple[int, int, int]] = []
+    max_tick = 0
+
+    for track_index, (pos, end) in enumerate(track_chunks):
+        tick = 0
+        running_status = None
+        current_program = [0] * 16
+        open_notes = {}
+
+        while pos < end:
+            delta, pos = _read_varint(data, pos)
+            tick += delta
+            status = data[pos]
+            if status >= 0x80:
+                pos += 1
+                if status < 0xf0:
+                    running_status = status
+            elif running_status is None:
+                raise ValueError('Running status without a preceding status byte')
+            else:
+                status = running_status
+
+            if status == 0xff:
+                meta_type = data[pos]
+                length, pos = _read_varint(data, pos + 1)
+                if meta_type == 0x51 and track_index == 0 and length == 3:
+                    tempo_events.append((tick, (data[pos] << 16) | (data[pos + 1] << 8) | data[pos + 2]))
+                pos += length
+                if meta_type == 0x2f:
+                    break
+                continue
+            if status in (0xf0, 0xf7):
+                length, pos = _read_varint(data, pos)
+                pos += length
+                continue
+            if status >= 0xf0:
+                pos += _system_data_length(status)
+                continue
+
+            kind = status & 0xf0
+            channel = status & 0x0f
+            if kind == 0x90 or kind == 0x80:
+                pitch = data[pos]
+                velocity = data[pos + 1]
+                pos += 2
+                key = (channel, pitch)
+                if kind == 0x90 and velocity > 0:
+                    open_notes.setdefault(key, []).append((tick, velocity))
+                    continue
+                notes = open_notes.get(key)
+                if notes is None:
+                    continue
+                keep = []
+                for start_tick, note_velocity in notes:
+                    if start_tick == tick:
+                        keep.append((start_tick, note_velocity))
+                        continue
+                    start_ticks.append(start_tick)
+                    end_ticks.append(tick)
+                    pitches.append(pitch)
+                    velocities.append(note_velocity)
+                    instrument_keys.append((current_program[channel], channel, track_index))
+                if keep and len(keep) < len(notes):
+                    open_notes[key] = keep
+                else:
+                    del open_notes[key]
+            elif kind == 0xc0:
+                current_program[channel] = data[pos]
+                pos += 1
+            else:
+                pos += _channel_data_length(status)
+
+        max_tick = max(max_tick, tick)
+
+    if max_tick + 1 > MAX_TICK:
+        raise ValueError(f'MIDI file has a largest tick of {max_tick + 1}, it is likely corrupt')
+
+    # Tick scales, as in pretty_midi._load_tempo_changes
+    tick_scales = [(0, 60.0 / (DEFAULT_QPM * resolution))]
+    for tick, tempo in tempo_events:
+        if tick == 0:
+            tick_scales = [(0, 60.0 / ((6e7 / tempo) * resolution))]
+        else:
+            tick_scale = 60.0 / ((6e7 / tempo) * resolution)
+            if tick_scale != tick_scales[-1][1]:
+                tick_scales.append((tick, tick_scale))
+
+    scale_ticks = np.array([tick for tick, _ in tick_scales], dtype=np.int64)
+    scales = np.array([scale for _, scale in tick_scales], dtype=np.float64)
+    scale_times = np.zeros(len(tick_scales), dtype=np.float64)
+    for i in range(1, len(tick_scales)):
+        scale_times[i] = scale_times[i - 1] + scales[i - 1] * (scale_ticks[i] - scale_ticks[i - 1])
+
+    def ticks_to_seconds(ticks: np.ndarray) -> np.ndarray:
+        segment = np.searchsorted(scale_ticks, ticks, side='right') - 1
+        return scale_times[segment] + scales[segment] * (ticks - scale_ticks[segment])
+
+    # Group notes by instrument, keeping close order inside each instrument
+    instrument_index = {}
+    instruments = np.fromiter(
+        (instrument_index.setdefault(key, len(instrument_index)) for key in instrument_keys),
+        dtype=np.int32, count=len(instrument_keys)
+    )
+    order = np.argsort(instruments, kind='stable')
+    index_to_key = list(instrument_index)
+
+    start = ticks_to_seconds(np.array(start_ticks, dtype=np.int64))[order]
+    end = ticks_to_seconds(np.array(end_ticks, dtype=np.int64))[order]
+    instruments = instruments[order]
+    programs = np.array([key[0] for key in index_to_key], dtype=np.int16)[instruments]
+    drums = np.array([key[1] == DRUM_CHANNEL for key in index_to_key], dtype=bool)[instruments]
+
+    tempos = [
+        (float(time), 60.0 / (scale * resolution))
+        for time, scale in zip(scale_times, scales)
+    ]
+
+    return NoteTable(
+        pitch=np.array(pitches, dtype=np.int16)[order],
+        velocity=np.array(velocities, dtype=np.int16)[order],
+        start=start,
+        end=end,
+        program=programs,
+        is_drum=drums,
+        instrument=instruments,
+        ticks_per_quarter=resolution,
+        tempos=tempos
+    )
+
+
+def _varint_lengths(values: np.ndarray) -> np.ndarray:
+    lengths = np.ones(len(values), dtype=np.int64)
+    for shift in (7, 14, 21):
+        lengths += values >= (1 << shift)
+    return lengths
+
+
+def write_midi(
+    table: NoteTable,
+    resolution: int = DEFAULT_RESOLUTION,
+    qpm: float = DEFAULT_QPM,
+    program: int = 0
+) -> bytes:
+    """Serialize a NoteTable to SMF bytes.
+
+    The output is byte-identical to writing the same notes as a single
+    ``pretty_midi.Instrument(program)`` of a fresh ``PrettyMIDI`` with
+    matching resolution and tempo: one timing track (tempo, 4/4), one
+    note track on channel 0 using running status, note-offs encoded as
+    zero-velocity note-ons, events ordered by tick, pitch and velocity.
+    """
+    count = len(table)
+    pitch = table.pitch.astype(np.int64)
+    velocity = table.velocity.astype(np.int64)
+    if count and (pitch.min() < 0 or pitch.max() > 127):
+        raise ValueError('Note pitch out of MIDI range 0..127')
+    if count and (velocity.min() < 0 or velocity.max() > 127):
+        raise ValueError('Note velocity out of MIDI range 0..127')
+
+    tick_scale = 60.0 / (qpm * resolution)
+    tempo = int(6e7 / (60. / (tick_scale * resolution)))
+
+    def seconds_to_ticks(times: np.ndarray) -> np.ndarray:
+        ticks = np.rint(times / tick_scale).astype(np.int64)
+        ticks[times <= 0] = 0
+        return ticks
+
+    # Note-ons and note-offs as flat event columns
+    ticks = np.concatenate([seconds_to_ticks(table.start), seconds_to_ticks(table.end)])
+    notes = np.concatenate([pitch, pitch])
+    velocities = np.concatenate([velocity, np.zeros(count, dtype=np.int64)])
+    order = np.lexsort((velocities, notes, ticks))
+    ticks = ticks[order]
+    notes = notes[order]
+    velocities = velocities[order]
+
+    # Delta times; the program change sits at tick 0 ahead of every note
+    deltas = np.diff(ticks, prepend=0)
+    lengths = _varint_lengths(deltas)
+    # The first note-on carries the 0x90 status byte, the rest run on it
+    status_lengths = np.zeros(len(ticks), dtype=np.int64)
+    if len(ticks):
+        status_lengths[0] = 1
+    event_lengths = lengths + status_lengths + 2
+    offsets = np.concatenate([[0], np.cumsum(event_lengths)[:-1]]).astype(np.int64)
+
+    body = np.zeros(int(event_lengths.sum()), dtype=np.uint8)
+    for index in range(4):
+        mask = lengths > index
+        shift = 7 * (lengths[mask] - 1 - index)
+        continuation = np.where(index < lengths[mask] - 1, 0x80, 0)
+        body[offsets[mask] + index] = ((deltas[mask] >> shift) & 0x7f) | continuation
+    data_offsets = offsets + lengths + status_lengths
+    if len(ticks):
+        body[offsets[0] + lengths[0]] = 0x90
+    body[data_offsets] = notes
+    body[data_offsets + 1] = velocities
+
+    program_change = bytes([0x00, 0xc0, program & 0x7f])
+    end_of_track = b'\x01\xff\x2f\x00'
+    note_track = program_change + body.tobytes() + end_of_track
+
+    timing_track = (
+        b'\x00\xff\x51\x03' + tempo.to_bytes(3, 'big') +
+        b'\x00\xff\x58\x04\x04\x02\x18\x08' +
+        end_of_track
+    )
+
+    return b''.join([
+        b'MThd', struct.pack('>IHHH', 6, 1, 2, resolution),
+        b'MTrk', struct.pack('>I', len(timing_track)), timing_track,
+        b'MTrk', struct.pack('>I', len(note_track)), note_track
+    ])
+
+
+def concat_tables(tables: List[NoteTable], distinct_tracks: bool = True) -> NoteTable:
+    """Stack note tables, renumbering instruments so tracks stay distinct.
+
+    With ``distinct_tracks`` False instruments are kept as they are, for
+    appending material to the same part. Tempo and resolution come from
+    the first table; the result lasts as long as the longest input.
+    """
+    if not tables:
+        return NoteTable.empty()
+    offsets = np.cumsum(
+        [0] + [int(table.instrument.max()) + 1 if len(table) else 0 for table in tables[:-1]]
+    ) if distinct_tracks else np.zeros(len(tables), dtype=np.int64)
+    return NoteTable(
+        np.concatenate([table.pitch for table in tables]),
+        np.concatenate([table.velocity for table in tables]),
+        np.concatenate([table.start for table in tables]),
+        np.concatenate([table.end for table in tables]),
+        np.concatenate([table.program for table in tables]),
+        np.concatenate([table.is_drum for table in tables]),
+        np.concatenate([table.instrument + offset for table, offset in zip(tables, offsets)]),
+        ticks_per_quarter=tables[0].ticks_per_quarter,
+        tempos=tables[0].tempos,
+        duration=max(table.duration for table in tables)
+    )
+
+
+def split_windows(table: NoteTable, window_seconds: float) -> List[NoteTable]:
+    """Cut a clip into consecutive windows of ``window_seconds``.
+
+    Each note goes to the window its onset falls in, re-based to the
+    window start and clipped at the window end; windows without notes
+    are returned empty so positions still line up with the clip.
+    """
+    index = (table.start // window_seconds).astype(np.int64)
+    # Counted from onsets, so a final note ringing past a bar line
+    # does not open an extra window
+    count = int(index.max()) + 1 if len(index) else 1
+    order = np.argsort(index, kind='stable')
+    bounds = np.searchsorted(index[order], np.arange(count + 1))
+    windows = []
+    for window in range(count):
+        offset = window * window_seconds
+        part = table.take(order[bounds[window]:bounds[window + 1]])
+        part.start = part.start - offset
+        part.end = np.minimum(part.end - offset, window_seconds)
+        windows.append(part)
+    return windows
+
+
+def stitch_windows(
+    tables: List[NoteTable],
+    window_seconds: float,
+    tempos: List[Tuple[float, float]]
+) -> NoteTable:
+    """Lay windows end to end, the inverse of ``split_windows``.
+
+    A window rendered at a different tempo than ``tempos`` (MusicVAE
+    decodes at its own default tempo) is rescaled to the clip's tempo
+    before being clipped to the window length and shifted into place.
+    """
+    qpm = tempos[0][1] if tempos else DEFAULT_QPM
+    parts = []
+    for window, table in enumerate(tables):
+        if not len(table):
+            continue
+        scale = table.qpm / qpm
+        start = table.start * scale
+        part = table.take(start < window_seconds)
+        part.start = start[start < window_seconds] + window * window_seconds
+        part.end = np.minimum(part.end * scale, window_seconds) + window * window_seconds
+        parts.append(part)
+    if not parts:
+        stitched = NoteTable.empty()
+    else:
+        stitched = NoteTable(
+            np.concatenate([part.pitch for part in parts]),
+            np.concatenate([part.velocity for part in parts]),
+            np.concatenate([part.start for part in parts]),
+            np.concatenate([part.end for part in parts]),
+            np.concatenate([part.program for part in parts]),
+            np.concatenate([part.is_drum for part in parts]),
+            np.concatenate([part.instrument for part in parts])
+        )
+    stitched.tempos = tempos
+    return stitched
+
+
+def merge_context(
+    tables: List[NoteTable],
+    steps_per_quarter: int,
+    max_steps: Optional[int] = None,
+    steps_per_bar: Optional[int] = None
+) -> NoteTable:
+    """Merge context tracks into one sorted, quantized, deduplicated table.
+
+    Notes are snapped to the model's ``steps_per_quarter`` grid (at the
+    first track's tempo), sorted by onset and pitch, and simultaneous
+    duplicates of the same pitch are collapsed to the loudest one. With
+    ``max_steps`` only the last ``max_steps`` of context are kept, cut at
+    a bar line and shifted to start at zero.
+    """
+    merged = concat_tables(tables).replace(duration=0.0)
+    qpm = merged.qpm
+    steps_per_second = steps_per_quarter * qpm / 60.0
+    if not len(merged):
+        return merged.replace(tempos=[(0.0, qpm)])
+
+    start_steps, end_steps = merged.grid_steps(steps_per_quarter)
+
+    order = np.lexsort((-merged.velocity, merged.pitch, merged.is_drum, start_steps))
+    sorted_start = start_steps[order]
+    sorted_pitch = merged.pitch[order]
+    sorted_drum = merged.is_drum[order]
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = (
+        (sorted_start[1:] != sorted_start[:-1]) |
+        (sorted_pitch[1:] != sorted_pitch[:-1]) |
+        (sorted_drum[1:] != sorted_drum[:-1])
+    )
+    order = order[keep]
+
+    shift = 0
+    if max_steps:
+        steps_per_bar = steps_per_bar or steps_per_quarter * 4
+        window_start = int(end_steps.max()) - max_steps
+        if window_start > 0:
+            shift = -(-window_start // steps_per_bar) * steps_per_bar
+            order = order[start_steps[order] >= shift]
+
+    return merged[order].replace(
+        start=(start_steps[order] - shift) / steps_per_second,
+        end=(end_steps[order] - shift) / steps_per_second,
+        tempos=[(0.0, qpm)]
+    )
+
+
+def sequence_to_note_table(sequence) -> NoteTable:
+    """Column view of a NoteSequence proto's notes"""
+    notes = sequence.notes
+    count = len(notes)
+    return NoteTable(
+        pitch=np.fromiter((note.pitch for note in notes), dtype=np.int16, count=count),
+        velocity=np.fromiter((note.velocity for note in notes), dtype=np.int16, count=count),
+        start=np.fromiter((note.start_time for note in notes), dtype=np.float64, count=count),
+        end=np.fromiter((note.end_time for note in notes), dtype=np.float64, count=count),
+        program=np.fromiter((note.program for note in notes), dtype=np.int16, count=count),
+        is_drum=np.fromiter((note.is_drum for note in notes), dtype=bool, count=count),
+        instrument=np.fromiter((note.instrument for note in notes), dtype=np.int32, count=count),
+        ticks_per_quarter=sequence.ticks_per_quarter or DEFAULT_RESOLUTION,
+        tempos=[(tempo.time, tempo.qpm) for tempo in sequence.tempos] or None,
+        duration=sequence.total_time
+    )
+
+
+def as_note_table(value) -> NoteTable:
+    """A NoteTable as-is, or the column view of a NoteSequence proto"""
+    return value if isinstance(value, NoteTable) else sequence_to_note_table(value)
+
+
+def note_table_to_sequence(table: NoteTable):
+    """Build a NoteSequence proto from a NoteTable at the model boundary"""
+    from magenta.protobuf import music_pb2
+
+    sequence = music_pb2.NoteSequence()
+    sequence.ticks_per_quarter = table.ticks_per_quarter
+    for time, qpm in table.tempos:
+        sequence.tempos.add(time=time, qpm=qpm)
+
+    add_note = sequence.notes.add
+    for pitch, velocity, start, end, program, is_drum, instrument in zip(
+        table.pitch.tolist(), table.velocity.tolist(),
+        table.start.tolist(), table.end.tolist(),
+        table.program.tolist(), table.is_drum.tolist(), table.instrument.tolist()
+    ):
+        add_note(
+            pitch=pitch, velocity=velocity, start_time=start, end_time=end,
+            program=program, is_drum=is_drum, instrument=instrument
+        )
+    sequence.total_time = table.total_time
+    return sequence
+
+
+def midi_to_sequence(midi_bytes: bytes):
+    """Parse SMF bytes straight into a NoteSequence proto"""
+    return note_table_to_sequence(parse_midi(midi_bytes))
+
+
+def sequence_to_midi(sequence) -> bytes:
+    """Serialize a NoteSequence proto's notes to SMF bytes"""
+    return write_midi(sequence_to_note_table(sequence))
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Model registry for Ableton2ML
+Loads checkpoints by name in background threads, tracks their memory
+footprint and evicts least-recently-used models over a RAM budget
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+COLD = 'cold'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+ProgressFn = Callable[[str, float], None]
+
+
+class ModelNotReady(RuntimeError):
+    """A request needs a model that is cold, still loading or failed to load"""
+
+    def __init__(self, name: str, state: str, retry_after: int):
+        super().__init__(f"Model '{name}' is not ready ({state})")
+        self.name = name
+        self.state = state
+        self.retry_after = retry_after
+
+
+class UnknownModel(KeyError):
+    """No model is registered under the requested name"""
+
+
+class ModelSlot:
+    """Registration and load state of one model"""
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        load_fn: Callable[[ProgressFn], Any],
+        preload: bool = False,
+        footprint_fn: Optional[Callable[[Any], int]] = None,
+        estimated_bytes: int = 0,
+        details: Optional[Dict] = None,
+        unload_fn: Optional[Callable[[Any], None]] = None
+    ):
+        self.name = name
+        self.kind = kind
+        self.load_fn = load_fn
+        self.preload = preload
+        self.footprint_fn = footprint_fn
+        self.unload_fn = unload_fn
+        self.details = details or {}
+        self.state = COLD
+        self.stage = 'cold'
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.loads = 0
+        self.evictions = 0
+        self.footprint_bytes = estimated_bytes
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.next_retry_at: Optional[float] = None
+        self.last_used: Optional[float] = None
+        self.model: Any = None
+
+    def info(self) -> Dict:
+        return {
+            'kind': self.kind,
+            'state': self.state,
+            'resident': self.state == READY,
+            'preload': self.preload,
+            'stage': self.stage,
+            'progress': round(self.progress, 3),
+            'attempts': self.attempts,
+            'loads': self.loads,
+            'evictions': self.evictions,
+            'error': self.error,
+            'footprint_mb': round(self.footprint_bytes / (1024 * 1024), 1),
+            'load_seconds': (
+                self.finished_at - self.started_at
+                if self.started_at and self.finished_at else None
+            ),
+            'last_used': self.last_used,
+            'next_retry_at': self.next_retry_at,
+            **self.details
+        }
+
+
+class ModelRegistry:
+    """Named models loaded on demand in background threads.
+
+    ``load_fn(progress)`` builds and returns one model, reporting its
+    current stage through ``progress(stage, fraction)``. Models marked
+    ``preload`` are loaded by ``start()``; the rest stay cold until a
+    request asks for them. A failed load is retried up to ``retries``
+    times with exponential backoff.
+
+    Each model's footprint is measured by its ``footprint_fn`` once
+    loaded. When loading a model would push the resident total past
+    ``memory_budget`` bytes, the least recently used resident models
+    are evicted first; a budget of 0 disables eviction.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        retries: int = 3,
+        retry_backoff: float = 5.0,
+        retry_after: int = 10,
+        memory_budget: int = 0
+    ):
+        self.max_workers = max(1, int(max_workers))
+        self.retries = max(0, int(retries))
+        self.retry_backoff = retry_backoff
+        self.retry_after_default = retry_after
+        self.memory_budget = max(0, int(memory_budget))
+        self._slots: Dict[str, ModelSlot] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._timers: Dict[str, threading.Timer] = {}
+        self.created_at = time.time()
+        self.total_evictions = 0
+
+    def register(
+        self,
+        name: str,
+        kind: str,
+        load_fn: Callable[[ProgressFn], Any],
+        preload: bool = False,
+        footprint_fn: Optional[Callable[[Any], int]] = None,
+        estimated_bytes: int = 0,
+        details: Optional[Dict] = None,
+        unload_fn: Optional[Callable[[Any], None]] = None
+    ):
+        """Add a model to the registry (cold until preloaded or requested)"""
+        with self._lock:
+            self._slots[name] = ModelSlot(
+                name, kind, load_fn, preload, footprint_fn, estimated_bytes, details, unload_fn
+            )
+
+    def names(self, kind: Optional[str] = None) -> List[str]:
+        return [
+            name for name, slot in self._slots.items()
+            if kind is None or slot.kind == kind
+        ]
+
+    def kind_of(self, name: str) -> str:
+        slot = self._slots.get(name)
+        if slot is None:
+            raise UnknownModel(name)
+        return slot.kind
+
+    def start(self):
+        """Begin loading every preloaded model"""
+        with self._lock:
+            for slot in self._slots.values():
+                if slot.preload and slot.state in (COLD, FAILED) and slot.name not in self._timers:
+                    self._schedule(slot)
+
+    def _schedule(self, slot: ModelSlot):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='model-load'
+            )
+        slot.state = LOADING
+        slot.stage = 'queued'
+        slot.progress = 0.0
+        slot.next_retry_at = None
+        self._executor.submit(self._load, slot)
+
+    def _load(self, slot: ModelSlot):
+        def progress(stage: str, fraction: float):
+            with self._lock:
+                slot.stage = stage
+                slot.progress = fraction
+            logger.info(f"Model '{slot.name}': {stage} ({fraction:.0%})")
+
+        with self._lock:
+            slot.attempts += 1
+            slot.started_at = time.time()
+            slot.finished_at = None
+            # Free room for the expected footprint before allocating it
+            self._make_room(slot, slot.footprint_bytes)
+        try:
+            model = slot.load_fn(progress)
+            footprint = slot.footprint_fn(model) if slot.footprint_fn else slot.footprint_bytes
+        except Exception as e:
+            logger.error(f"Error loading model '{slot.name}' (attempt {slot.attempts}): {e}")
+            with self._changed:
+                slot.state = FAILED
+                slot.stage = 'failed'
+                slot.error = str(e)
+                slot.finished_at = time.time()
+                if slot.attempts <= self.retries:
+                    delay = self.retry_backoff * 2 ** (slot.attempts - 1)
+                    slot.next_retry_at = time.time() + delay
+                    timer = threading.Timer(delay, self._retry, args=(slot.name,))
+                    timer.daemon = True
+                    self._timers[slot.name] = timer
+                    timer.start()
+                self._changed.notify_all()
+            return
+
+        with self._changed:
+            slot.model = model
+            slot.state = READY
+            slot.stage = 'ready'
+            slot.progress = 1.0
+            slot.error = None
+            slot.attempts = 0
+            slot.loads += 1
+            slot.footprint_bytes = footprint
+            slot.finished_at = time.time()
+            slot.last_used = slot.finished_at
+            self._make_room(slot, 0)
+            self._changed.notify_all()
+        logger.info(
+            f"Model '{slot.name}' loaded in {slot.finished_at - slot.started_at:.1f}s "
+            f"({footprint / (1024 * 1024):.0f} MB)"
+        )
+
+    def _retry(self, name: str):
+        with self._lock:
+            self._timers.pop(name, None)
+            slot = self._slots.get(name)
+            if slot is not None and slot.state == FAILED:
+                self._schedule(slot)
+
+    def _resident_bytes(self) -> int:
+        return sum(
+            slot.footprint_bytes for slot in self._slots.values() if slot.state == READY
+        )
+
+    def _make_room(self, incoming: ModelSlot, incoming_bytes: int):
+        """Evict LRU resident models until ``incoming`` fits the budget (lock held)"""
+        if not self.memory_budget:
+            return
+        while self._resident_bytes() + incoming_bytes > self.memory_budget:
+            candidates = [
+                slot for slot in self._slots.values()
+                if slot.state == READY and slot is not incoming
+            ]
+            if not candidates:
+                if incoming_bytes:
+                    logger.warning(
+                        f"Model '{incoming.name}' alone exceeds the memory budget"
+                    )
+                return
+            victim = min(candidates, key=lambda slot: slot.last_used or 0.0)
+            self._evict(victim)
+
+    def _evict(self, slot: ModelSlot):
+        # Batches already running keep their own reference to the model;
+        # the weights are released once the last of them finishes
+        if slot.unload_fn is not None:
+            try:
+                slot.unload_fn(slot.model)
+            except Exception as e:
+                logger.warning(f"Unloading model '{slot.name}' failed: {e}")
+        slot.model = None
+        slot.state = COLD
+        slot.stage = 'evicted'
+        slot.progress = 0.0
+        slot.evictions += 1
+        self.total_evictions += 1
+        logger.info(
+            f"Evicted model '{slot.name}' ({slot.footprint_bytes / (1024 * 1024):.0f} MB) "
+            f"to stay within the memory budget"
+        )
+
+    def ensure(self, name: str) -> bool:
+        """Start loading ``name`` if it is not resident; True when it is ready"""
+        with self._lock:
+            slot = self._slots.get(name)
+            if slot is None:
+                raise UnknownModel(name)
+            if slot.state == READY:
+                return True
+            if slot.state == COLD or (slot.state == FAILED and name not in self._timers):
+                slot.attempts = 0
+                self._schedule(slot)
+            return False
+
+    def is_ready(self, name: str) -> bool:
+        slot = self._slots.get(name)
+        return slot is not None and slot.state == READY
+
+    def all_ready(self) -> bool:
+        """True once every preloaded model is resident"""
+        preloaded = [slot for slot in self._slots.values() if slot.preload]
+        return bool(preloaded) and all(slot.state == READY for slot in preloaded)
+
+    def require(self, name: str) -> Any:
+        """Return a loaded model, or start loading it and raise ``ModelNotReady``"""
+        with self._lock:
+            slot = self._slots.get(name)
+            if slot is None:
+                raise UnknownModel(name)
+            if slot.state == READY:
+                slot.last_used = time.time()
+                return slot.model
+        self.ensure(name)
+        state = slot.state
+        raise ModelNotReady(name, state, self.retry_after(name))
+
+    def retry_after(self, name: str) -> int:
+        """Suggested Retry-After seconds for a request waiting on ``name``"""
+        slot = self._slots.get(name)
+        if slot is not None and slot.next_retry_at:
+            return max(1, int(slot.next_retry_at - time.time()) + self.retry_after_default)
+        return self.retry_after_default
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every preloaded model is ready or has given up retrying"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while not self._settled():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+        return self.all_ready()
+
+    def _settled(self) -> bool:
+        return all(
+            slot.state == READY or (slot.state == FAILED and slot.name not in self._timers)
+            for slot in self._slots.values() if slot.preload
+        )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'ready': self.all_ready(),
+                'uptime_seconds': time.time() - self.created_at,
+                'memory_budget_mb': round(self.memory_budget / (1024 * 1024), 1),
+                'resident_mb': round(self._resident_bytes() / (1024 * 1024), 1),
+                'evictions': self.total_evictions,
+                'models': {name: slot.info() for name, slot in self._slots.items()}
+            }
+
+    def reset_after_fork(self):
+        """Resume loading in a forked child whose parent had not finished.
+
+        Loader threads and retry timers do not survive ``fork()``; any
+        preloaded model that was not ready in the parent is loaded again
+        here, and models caught mid-load go back to cold.
+        """
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._executor = None
+        self._timers = {}
+        for slot in self._slots.values():
+            if slot.state != READY:
+                slot.state = COLD
+        self.start()
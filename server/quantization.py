@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Quantized model variants for Ableton2ML
+Stores checkpoint weights as float16 or per-channel int8 and expands them back for serving.
+
+The Magenta graphs hold float32 variables, so a served variant
+(MODEL_VARIANT) is cast back at load time: it shrinks the artifact, not
+the resident weights. Reduced-precision compute is the separate
+MODEL_PRECISION=bfloat16 session option.
+"""
+
+import glob
+import json
+import os
+import tempfile
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from midi_codec import NoteTable
+
+VARIANTS = ('float16', 'int8')
+
+# Tensors smaller than this (biases, norms, step counters) stay as they are
+MIN_QUANTIZED_SIZE = 1024
+
+META_KEY = '__meta__'
+BUNDLE_KEY = '__bundle__'
+
+
+def variant_path(checkpoint: str, variant: str) -> str:
+    """Where the exported ``variant`` of ``checkpoint`` lives"""
+    return f'{checkpoint}.{variant}.npz'
+
+
+def checkpoint_bytes(checkpoint: str) -> int:
+    """On-disk size of a checkpoint (file, directory or TF prefix)"""
+    if os.path.isfile(checkpoint):
+        paths = [checkpoint]
+    elif os.path.isdir(checkpoint):
+        paths = glob.glob(os.path.join(checkpoint, '*'))
+    else:
+        # TF checkpoint prefix: <prefix>.index, <prefix>.data-*
+        paths = glob.glob(checkpoint + '.*')
+    return sum(os.path.getsize(path) for path in paths if os.path.isfile(path))
+
+
+def prune_tensor(array: np.ndarray, sparsity: float) -> np.ndarray:
+    """Zero the ``sparsity`` fraction of weights with the smallest magnitude"""
+    if sparsity <= 0 or not array.size:
+        return array
+    threshold = np.quantile(np.abs(array), sparsity)
+    return np.where(np.abs(array) <= threshold, 0, array).astype(array.dtype)
+
+
+def quantize_tensor(array: np.ndarray, variant: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """(stored values, int8 scales) for one float tensor.
+
+    int8 is symmetric per output channel (the last axis) for matrices,
+    so a layer with a few large weights does not flatten every other
+    unit; vectors get one scale.
+    """
+    if variant == 'float16':
+        return array.astype(np.float16), None
+    if variant != 'int8':
+        raise ValueError(f'Unknown model variant: {variant}')
+    if array.ndim >= 2:
+        scale = np.abs(array).max(axis=tuple(range(array.ndim - 1))) / 127.0
+    else:
+        scale = np.array(np.abs(array).max() / 127.0)
+    scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+    return np.clip(np.rint(array / scale), -127, 127).astype(np.int8), scale
+
+
+def dequantize_tensor(values: np.ndarray, scale: Optional[np.ndarray]) -> np.ndarray:
+    if scale is None:
+        return values.astype(np.float32)
+    return values.astype(np.float32) * scale
+
+
+def save_variant(
+    path: str,
+    tensors: Dict[str, np.ndarray],
+    variant: str,
+    sparsity: float = 0.0,
+    metadata: Optional[Dict] = None,
+    bundle: Optional[bytes] = None
+) -> Dict:
+    """Write quantized checkpoint tensors (and a stripped generator bundle) to ``path``"""
+    arrays: Dict[str, np.ndarray] = {}
+    float32_bytes = 0
+    quantized = 0
+    for name, array in tensors.items():
+        array = np.asarray(array)
+        float32_bytes += array.nbytes
+        if array.dtype == np.float32 and array.size >= MIN_QUANTIZED_SIZE:
+            values, scale = quantize_tensor(prune_tensor(array, sparsity), variant)
+            arrays[f'q/{name}'] = values
+            if scale is not None:
+                arrays[f'scale/{name}'] = scale
+            quantized += 1
+        else:
+            arrays[f'raw/{name}'] = array
+    meta = {
+        **(metadata or {}),
+        'variant': variant,
+        'sparsity': sparsity,
+        'tensors': len(tensors),
+        'quantized_tensors': quantized,
+        'float32_bytes': float32_bytes
+    }
+    arrays[META_KEY] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+    if bundle is not None:
+        arrays[BUNDLE_KEY] = np.frombuffer(bundle, dtype=np.uint8)
+    with open(path, 'wb') as output:
+        np.savez_compressed(output, **arrays)
+    meta['bytes'] = os.path.getsize(path)
+    return meta
+
+
+def read_variant_meta(path: str) -> Dict:
+    with np.load(path) as data:
+        return json.loads(data[META_KEY].tobytes().decode('utf-8'))
+
+
+def load_variant(path: str) -> Tuple[Dict[str, np.ndarray], Dict, Optional[bytes]]:
+    """(float32 tensors, metadata, stripped bundle) from an exported variant"""
+    tensors: Dict[str, np.ndarray] = {}
+    with np.load(path) as data:
+        meta = json.loads(data[META_KEY].tobytes().decode('utf-8'))
+        bundle = data[BUNDLE_KEY].tobytes() if BUNDLE_KEY in data.files else None
+        for key in data.files:
+            if key.startswith('raw/'):
+                tensors[key[4:]] = data[key]
+            elif key.startswith('q/'):
+                name = key[2:]
+                scale = data[f'scale/{name}'] if f'scale/{name}' in data.files else None
+                tensors[name] = dequantize_tensor(data[key], scale)
+    return tensors, meta, bundle
+
+
+def read_checkpoint_tensors(prefix: str) -> Dict[str, np.ndarray]:
+    """Every tensor stored in a TF checkpoint"""
+    import tensorflow as tf
+
+    reader = tf.train.load_checkpoint(prefix)
+    return {
+        name: reader.get_tensor(name)
+        for name in sorted(reader.get_variable_to_shape_map())
+    }
+
+
+def write_checkpoint_tensors(tensors: Dict[str, np.ndarray], prefix: str, v1: bool = False) -> str:
+    """Save tensors as a TF checkpoint that graph-mode savers can restore by name.
+
+    Values are fed through placeholders so large weights never become
+    graph constants. ``v1`` writes the single-file format that Magenta
+    generator bundles embed.
+    """
+    import tensorflow as tf
+
+    graph = tf.Graph()
+    with graph.as_default():
+        feeds = {}
+        variables = {}
+        for name, value in tensors.items():
+            placeholder = tf.compat.v1.placeholder(tf.as_dtype(value.dtype), value.shape)
+            variables[name] = tf.compat.v1.Variable(placeholder, name=name)
+            feeds[variables[name].initializer] = (placeholder, value)
+        saver = tf.compat.v1.train.Saver(
+            var_list=variables,
+            write_version=tf.compat.v1.train.SaverDef.V1 if v1 else tf.compat.v1.train.SaverDef.V2
+        )
+        with tf.compat.v1.Session(graph=graph) as session:
+            for initializer, (placeholder, value) in feeds.items():
+                session.run(initializer, {placeholder: value})
+            return saver.save(session, prefix, write_meta_graph=False)
+
+
+def read_bundle_tensors(bundle) -> Dict[str, np.ndarray]:
+    """Tensors of the (single, V1) checkpoint embedded in a generator bundle"""
+    with tempfile.TemporaryDirectory() as directory:
+        prefix = os.path.join(directory, 'model.ckpt')
+        with open(prefix, 'wb') as checkpoint:
+            checkpoint.write(bundle.checkpoint_file[0])
+        return read_checkpoint_tensors(prefix)
+
+
+def expand_bundle(path: str):
+    """Generator bundle rebuilt around the dequantized weights of a variant"""
+    from magenta.models.shared import generator_pb2
+
+    tensors, meta, stripped = load_variant(path)
+    if stripped is None:
+        raise ValueError(f'{path} has no generator bundle')
+    bundle = generator_pb2.GeneratorBundle.FromString(stripped)
+    with tempfile.TemporaryDirectory() as directory:
+        prefix = write_checkpoint_tensors(tensors, os.path.join(directory, 'model.ckpt'), v1=True)
+        with open(prefix, 'rb') as checkpoint:
+            bundle.checkpoint_file.append(checkpoint.read())
+    return bundle
+
+
+def expand_variant(path: str, prefix: str) -> str:
+    """Write the float32 model restored from a variant file, return its checkpoint path.
+
+    Variants with an embedded generator bundle become ``<prefix>.mag``;
+    the others become a TF checkpoint at ``prefix``.
+    """
+    with np.load(path) as data:
+        has_bundle = BUNDLE_KEY in data.files
+    if has_bundle:
+        with open(f'{prefix}.mag', 'wb') as output:
+            output.write(expand_bundle(path).SerializeToString())
+        return f'{prefix}.mag'
+    tensors, _, _ = load_variant(path)
+    return write_checkpoint_tensors(tensors, prefix)
+
+
+def note_agreement(reference: NoteTable, candidate: NoteTable, steps_per_second: float = 8.0) -> Dict:
+    """Note-level precision/recall/F1 of ``candidate`` against ``reference``.
+
+    Notes match on pitch and onset snapped to a 16th grid (8 steps per
+    second at 120 qpm), as a multiset so repeated notes count once each.
+    """
+    def notes(table: NoteTable) -> Counter:
+        onsets = np.rint(table.start * steps_per_second).astype(np.int64)
+        return Counter(zip(table.pitch.tolist(), onsets.tolist()))
+
+    expected, produced = notes(reference), notes(candidate)
+    matched = sum((expected & produced).values())
+    precision = matched / len(candidate) if len(candidate) else float(not len(reference))
+    recall = matched / len(reference) if len(reference) else float(not len(candidate))
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'precision': precision, 'recall': recall, 'f1': f1}
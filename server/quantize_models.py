@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Quantized model export for Ableton2ML
+Writes float16 or int8 variants of catalog checkpoints for MODEL_VARIANT
+
+Usage: python server/quantize_models.py [MODEL ...] [--variant int8] [--sparsity 0.0]
+
+Without MODEL names every catalog model whose checkpoint is present in
+MODEL_DIR is exported. Each variant is written next to its checkpoint
+as ``<checkpoint>.<variant>.npz``.
+"""
+
+import copy
+import os
+import sys
+
+import click
+
+from magenta_server import MagentaServer
+from quantization import (
+    VARIANTS, checkpoint_bytes, read_bundle_tensors, read_checkpoint_tensors, save_variant, variant_path
+)
+
+
+def export_model(spec: dict, checkpoint: str, variant: str, sparsity: float) -> dict:
+    """Quantize one catalog model and write its variant file"""
+    bundle = None
+    if spec['kind'] == 'music_transformer':
+        from magenta.models.shared import sequence_generator_bundle
+
+        source = sequence_generator_bundle.read_bundle_file(checkpoint)
+        tensors = read_bundle_tensors(source)
+        # The variant carries the rest of the bundle (metagraph, details)
+        # so serving it does not need the original .mag file
+        stripped = copy.deepcopy(source)
+        del stripped.checkpoint_file[:]
+        bundle = stripped.SerializeToString()
+    else:
+        tensors = read_checkpoint_tensors(checkpoint)
+    return save_variant(
+        variant_path(checkpoint, variant), tensors, variant, sparsity,
+        metadata={'model': spec['name'], 'kind': spec['kind'], 'source': spec['checkpoint']},
+        bundle=bundle
+    )
+
+
+@click.command(help=__doc__.strip().splitlines()[0])
+@click.argument('models', nargs=-1)
+@click.option('--variant', type=click.Choice(VARIANTS), default='int8', show_default=True)
+@click.option('--sparsity', type=click.FloatRange(0.0, 0.95), default=0.0, show_default=True,
+              help='Fraction of smallest-magnitude weights per tensor to zero before quantizing')
+def main(models, variant, sparsity):
+    model_dir = os.getenv('MODEL_DIR', '')
+    catalog = {spec['name']: spec for spec in MagentaServer.load_model_catalog()}
+    unknown = [name for name in models if name not in catalog]
+    if unknown:
+        sys.exit(f"Unknown models: {', '.join(unknown)}")
+
+    exported = 0
+    for name in models or catalog:
+        spec = catalog[name]
+        checkpoint = os.path.join(model_dir, spec['checkpoint'])
+        source_bytes = checkpoint_bytes(checkpoint)
+        if not models and not source_bytes:
+            continue
+        click.echo(f'Exporting {name} as {variant}...')
+        meta = export_model(spec, checkpoint, variant, sparsity)
+        click.echo(
+            f"  {meta['quantized_tensors']}/{meta['tensors']} tensors quantized, "
+            f"{source_bytes / 1e6:.1f} MB -> {meta['bytes'] / 1e6:.1f} MB "
+            f"({variant_path(checkpoint, variant)})"
+        )
+        exported += 1
+
+    if not exported:
+        sys.exit(f'No checkpoints found in {model_dir or "."}')
+    click.echo(f'Check note agreement with: python benchmarks/check_variants.py --variant {variant}')
+    click.echo(f'Serve with MODEL_VARIANT={variant} (or "variant": "{variant}" in MODEL_CATALOG)')
+
+
+if __name__ == '__main__':
+    main()
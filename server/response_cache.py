@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Response memoization for Ableton2ML
+Seeded generation responses keyed by (MIDI hash, model, params, seed)
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from transport import params_json
+
+# Request fields that do not change what is generated, or are hashed separately
+IGNORED_FIELDS = ('midi_data', 'model', 'timeout_seconds', 'stream', 'stream_chunk_steps')
+
+
+def _payload_bytes(obj: Any) -> int:
+    """Approximate size of a response body: its clips plus a little per field"""
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(64 + _payload_bytes(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(_payload_bytes(value) for value in obj)
+    return 16
+
+
+class ResponseCache:
+    """Size- and TTL-bounded LRU of finished response bodies.
+
+    Only requests carrying a ``seed`` are cached: an unseeded request
+    asks for fresh material every time, while a seeded one names one
+    specific take, so replaying it is exactly what the client expects
+    (session recall, undo/redo, repeated previews).
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: float = 600.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(kind: str, model_name: str, data: Dict, midi_bytes: Optional[bytes]) -> str:
+        """Hash the MIDI content, model, generation params and seed"""
+        digest = hashlib.sha256(f'{kind}\0{model_name}\0'.encode('utf-8'))
+        params = {key: value for key, value in data.items() if key not in IGNORED_FIELDS}
+        digest.update(params_json(params))
+        if midi_bytes:
+            digest.update(b'\0')
+            digest.update(midi_bytes)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            body, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: str, body: Dict):
+        size = _payload_bytes(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (body, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl
+            }
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Continuation sessions for Ableton2ML live jamming
+Keeps the parsed primer on the server between continuation calls
+"""
+
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+import numpy as np
+
+from midi_codec import NoteTable, concat_tables
+
+logger = logging.getLogger(__name__)
+
+
+class ContinuationSession:
+    """Server-side state of one growing clip"""
+
+    def __init__(
+        self, session_id: str, primer: NoteTable, target_instrument: str, model_name: str, max_bytes: int
+    ):
+        self.session_id = session_id
+        self.primer = primer
+        self.target_instrument = target_instrument
+        # Fixed for the session's lifetime so every extension continues
+        # with the model the primer was opened for
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.extensions = 0
+        self.trimmed_notes = 0
+        self.lock = threading.Lock()
+        self.enforce_memory_cap()
+
+    def end_time(self) -> float:
+        return self.primer.total_time
+
+    def append(self, table: NoteTable, offset: Optional[float] = None) -> int:
+        """Append the notes of ``table`` starting at ``offset`` (default: session end)"""
+        offset = self.end_time() if offset is None else offset
+        duration = max(self.primer.total_time, offset + table.total_time)
+        self.primer = concat_tables(
+            [self.primer, table.shift(offset)], distinct_tracks=False
+        ).replace(tempos=self.primer.tempos, duration=duration)
+        self.enforce_memory_cap()
+        return len(table)
+
+    def enforce_memory_cap(self):
+        """Drop the oldest notes until the primer's columns fit in ``max_bytes``"""
+        excess = self.primer.nbytes - self.max_bytes
+        if excess <= 0:
+            return
+        note_bytes = self.primer.nbytes // len(self.primer)
+        drop = min(len(self.primer), -(-excess // note_bytes))
+        order = np.argsort(self.primer.start, kind='stable')
+        self.primer = self.primer[np.sort(order[drop:])]
+        self.trimmed_notes += drop
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    def info(self) -> Dict:
+        return {
+            'session_id': self.session_id,
+            'target_instrument': self.target_instrument,
+            'model': self.model_name,
+            'num_notes': len(self.primer),
+            'end_time': self.end_time(),
+            'bytes': self.primer.nbytes,
+            'max_bytes': self.max_bytes,
+            'extensions': self.extensions,
+            'trimmed_notes': self.trimmed_notes,
+            'created_at': self.created_at
+        }
+
+
+class SessionStore:
+    """Thread-safe session registry with idle-timeout eviction"""
+
+    def __init__(
+        self,
+        idle_timeout: float = 600.0,
+        max_sessions: int = 256,
+        max_session_bytes: int = 1024 * 1024
+    ):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.max_session_bytes = max_session_bytes
+        self._sessions: Dict[str, ContinuationSession] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+
+    def create(self, primer: NoteTable, target_instrument: str, model_name: str) -> ContinuationSession:
+        """Open a new session; evicts the least recently used one when full"""
+        session = ContinuationSession(
+            uuid.uuid4().hex, primer, target_instrument, model_name, self.max_session_bytes
+        )
+        with self._lock:
+            self._expire_idle()
+            if len(self._sessions) >= self.max_sessions:
+                oldest = min(self._sessions.values(), key=lambda s: s.last_used)
+                del self._sessions[oldest.session_id]
+                self.expired += 1
+                logger.info(f"Evicted continuation session {oldest.session_id} (store full)")
+            self._sessions[session.session_id] = session
+            self.created += 1
+        return session
+
+    def get(self, session_id: str) -> Optional[ContinuationSession]:
+        with self._lock:
+            self._expire_idle()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.touch()
+            return session
+
+    def close(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        for session_id in [
+            session_id for session_id, session in self._sessions.items()
+            if session.last_used < cutoff
+        ]:
+            del self._sessions[session_id]
+            self.expired += 1
+            logger.info(f"Expired idle continuation session {session_id}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._expire_idle()
+            return {
+                'active': len(self._sessions),
+                'created': self.created,
+                'expired': self.expired,
+                'idle_timeout': self.idle_timeout,
+                'max_sessions': self.max_sessions,
+                'max_session_bytes': self.max_session_bytes
+            }
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Server-Sent Events helpers for Ableton2ML streaming endpoints
+"""
+
+import json
+from typing import Dict, Iterable, Iterator
+
+SSE_MIMETYPE = 'text/event-stream'
+
+# Headers that keep proxies (nginx) from buffering the event stream
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+
+def format_sse(event: str, data: Dict) -> str:
+    """Format a single SSE frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def wants_stream(data: Dict, accept_header: str) -> bool:
+    """True when the client asked for a streamed response"""
+    if data.get('stream'):
+        return True
+    return SSE_MIMETYPE in (accept_header or '')
+
+
+def iter_sse(events: Iterable[Dict]) -> Iterator[str]:
+    """Wrap ``{'event': ..., **payload}`` dicts as SSE frames.
+
+    Exceptions raised by the producer are reported to the client as a
+    final ``error`` event instead of silently truncating the stream; a
+    ``retry_after`` hint (e.g. a model evicted mid-stream) is passed on.
+    """
+    try:
+        for payload in events:
+            payload = dict(payload)
+            event = payload.pop('event', 'message')
+            yield format_sse(event, payload)
+    except Exception as e:
+        error = {'error': str(e)}
+        if getattr(e, 'retry_after', None) is not None:
+            error['retry_after'] = e.retry_after
+        yield format_sse('error', error)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Content-negotiated request/response transport for Ableton2ML
+Base64 JSON stays the default; raw audio/midi, multipart/mixed and
+MessagePack avoid the base64 round trip for binary-capable clients
+"""
+
+import base64
+import hashlib
+import json
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import Response, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from metrics import timed
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MIDI_MIMETYPE = 'audio/midi'
+MIDI_MIMETYPES = ('audio/midi', 'audio/x-midi', 'audio/mid')
+MULTIPART_MIMETYPE = 'multipart/mixed'
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+
+META_HEADER = 'X-Ableton2ML-Meta'
+
+
+class TransportError(ValueError):
+    """Request body could not be decoded in the negotiated format"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class BodyTooLarge(TransportError):
+    """Request body is larger than the endpoint accepts"""
+
+    def __init__(self, message: str):
+        super().__init__(message, 413)
+
+
+def response_formats() -> List[str]:
+    """Response mimetypes this server can produce, JSON first (the default)"""
+    formats = [JSON_MIMETYPE, MIDI_MIMETYPE, MULTIPART_MIMETYPE]
+    if msgpack is not None:
+        formats.append(MSGPACK_MIMETYPE)
+    return formats
+
+
+def _parse_query_value(value: str) -> Any:
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def decode_midi_field(value: Any) -> bytes:
+    """MIDI payload from a body field: raw bytes (MessagePack) or base64 text (JSON)"""
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    with timed('base64_decode'):
+        return base64.b64decode(value)
+
+
+def _body(req, max_bytes: Optional[int] = None) -> bytes:
+    """The request body, never reading more than ``max_bytes`` of it.
+
+    A body with a Content-Length is read whole (callers check the
+    header first); a chunked one is read until it ends or passes the cap.
+    """
+    try:
+        if max_bytes is None or req.content_length is not None:
+            return req.get_data()
+        chunks, size = [], 0
+        while True:
+            chunk = req.stream.read(min(64 * 1024, max_bytes + 1 - size))
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > max_bytes:
+                raise BodyTooLarge(f'Request body exceeds the limit of {max_bytes} bytes')
+    except RequestEntityTooLarge:
+        raise BodyTooLarge('Request body exceeds the server limit')
+
+
+def read_request(
+    req,
+    decode: Callable[[Any], bytes] = decode_midi_field,
+    max_bytes: Optional[int] = None
+) -> Tuple[Dict, Optional[bytes]]:
+    """Decode a generation request into (params, midi_bytes).
+
+    * ``audio/midi`` body: the body is the clip, params come from the
+      query string (values parsed as JSON where possible)
+    * ``application/x-msgpack`` body: a map with ``midi_data`` as raw bytes
+    * anything else: the existing JSON contract with base64 ``midi_data``
+
+    ``decode`` turns the clip field (or raw body) into MIDI bytes; the
+    pre-flight validator passes one that checks limits on the way, and
+    ``max_bytes`` caps how much of the body is read (``BodyTooLarge``).
+    """
+    mimetype = req.mimetype
+    if mimetype in MIDI_MIMETYPES:
+        data = {key: _parse_query_value(value) for key, value in req.args.items()}
+        body = _body(req, max_bytes)
+        return data, decode(body) if body else None
+
+    if mimetype == MSGPACK_MIMETYPE and msgpack is None:
+        raise TransportError('MessagePack support is not installed', 415)
+    body = _body(req, max_bytes)
+    if mimetype == MSGPACK_MIMETYPE:
+        try:
+            data = msgpack.unpackb(body, raw=False)
+        except Exception as e:
+            raise TransportError(f'Invalid MessagePack body: {e}')
+    elif body:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+    else:
+        data = {}
+    if not isinstance(data, dict):
+        raise TransportError('Request body must be a JSON or MessagePack object')
+
+    midi_data = data.get('midi_data')
+    return data, decode(midi_data) if midi_data else None
+
+
+def params_json(params: Dict) -> bytes:
+    """Stable JSON of request params for hashing.
+
+    Bytes values (decoded clips, MessagePack fields) contribute their
+    SHA-256 instead of their repr.
+    """
+    return json.dumps(params, sort_keys=True, default=_hash_default).encode('utf-8')
+
+
+def _hash_default(value: Any) -> str:
+    if isinstance(value, (bytes, bytearray)):
+        return hashlib.sha256(value).hexdigest()
+    return str(value)
+
+
+def _collect_parts(obj: Any, parts: List[bytes]) -> Any:
+    """Copy ``obj`` replacing every bytes value with a ``{'part': i}`` reference"""
+    if isinstance(obj, (bytes, bytearray)):
+        parts.append(bytes(obj))
+        return {'part': len(parts) - 1}
+    if isinstance(obj, dict):
+        return {key: _collect_parts(value, parts) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_collect_parts(value, parts) for value in obj]
+    return obj
+
+
+def _to_json(obj: Any) -> Any:
+    """Copy ``obj`` replacing every bytes value with base64 text"""
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(obj).decode('utf-8')
+    if isinstance(obj, dict):
+        return {key: _to_json(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_json(value) for value in obj]
+    return obj
+
+
+def _multipart_response(meta: Dict, parts: List[bytes], status: int) -> Response:
+    boundary = uuid.uuid4().hex
+    delimiter = f'--{boundary}\r\n'.encode('ascii')
+    chunks = [
+        delimiter,
+        f'Content-Type: {JSON_MIMETYPE}\r\n\r\n'.encode('ascii'),
+        json.dumps(meta).encode('utf-8'),
+        b'\r\n'
+    ]
+    for index, part in enumerate(parts):
+        chunks.extend([
+            delimiter,
+            (
+                f'Content-Type: {MIDI_MIMETYPE}\r\n'
+                f'Content-Length: {len(part)}\r\n'
+                f'X-Part-Index: {index}\r\n\r\n'
+            ).encode('ascii'),
+            part,
+            b'\r\n'
+        ])
+    chunks.append(f'--{boundary}--\r\n'.encode('ascii'))
+    return Response(
+        b''.join(chunks),
+        status=status,
+        mimetype=f'{MULTIPART_MIMETYPE}; boundary={boundary}'
+    )
+
+
+def make_response(req, body: Dict, status: int = 200) -> Response:
+    """Render a response body holding raw MIDI bytes in the client's preferred format.
+
+    JSON (base64) is used unless the Accept header prefers a binary
+    format. ``audio/midi`` returns a single clip as the body with the
+    remaining fields in the X-Ableton2ML-Meta header; responses with
+    several clips fall back to multipart/mixed, whose first part is the
+    JSON metadata with ``{'part': i}`` in place of each clip.
+    """
+    with timed('response_encode'):
+        return _render_response(req, body, status)
+
+
+def _render_response(req, body: Dict, status: int) -> Response:
+    best = req.accept_mimetypes.best_match(response_formats(), default=JSON_MIMETYPE)
+    if best == JSON_MIMETYPE or not req.accept_mimetypes.provided:
+        response = jsonify(_to_json(body))
+        response.status_code = status
+        return response
+
+    if best == MSGPACK_MIMETYPE:
+        return Response(
+            msgpack.packb(body, use_bin_type=True),
+            status=status,
+            mimetype=MSGPACK_MIMETYPE
+        )
+
+    parts: List[bytes] = []
+    meta = _collect_parts(body, parts)
+    if best == MIDI_MIMETYPE and len(parts) == 1:
+        return Response(
+            parts[0],
+            status=status,
+            mimetype=MIDI_MIMETYPE,
+            headers={META_HEADER: json.dumps(meta)}
+        )
+    return _multipart_response(meta, parts, status)
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Pre-flight request validation for Ableton2ML
+Rejects oversized or malformed uploads and out-of-range generation
+parameters before any MIDI is parsed or model work is admitted
+"""
+
+import os
+import struct
+from typing import Any, Dict, List, Optional
+
+from metrics import METRICS
+from midi_codec import DEFAULT_QPM, MAX_TICK
+from transport import BodyTooLarge, TransportError, decode_midi_field, read_request
+
+# Endpoints with their own limits; every limit can be overridden per
+# endpoint as LIMIT_<ENDPOINT>_<NAME>, e.g. LIMIT_CONTINUATION_NOTES
+ENDPOINTS = ('variation', 'interpolation', 'continuation', 'new_track', 'session', 'bulk')
+
+# Limit name -> (environment suffix, default). Request bodies are in MB,
+# single MIDI clips in KB
+DEFAULT_LIMITS = {
+    'request_mb': ('REQUEST_MB', 16.0),
+    'midi_kb': ('MIDI_KB', 1024.0),
+    'notes': ('NOTES', 20000),
+    'seconds': ('SECONDS', 600.0),
+    'tracks': ('TRACKS', 64),
+    'num_variations': ('VARIATIONS', 16),
+    'target_length': ('TARGET_LENGTH', 1024),
+    'track_length': ('TRACK_LENGTH', 1024),
+    'context_tracks': ('CONTEXT_TRACKS', 16),
+    'clips': ('CLIPS', 16),
+    'interpolation_steps': ('INTERPOLATION_STEPS', 64),
+    'stream_chunk_steps': ('STREAM_CHUNK_STEPS', 1024),
+    'creativity_level': ('CREATIVITY', 1.0),
+    'timeout_seconds': ('TIMEOUT_SECONDS', 3600.0),
+    'bulk_inputs': ('BULK_INPUTS', 1000)
+}
+
+# Bulk uploads carry whole clip libraries
+ENDPOINT_DEFAULTS = {'bulk': {'request_mb': 256.0}}
+
+# Generation fields: name -> (default, minimum, limit bounding it, integer).
+# Fields without a default are only checked when the request sets them
+PARAMS = {
+    'num_variations': (3, 1, 'num_variations', True),
+    'target_length': (16, 1, 'target_length', True),
+    'track_length': (32, 1, 'track_length', True),
+    'num_steps': (5, 2, 'interpolation_steps', True),
+    'stream_chunk_steps': (None, 1, 'stream_chunk_steps', True),
+    'creativity_level': (None, 0.0, 'creativity_level', False),
+    'timeout_seconds': (None, 0.0, 'timeout_seconds', False),
+    'offset': (None, 0.0, 'seconds', False)
+}
+
+# Per endpoint: the generation fields it reads and the clip list it decodes
+ENDPOINT_PARAMS = {
+    'variation': ('num_variations', 'creativity_level', 'timeout_seconds'),
+    'interpolation': ('num_steps', 'creativity_level', 'timeout_seconds'),
+    'continuation': ('target_length', 'stream_chunk_steps', 'timeout_seconds'),
+    'new_track': ('track_length', 'timeout_seconds'),
+    'session': ('target_length', 'offset', 'timeout_seconds'),
+    'bulk': ('timeout_seconds',)
+}
+ENDPOINT_CLIPS = {'interpolation': 'clips', 'new_track': 'context_tracks'}
+
+# Fields that, when present, must be strings (model names, presets)
+TEXT_FIELDS = ('model', 'target_instrument', 'style_preset')
+
+TOO_LARGE = 413
+UNPROCESSABLE = 422
+
+
+class MidiSummary:
+    """What the pre-flight scan learned about one clip"""
+
+    __slots__ = ('bytes', 'tracks', 'notes', 'ticks', 'seconds')
+
+    def __init__(self, size: int, tracks: int, notes: int, ticks: int, seconds: float):
+        self.bytes = size
+        self.tracks = tracks
+        self.notes = notes
+        self.ticks = ticks
+        self.seconds = seconds
+
+
+def _read_varint(data: bytes, pos: int):
+    value = 0
+    for _ in range(4):
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7f)
+        if byte < 0x80:
+            return value, pos
+    raise TransportError('Invalid variable-length quantity in MIDI track')
+
+
+def scan_midi(
+    midi_bytes: bytes,
+    max_notes: Optional[int] = None,
+    max_seconds: Optional[float] = None,
+    max_tracks: Optional[int] = None
+) -> MidiSummary:
+    """Check SMF structure and count notes without building a note table.
+
+    Chunk headers are checked against the payload size first, so a
+    truncated or bogus file is rejected before any event is read. The
+    event walk only counts note-ons and tracks the tempo map, and stops
+    at the first limit exceeded.
+    """
+    data = bytes(midi_bytes)
+    size = len(data)
+    if size < 14 or data[:4] != b'MThd':
+        raise TransportError('Not a Standard MIDI File (missing MThd header)')
+    header_length = struct.unpack_from('>I', data, 4)[0]
+    if header_length < 6 or 8 + header_length > size:
+        raise TransportError('Invalid MThd header length')
+    smf_format, num_tracks, division = struct.unpack_from('>HHH', data, 8)
+    if smf_format > 2:
+        raise TransportError(f'Unknown SMF format {smf_format}')
+    if division & 0x8000:
+        raise TransportError('SMPTE time division is not supported')
+    if division == 0:
+        raise TransportError('MIDI file has a time division of zero')
+    if max_tracks is not None and num_tracks > max_tracks:
+        raise TransportError(
+            f'MIDI file has {num_tracks} tracks, the limit is {max_tracks}', UNPROCESSABLE
+        )
+
+    pos = 8 + header_length
+    chunks = []
+    while pos + 8 <= size and len(chunks) < num_tracks:
+        chunk_type = data[pos:pos + 4]
+        chunk_length = struct.unpack_from('>I', data, pos + 4)[0]
+        start = pos + 8
+        pos = start + chunk_length
+        if pos > size:
+            raise TransportError('Truncated MIDI track chunk')
+        if chunk_type == b'MTrk':
+            chunks.append((start, pos))
+    if not chunks:
+        raise TransportError('MIDI file has no track chunks')
+
+    # Tempo changes as (tick, microseconds per quarter), read from track 0
+    # like the parser does
+    tempos = [(0, 6e7 / DEFAULT_QPM)]
+    note_limit = max_notes if max_notes is not None else float('inf')
+    notes = 0
+    max_tick = 0
+    seconds = 0.0
+    for index, (pos, end) in enumerate(chunks):
+        tick = 0
+        running_status = 0
+        try:
+            while pos < end:
+                delta = data[pos]
+                if delta & 0x80:
+                    delta, pos = _read_varint(data, pos)
+                else:
+                    pos += 1
+                tick += delta
+                status = data[pos]
+                if status & 0x80:
+                    pos += 1
+                    if status < 0xf0:
+                        running_status = status
+                elif running_status:
+                    status = running_status
+                else:
+                    raise TransportError('Running status without a preceding status byte')
+
+                # Channel messages first: they are nearly every event
+                kind = status & 0xf0
+                if kind == 0x90:
+                    if data[pos + 1]:
+                        notes += 1
+                        if notes > note_limit:
+                            raise TransportError(
+                                f'MIDI file has more than {max_notes} notes', UNPROCESSABLE
+                            )
+                    pos += 2
+                elif kind != 0xf0:
+                    pos += 1 if kind in (0xc0, 0xd0) else 2
+                elif status == 0xff:
+                    meta_type = data[pos]
+                    length, pos = _read_varint(data, pos + 1)
+                    if meta_type == 0x51 and index == 0 and length == 3:
+                        tempo = (data[pos] << 16) | (data[pos + 1] << 8) | data[pos + 2]
+                        if not tick:
+                            tempos[0] = (0, tempo)
+                        elif tempo:
+                            tempos.append((tick, tempo))
+                    pos += length
+                    if meta_type == 0x2f:
+                        break
+                elif status in (0xf0, 0xf7):
+                    length, pos = _read_varint(data, pos)
+                    pos += length
+                else:
+                    pos += 2 if status == 0xf2 else 1 if status in (0xf1, 0xf3) else 0
+        except IndexError:
+            pos = end + 1
+        if pos > end:
+            raise TransportError('Truncated MIDI event')
+        if tick + 1 > MAX_TICK:
+            raise TransportError(f'MIDI file has a largest tick of {tick + 1}, it is likely corrupt')
+
+        if tick > max_tick:
+            max_tick = tick
+            seconds = _ticks_to_seconds(max_tick, tempos, division)
+            if max_seconds is not None and seconds > max_seconds:
+                raise TransportError(
+                    f'MIDI file lasts {seconds:.1f}s, the limit is {max_seconds:g}s', UNPROCESSABLE
+                )
+
+    return MidiSummary(size, len(chunks), notes, max_tick, seconds)
+
+
+def _ticks_to_seconds(ticks: int, tempos: List, division: int) -> float:
+    seconds = 0.0
+    for i, (tick, tempo) in enumerate(tempos):
+        if tick >= ticks:
+            break
+        until = tempos[i + 1][0] if i + 1 < len(tempos) else ticks
+        seconds += (min(until, ticks) - tick) * tempo / (1e6 * division)
+    return seconds
+
+
+class RequestLimits:
+    """Size, content and parameter limits of one endpoint"""
+
+    def __init__(self, endpoint: str, **limits):
+        self.endpoint = endpoint
+        defaults = ENDPOINT_DEFAULTS.get(endpoint, {})
+        for name, (_, default) in DEFAULT_LIMITS.items():
+            setattr(self, name, limits.get(name, defaults.get(name, default)))
+
+    @classmethod
+    def from_env(cls, endpoint: str) -> 'RequestLimits':
+        """Limits from LIMIT_<NAME>, overridden by LIMIT_<ENDPOINT>_<NAME>"""
+        limits = {}
+        for name, (suffix, default) in DEFAULT_LIMITS.items():
+            value = os.getenv(f'LIMIT_{endpoint.upper()}_{suffix}') or os.getenv(f'LIMIT_{suffix}')
+            if value:
+                limits[name] = type(default)(value)
+        return cls(endpoint, **limits)
+
+    @property
+    def request_bytes(self) -> int:
+        return int(self.request_mb * 1024 * 1024)
+
+    @property
+    def midi_bytes(self) -> int:
+        return int(self.midi_kb * 1024)
+
+    def info(self) -> Dict:
+        return {name: getattr(self, name) for name in DEFAULT_LIMITS}
+
+    def reject(self, reason: str, message: str, status_code: int = UNPROCESSABLE):
+        METRICS.rejected_requests.inc(endpoint=self.endpoint, reason=reason)
+        raise TransportError(message, status_code)
+
+    def check_count(self, name: str, count: int, what: str):
+        limit = getattr(self, name)
+        if count > limit:
+            self.reject(name, f'{count} {what} exceeds the limit of {limit}')
+
+    def check_number(self, field: str, value: Any) -> Any:
+        """Check one generation parameter's type (400) and range (422), return it.
+
+        Integer fields accept integral floats (``16.0``), which are
+        returned as ints.
+        """
+        _, minimum, limit_name, integer = PARAMS[field]
+        if isinstance(value, float) and integer and value.is_integer():
+            value = int(value)
+        if isinstance(value, bool) or not isinstance(value, int if integer else (int, float)):
+            kind = 'an integer' if integer else 'a number'
+            self.reject(field, f'{field} must be {kind}, got {value!r}', 400)
+        if not value >= minimum:
+            self.reject(field, f'{field} must be at least {minimum:g}')
+        limit = getattr(self, limit_name)
+        if not value <= limit:
+            self.reject(field, f'{field}={value} exceeds the limit of {limit:g}')
+        return value
+
+    def check_params(self, data: Dict, *fields: str) -> Dict:
+        """Validate generation parameters of ``data`` (or their defaults).
+
+        Values present in ``data`` are replaced by their checked form,
+        so an integral float reaches the models as an int.
+        """
+        for field in fields:
+            if data.get(field) is not None:
+                data[field] = self.check_number(field, data[field])
+            elif PARAMS[field][0] is not None:
+                self.check_number(field, PARAMS[field][0])
+        return data
+
+    def check_text(self, data: Dict, *fields: str) -> Dict:
+        """Reject non-string values of the given fields"""
+        for field in fields:
+            value = data.get(field)
+            if value is not None and not isinstance(value, str):
+                self.reject(field, f'{field} must be a string, got {value!r}', 400)
+        return data
+
+    def check_timeout_header(self, req):
+        """Validate X-Request-Timeout like ``timeout_seconds``"""
+        value = req.headers.get('X-Request-Timeout')
+        if value is None:
+            return
+        try:
+            seconds = float(value)
+        except ValueError:
+            self.reject('timeout_seconds', f'X-Request-Timeout must be a number, got {value!r}', 400)
+        self.check_number('timeout_seconds', seconds)
+
+    def check_path(self, data: Dict):
+        """Cap the whole interpolation path, every segment decodes ``num_steps`` latents"""
+        clips = data.get('clips')
+        if isinstance(clips, list) and len(clips) > 1:
+            num_steps = self.check_number('num_steps', data.get('num_steps', PARAMS['num_steps'][0]))
+            steps = (len(clips) - 1) * (num_steps - 1) + 1
+            self.check_count('interpolation_steps', steps, 'interpolation steps')
+
+    def check_midi(self, midi_bytes: bytes) -> MidiSummary:
+        """Scan one decoded clip against the size, note, track and duration limits"""
+        if len(midi_bytes) > self.midi_bytes:
+            self.reject(
+                'midi_bytes', f'MIDI clip is {len(midi_bytes)} bytes, the limit is {self.midi_bytes}',
+                TOO_LARGE
+            )
+        try:
+            return scan_midi(midi_bytes, self.notes, self.seconds, self.tracks)
+        except TransportError as e:
+            reason = 'midi_limits' if e.status_code == UNPROCESSABLE else 'midi_structure'
+            METRICS.rejected_requests.inc(endpoint=self.endpoint, reason=reason)
+            raise
+
+    def decode_midi(self, value: Any) -> bytes:
+        """Decode a base64 or raw MIDI field after checking its size, then scan it.
+
+        Base64 text is measured before decoding, so an oversized upload
+        costs a length check rather than a decode.
+        """
+        if not value:
+            self.reject('midi_missing', 'No MIDI data provided', 400)
+        if isinstance(value, str):
+            if len(value) * 3 // 4 - value.count('=', -2) > self.midi_bytes:
+                self.reject(
+                    'midi_bytes', f'MIDI clip exceeds the limit of {self.midi_bytes} bytes', TOO_LARGE
+                )
+        elif not isinstance(value, (bytes, bytearray)):
+            self.reject('midi_type', 'MIDI data must be base64 text or bytes', 400)
+        try:
+            midi_bytes = decode_midi_field(value)
+        except ValueError as e:
+            self.reject('midi_encoding', f'Invalid base64 MIDI data: {e}', 400)
+        self.check_midi(midi_bytes)
+        return midi_bytes
+
+    def check_clips(self, items: List, name: str) -> List:
+        """Decode and scan the ``midi_data`` of every item of a clip list in place.
+
+        The decoded bytes replace the base64 text, so the generation
+        path (decode_midi_field passes bytes through) does not decode
+        twice; payload hashes digest bytes values rather than their repr.
+        """
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            self.reject(name, f'{name} must be a list of objects with midi_data', 400)
+        self.check_count(name, len(items), name)
+        for item in items:
+            item['midi_data'] = self.decode_midi(item.get('midi_data'))
+        return items
+
+    def read(self, req):
+        """Decode a request like read_request, validating it before anything is parsed.
+
+        The body size is checked against Content-Length before it is
+        read (a chunked body is cut off once it passes the limit), the
+        MIDI clip before it is decoded, and the generation parameters and
+        clip lists the endpoint uses before the request is admitted.
+        """
+        if req.content_length is not None and req.content_length > self.request_bytes:
+            self.reject(
+                'request_bytes',
+                f'Request body is {req.content_length} bytes, the limit is {self.request_bytes}',
+                TOO_LARGE
+            )
+        try:
+            data, midi_bytes = read_request(req, self.decode_midi, self.request_bytes)
+        except BodyTooLarge as e:
+            self.reject('request_bytes', str(e), TOO_LARGE)
+        self.check_timeout_header(req)
+        self.check_text(data, *TEXT_FIELDS)
+        self.check_params(data, *ENDPOINT_PARAMS.get(self.endpoint, ()))
+        if self.endpoint == 'interpolation':
+            self.check_path(data)
+        field = ENDPOINT_CLIPS.get(self.endpoint)
+        if field and data.get(field):
+            self.check_clips(data[field], field)
+        return data, midi_bytes
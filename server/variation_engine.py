@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+MusicVAE variation engine for Ableton2ML
+Encodes a clip once and decodes all variations as one latent batch
+"""
+
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from batching import MicroBatcher
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+
+class VariationEngine:
+    """Batched latent-space variations on top of a MusicVAE batcher.
+
+    Batch keys carry the model name, so requests for different MusicVAE
+    configs share the batcher without ever landing in the same batch.
+    """
+
+    def __init__(self, batcher: MicroBatcher):
+        self.batcher = batcher
+
+    @staticmethod
+    def temperature_for(creativity_level: float) -> float:
+        """Map the device's creativity level onto a decoder temperature"""
+        return 0.5 + (creativity_level * 0.5)
+
+    def encode(self, note_sequence, model_name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Encode a single note table into (z, mu, sigma)"""
+        return self.batcher.submit(('encode', model_name), [note_sequence])[0]
+
+    @staticmethod
+    def sample_latents(
+        mu: np.ndarray,
+        sigma: np.ndarray,
+        num_variations: int,
+        creativity_level: float,
+        rng: Optional[np.random.Generator] = None
+    ) -> np.ndarray:
+        """Draw ``num_variations`` perturbations of the posterior in one pass.
+
+        Each row is ``mu + creativity_level * sigma * eps`` with
+        ``eps ~ N(0, I)``, so a creativity level of 0 reproduces the
+        posterior mean and 1 samples the full posterior.
+        """
+        with timed('model_sample'):
+            rng = rng if rng is not None else np.random.default_rng()
+            mu = np.asarray(mu, dtype=np.float32)
+            sigma = np.asarray(sigma, dtype=np.float32)
+            eps = rng.standard_normal((num_variations, mu.shape[-1]), dtype=np.float32)
+            return mu[np.newaxis, :] + (creativity_level * sigma)[np.newaxis, :] * eps
+
+    def encode_batch(self, note_sequences: List, model_name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Encode several note tables as one submission into stacked (N, z_size) arrays"""
+        encodings = self.batcher.submit(('encode', model_name), note_sequences)
+        z, mu, sigma = (np.stack(arrays) for arrays in zip(*encodings))
+        return z, mu, sigma
+
+    @staticmethod
+    def sample_window_latents(
+        mu: np.ndarray,
+        sigma: np.ndarray,
+        num_variations: int,
+        creativity_level: float,
+        correlation: float,
+        rng: Optional[np.random.Generator] = None
+    ) -> np.ndarray:
+        """Draw (N, W, z_size) perturbations that drift smoothly from window to window.
+
+        The noise follows an AR(1) process along the windows,
+        ``eps[w] = correlation * eps[w - 1] + sqrt(1 - correlation**2) * e``,
+        so each window keeps a unit-variance posterior perturbation while
+        neighbouring windows move in a similar direction instead of
+        jumping independently at every boundary.
+        """
+        with timed('model_sample'):
+            rng = rng if rng is not None else np.random.default_rng()
+            mu = np.asarray(mu, dtype=np.float32)
+            sigma = np.asarray(sigma, dtype=np.float32)
+            eps = rng.standard_normal((num_variations,) + mu.shape, dtype=np.float32)
+            innovation = np.float32(np.sqrt(1.0 - correlation ** 2))
+            for window in range(1, mu.shape[0]):
+                eps[:, window] = correlation * eps[:, window - 1] + innovation * eps[:, window]
+            return mu[np.newaxis] + (creativity_level * sigma)[np.newaxis] * eps
+
+    @staticmethod
+    def interpolate_latents(anchors: np.ndarray, num_steps: int, method: str = 'slerp') -> np.ndarray:
+        """Path through K anchor latents with ``num_steps`` points per segment.
+
+        Consecutive segments share their endpoint, so the result has
+        ``(K - 1) * (num_steps - 1) + 1`` rows starting and ending on
+        the first and last anchor. ``slerp`` follows the great circle
+        between anchors (keeping latent norms typical of the prior);
+        ``linear`` interpolates straight through.
+        """
+        anchors = np.asarray(anchors, dtype=np.float32)
+        start, end = anchors[:-1, np.newaxis, :], anchors[1:, np.newaxis, :]
+        t = np.linspace(0.0, 1.0, num_steps, dtype=np.float32)[:-1][np.newaxis, :, np.newaxis]
+        if method == 'slerp':
+            unit_start = start / np.linalg.norm(start, axis=-1, keepdims=True)
+            unit_end = end / np.linalg.norm(end, axis=-1, keepdims=True)
+            omega = np.arccos(np.clip(np.sum(unit_start * unit_end, axis=-1, keepdims=True), -1.0, 1.0))
+            sin_omega = np.sin(omega)
+            # Nearly parallel anchors fall back to linear steps
+            parallel = sin_omega < 1e-6
+            safe = np.where(parallel, 1.0, sin_omega)
+            weight_start = np.where(parallel, 1.0 - t, np.sin((1.0 - t) * omega) / safe)
+            weight_end = np.where(parallel, t, np.sin(t * omega) / safe)
+        elif method == 'linear':
+            weight_start, weight_end = 1.0 - t, t
+        else:
+            raise ValueError(f'Unknown interpolation method: {method}')
+        path = (weight_start * start + weight_end * end).reshape(-1, anchors.shape[-1])
+        return np.concatenate([path, anchors[-1:]]).astype(np.float32)
+
+    def decode(self, latents: np.ndarray, temperature: float, model_name: str) -> List:
+        """Decode a (N, z_size) latent batch into N NoteSequences"""
+        return self.batcher.submit(('decode', model_name, temperature), list(latents))
+
+    def generate(
+        self,
+        note_sequence,
+        num_variations: int,
+        creativity_level: float,
+        model_name: str,
+        rng: Optional[np.random.Generator] = None
+    ) -> Tuple[List, float]:
+        """Generate variations of a NoteSequence, returning them with the temperature used"""
+        return self.generate_from_encoding(
+            self.encode(note_sequence, model_name), num_variations, creativity_level, model_name, rng
+        )
+
+    def generate_from_encoding(
+        self,
+        encoding: Tuple[np.ndarray, np.ndarray, np.ndarray],
+        num_variations: int,
+        creativity_level: float,
+        model_name: str,
+        rng: Optional[np.random.Generator] = None
+    ) -> Tuple[List, float]:
+        """Generate variations from an existing (z, mu, sigma) encoding.
+
+        Passing a seeded ``rng`` makes the latent draws reproducible.
+        """
+        temperature = self.temperature_for(creativity_level)
+        _, mu, sigma = encoding
+        latents = self.sample_latents(mu, sigma, num_variations, creativity_level, rng)
+        return self.decode(latents, temperature, model_name), temperature
+
+    def generate_windows(
+        self,
+        encoding: Tuple[np.ndarray, np.ndarray, np.ndarray],
+        num_variations: int,
+        creativity_level: float,
+        model_name: str,
+        correlation: float,
+        rng: Optional[np.random.Generator] = None
+    ) -> Tuple[List[List], float]:
+        """Variations of a windowed encoding: one list of W decoded windows per variation.
+
+        All N * W latents go to the decoder as one submission, so a long
+        clip costs ``ceil(N * W / batch_size)`` decode passes.
+        """
+        temperature = self.temperature_for(creativity_level)
+        _, mu, sigma = encoding
+        latents = self.sample_window_latents(
+            mu, sigma, num_variations, creativity_level, correlation, rng
+        )
+        windows = mu.shape[0]
+        decoded = self.decode(latents.reshape(-1, mu.shape[-1]), temperature, model_name)
+        return [decoded[i * windows:(i + 1) * windows] for i in range(num_variations)], temperature
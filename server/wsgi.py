@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+WSGI entry point for Ableton2ML production serving
+
+    gunicorn -c server/gunicorn.conf.py wsgi:app
+
+With ``preload_app`` gunicorn imports this module once in the master,
+so the models are loaded a single time and forked workers share the
+weights copy-on-write. Without it (PRELOAD_MODELS=0) every worker
+starts serving immediately and loads its models in the background.
+"""
+
+import gc
+import os
+
+from magenta_server import MagentaServer
+
+server = MagentaServer()
+app = server.app
+
+# The master must finish loading before it forks, otherwise each worker
+# would load its own copy of the weights. With an inference pool the
+# weights live in the pool's processes and gunicorn does not preload.
+if os.getenv('PRELOAD_MODELS', '1') == '1' and server.inference_pool is None:
+    server.models.wait()
+
+# Move everything allocated so far (models included) out of the GC's
+# tracked generations so collections in the workers don't write to
+# shared pages and defeat copy-on-write
+gc.freeze()
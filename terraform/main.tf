@@ -193,7 +193,7 @@ resource "google_compute_instance" "ableton2ml_server" {
     
     # Start the server
     cd /opt/ableton2ml
-    nohup python3 server/magenta_server.py > /var/log/ableton2ml.log 2>&1 &
+    nohup gunicorn -c server/gunicorn.conf.py wsgi:app > /var/log/ableton2ml.log 2>&1 &
   EOF
 
   service_account {
@@ -157,7 +157,7 @@ User=root
 WorkingDirectory=/opt/ableton2ml
 Environment=PATH=/opt/ableton2ml/venv/bin
 Environment=PYTHONPATH=/opt/ableton2ml
-ExecStart=/opt/ableton2ml/venv/bin/python server/magenta_server.py
+ExecStart=/opt/ableton2ml/venv/bin/gunicorn -c server/gunicorn.conf.py wsgi:app
 Restart=always
 RestartSec=10
 StandardOutput=journal